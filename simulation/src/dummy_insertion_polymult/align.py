@@ -0,0 +1,186 @@
+"""Align a trace store to a reference window with FFT cross-correlation.
+
+Captures triggered with scope.adc.basic_mode = "rising_edge" start a few
+samples early or late, which smears every leaking sample over its
+neighbours and costs tvla.py and cpa.py traces. The reference is the mean
+of the first traces, themselves aligned to it in a few rounds starting
+from the first trace (reference_trace). For each trace the segment
+window[0] - max_shift .. window[1] + max_shift is cross-correlated with the
+mean-free reference window. This is one batched rfft / irfft per chunk of
+traces. The lag of the peak is the trace's shift. With subsample=True the
+peak is refined by a parabola through its neighbours. The trace is then
+resampled at sample + shift (linear interpolation for fractional shifts,
+edge samples repeated past the ends) and written back to the store in
+place. Run it on a copy (--output) to keep the raw capture.
+
+Workers align disjoint row ranges of the same memory-mapped store. The
+Pearson correlation of each aligned window with the reference is returned
+with the shifts; a trace far below the others did not lock onto the
+reference (wrong window, or a glitch) and is better left out of the attack.
+"""
+import argparse
+import os
+import shutil
+from functools import partial
+from multiprocessing import Pool
+from typing import Optional, Tuple
+
+import numpy as np
+
+from trace_store import TraceStore
+from tvla import row_ranges
+
+DEFAULT_MAX_SHIFT = 16
+DEFAULT_REFERENCE_TRACES = 256
+DEFAULT_ITERATIONS = 3
+
+def _fft_size(length: int) -> int:
+    return 1 << max(length - 1, 1).bit_length()
+
+def find_shifts(traces: np.ndarray, reference: np.ndarray, window: Tuple[int, int], max_shift: int,
+                subsample: bool = False) -> np.ndarray:
+    """Shift of every trace (rows, samples) against reference[window[0]:window[1]]
+
+    Sample window[0] + shift of a trace lines up with sample window[0] of the
+    reference, |shift| <= max_shift.
+    """
+    start, stop = window
+    width = stop - start
+    template = np.asarray(reference[start:stop], dtype=np.float64)
+    template = template - template.mean()
+    # Edge-padded segments, so the window may sit at either end of the trace
+    padded = np.pad(np.asarray(traces, dtype=np.float64), ((0, 0), (max_shift, max_shift)), mode='edge')
+    segments = padded[:, start:stop + 2 * max_shift]
+    segments = segments - segments.mean(axis=1, keepdims=True)
+
+    size = _fft_size(segments.shape[1] + width)
+    spectrum = np.fft.rfft(segments, size, axis=1) * np.conj(np.fft.rfft(template, size))
+    xcorr = np.fft.irfft(spectrum, size, axis=1)[:, :2 * max_shift + 1]
+    lags = np.argmax(xcorr, axis=1)
+    shifts = (lags - max_shift).astype(np.float64)
+    if subsample:
+        inner = (lags > 0) & (lags < 2 * max_shift)
+        rows = np.flatnonzero(inner)
+        left, peak, right = (xcorr[rows, lags[rows] + d] for d in (-1, 0, 1))
+        curvature = left - 2 * peak + right
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offset = np.where(curvature < 0, 0.5 * (left - right) / curvature, 0.0)
+        shifts[rows] += np.clip(offset, -0.5, 0.5)
+    return shifts
+
+def apply_shifts(traces: np.ndarray, shifts: np.ndarray) -> np.ndarray:
+    """Resample each trace at sample + shift (linear interpolation, edges repeated)"""
+    traces = np.asarray(traces, dtype=np.float64)
+    samples = traces.shape[1]
+    positions = np.clip(np.arange(samples) + np.asarray(shifts, dtype=np.float64)[:, None], 0, samples - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, samples - 1)
+    fraction = positions - lower
+    return np.take_along_axis(traces, lower, axis=1) * (1 - fraction) + \
+        np.take_along_axis(traces, upper, axis=1) * fraction
+
+def reference_trace(traces: np.ndarray, window: Tuple[int, int], max_shift: int,
+                    iterations: int = DEFAULT_ITERATIONS) -> np.ndarray:
+    """Reference built from a (rows, samples) block of traces
+
+    Starts from the first trace and, each iteration, averages the block
+    aligned to the current reference, which averages out the data-dependent
+    part of the first trace without the blur of an unaligned mean.
+    """
+    traces = np.asarray(traces, dtype=np.float64)
+    reference = traces[0]
+    for _ in range(iterations):
+        reference = apply_shifts(traces, find_shifts(traces, reference, window, max_shift)).mean(axis=0)
+    return reference
+
+def window_correlation(traces: np.ndarray, reference: np.ndarray, window: Tuple[int, int]) -> np.ndarray:
+    """Pearson correlation of every trace's window with the reference window"""
+    start, stop = window
+    template = reference[start:stop] - reference[start:stop].mean()
+    segments = traces[:, start:stop] - traces[:, start:stop].mean(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return segments @ template / (np.linalg.norm(segments, axis=1) * np.linalg.norm(template))
+
+def align_rows(filename: str, reference: np.ndarray, window: Tuple[int, int], max_shift: int, subsample: bool,
+               chunk_size: int, row_range: Tuple[int, int]):
+    """Worker entry point: align rows start .. stop - 1 in place; returns (shifts, correlations)"""
+    store = TraceStore(filename, mode='r+')
+    start, stop = row_range
+    shifts = np.zeros(stop - start)
+    correlations = np.zeros(stop - start)
+    for chunk_start in range(start, stop, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, stop)
+        traces = store[chunk_start:chunk_stop]
+        chunk_shifts = find_shifts(traces, reference, window, max_shift, subsample)
+        aligned = apply_shifts(traces, chunk_shifts)
+        store.write_traces(chunk_start, aligned)
+        shifts[chunk_start - start:chunk_stop - start] = chunk_shifts
+        correlations[chunk_start - start:chunk_stop - start] = window_correlation(aligned, reference, window)
+    store.flush()
+    return shifts, correlations
+
+def run(filename: str, window: Optional[Tuple[int, int]] = None, max_shift: int = DEFAULT_MAX_SHIFT,
+        reference_rows: int = DEFAULT_REFERENCE_TRACES, subsample: bool = False, chunk_size: int = 4096,
+        workers: Optional[int] = None, output: Optional[str] = None):
+    """Align every trace of the store (or of a copy written to output); returns (shifts, correlations)"""
+    if output is not None:
+        shutil.copyfile(filename, output)
+        filename = output
+    store = TraceStore(filename)
+    rows, samples = store.shape
+    window = window or (0, samples)
+    if not 0 <= window[0] < window[1] <= samples:
+        raise ValueError(f"Window {window} is outside the {samples} samples of {filename}")
+    if rows == 0:
+        return np.zeros(0), np.zeros(0)
+    reference = reference_trace(store[:reference_rows], window, max_shift)
+    del store
+
+    workers = workers or os.cpu_count() or 1
+    worker = partial(align_rows, filename, reference, window, max_shift, subsample, chunk_size)
+    ranges = row_ranges(rows, workers)
+    if workers == 1:
+        partials = list(map(worker, ranges))
+    else:
+        with Pool(workers) as pool:
+            partials = pool.map(worker, ranges)
+    return tuple(np.concatenate(parts) for parts in zip(*partials))
+
+def print_report(shifts: np.ndarray, correlations: np.ndarray, max_shift: int) -> None:
+    print("\n=== Alignment Report ===")
+    print(f"Traces: {len(shifts)}")
+    if len(shifts) == 0:
+        return
+    values, counts = np.unique(np.rint(shifts).astype(int), return_counts=True)
+    print(f"Shift range {shifts.min():+.2f} .. {shifts.max():+.2f}, mean {shifts.mean():+.2f}")
+    print("Shift histogram: " + ", ".join(f"{value:+d}: {count}" for value, count in zip(values, counts)))
+    at_limit = int(np.count_nonzero(np.abs(shifts) >= max_shift))
+    if at_limit:
+        print(f"{at_limit} traces hit --max-shift {max_shift}; widen it or move the window")
+    print(f"Window correlation with the reference: median {np.nanmedian(correlations):.4f}, "
+          f"min {np.nanmin(correlations):.4f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Align a trace store to a reference window (FFT cross-correlation)")
+    parser.add_argument('traces', help="trace store, aligned in place unless --output is given")
+    parser.add_argument('--output', help="write the aligned traces to this copy instead")
+    parser.add_argument('--window', type=int, nargs=2, metavar=('START', 'STOP'),
+                        help="reference samples to match (default: the whole trace)")
+    parser.add_argument('--max-shift', type=int, default=DEFAULT_MAX_SHIFT, help="largest shift searched")
+    parser.add_argument('--reference-traces', type=int, default=DEFAULT_REFERENCE_TRACES,
+                        help="build the reference from the first traces")
+    parser.add_argument('--subsample', action='store_true', help="fractional shifts (parabolic peak, linear resampling)")
+    parser.add_argument('--chunk-size', type=int, default=4096)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--shifts', help="save the shifts and window correlations to this .npz")
+    args = parser.parse_args()
+
+    shifts, correlations = run(args.traces, tuple(args.window) if args.window else None, args.max_shift,
+                               args.reference_traces, args.subsample, args.chunk_size, args.workers, args.output)
+    print_report(shifts, correlations, args.max_shift)
+    if args.shifts:
+        np.savez(args.shifts, shifts=shifts, correlation=correlations)
+        print(f"Wrote {args.shifts}")
+
+if __name__ == "__main__":
+    main()
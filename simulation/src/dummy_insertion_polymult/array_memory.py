@@ -0,0 +1,139 @@
+import math
+import numpy as np
+from typing import List, Union
+
+WORD_DTYPES = {8: np.uint8, 16: np.uint16, 32: np.uint32, 64: np.uint64}
+
+class ArrayPolynomialMemory:
+    """PolynomialMemory backed by a NumPy word array.
+
+    Same interface as memory.PolynomialMemory (which stays the reference
+    implementation) plus bulk scatter/gather and zero-copy export.
+    """
+    def __init__(self, total_bits: int, word_size: int = 32, debug_mode: bool = False):
+        if word_size not in WORD_DTYPES:
+            raise ValueError(f"Unsupported word size: {word_size} (expected one of {sorted(WORD_DTYPES)})")
+        self.total_bits = total_bits
+        self.word_size = word_size
+        self.dtype = np.dtype(WORD_DTYPES[word_size])
+        self.num_words = math.ceil(total_bits / word_size)
+        self.memory = np.zeros(self.num_words, dtype=self.dtype)
+        self.current_word_position = 0
+        self.debug_mode = debug_mode
+
+    def debug_print(self, message: str) -> None:
+        if self.debug_mode:
+            print(message)
+
+    def set_bit_positions(self, positions: Union[List[int], np.ndarray]) -> None:
+        """Set bits to 1 at given positions (bulk scatter)"""
+        positions = np.asarray(positions, dtype=np.int64)
+        positions = positions[(positions >= 0) & (positions < self.total_bits)]
+        word_idx = positions // self.word_size
+        bits = np.left_shift(np.ones(1, dtype=self.dtype),
+                             (positions % self.word_size).astype(self.dtype))
+        np.bitwise_or.at(self.memory, word_idx, bits)
+
+    def set_word_positions(self, words: List[int], start_position: int = None) -> None:
+        """Store a list of words starting from a specific position"""
+        if start_position is not None:
+            self.current_word_position = start_position
+
+        count = min(len(words), self.num_words - self.current_word_position)
+        if count <= 0:
+            return
+        end = self.current_word_position + count
+        self.memory[self.current_word_position:end] = np.asarray(words[:count], dtype=self.dtype)
+        self.current_word_position = end
+
+    def get_bit(self, position: int) -> int:
+        """Get bit value at given position"""
+        if position >= self.total_bits:
+            return 0
+        word_idx = position // self.word_size
+        bit_idx = position % self.word_size
+        return (int(self.memory[word_idx]) >> bit_idx) & 1
+
+    def get_word(self, word_idx: int) -> int:
+        """Get word at given index"""
+        if word_idx >= self.num_words:
+            return 0
+        return int(self.memory[word_idx])
+
+    def set_word(self, word_idx: int, value: int) -> None:
+        """Set word at given index"""
+        if word_idx < self.num_words:
+            old_value = int(self.memory[word_idx]) if self.debug_mode else None
+            self.memory[word_idx] = value
+
+            if self.debug_mode:
+                self.debug_print("\n=== Word Update Details ===")
+                self.debug_print(f"Word Index: {word_idx}")
+                if old_value is not None:
+                    self.debug_print(f"Old Value: {old_value:0{self.word_size}b} ({old_value})")
+                self.debug_print(f"New Value: {value:0{self.word_size}b} ({value})")
+                self.debug_print("========================\n")
+
+    def get_words(self, word_indices: Union[List[int], np.ndarray]) -> np.ndarray:
+        """Vectorized gather; indices past the end read as 0 like get_word"""
+        word_indices = np.asarray(word_indices, dtype=np.int64)
+        valid = word_indices < self.num_words
+        result = np.zeros(word_indices.shape, dtype=self.dtype)
+        result[valid] = self.memory[word_indices[valid]]
+        return result
+
+    def set_words(self, word_indices: Union[List[int], np.ndarray],
+                  values: Union[List[int], np.ndarray]) -> None:
+        """Vectorized scatter; indices past the end are dropped like set_word"""
+        word_indices = np.asarray(word_indices, dtype=np.int64)
+        values = np.broadcast_to(np.asarray(values, dtype=self.dtype), word_indices.shape)
+        valid = word_indices < self.num_words
+        self.memory[word_indices[valid]] = values[valid]
+
+    def get_positions(self) -> np.ndarray:
+        """Return the positions of all 1-bits below total_bits"""
+        bits = np.unpackbits(self.memory.astype(self.dtype.newbyteorder('<'), copy=False).view(np.uint8),
+                             bitorder='little')
+        return np.flatnonzero(bits[:self.total_bits])
+
+    def get_memory(self) -> List[int]:
+        """Get entire memory contents"""
+        return self.memory.tolist()
+
+    def as_memoryview(self) -> memoryview:
+        """Zero-copy view of the word array (native byte order)"""
+        return memoryview(self.memory)
+
+    def to_bytes(self, byteorder: str = 'little') -> bytes:
+        """Serialize the word array, e.g. for FPGA register writes"""
+        dtype = self.dtype.newbyteorder('<' if byteorder == 'little' else '>')
+        return self.memory.astype(dtype, copy=False).tobytes()
+
+    def write_mem(self, filename: str, radix: str = 'b') -> None:
+        """Write one word per line for $readmemb (radix 'b') or $readmemh (radix 'h')"""
+        if radix == 'b':
+            spec = f'0{self.word_size}b'
+        elif radix == 'h':
+            spec = f'0{self.word_size // 4}x'
+        else:
+            raise ValueError(f"Unsupported radix: {radix}")
+        lines = [format(word, spec) for word in self.memory.tolist()]
+        with open(filename, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+    def get_word_binary(self, word_idx: int) -> str:
+        """Get word at given index in binary format"""
+        return format(self.get_word(word_idx), f'0{self.word_size}b')
+
+    def __str__(self) -> str:
+        """String representation showing memory contents in binary"""
+        result = []
+        for i, word in enumerate(self.memory.tolist()):
+            if i == self.num_words - 1:
+                remaining_bits = self.total_bits - (i * self.word_size)
+                mask = (1 << remaining_bits) - 1
+                word &= mask
+
+            binary = format(word, f'0{self.word_size}b')
+            result.append(f"Word {i}: {binary}")
+        return "\n".join(result)
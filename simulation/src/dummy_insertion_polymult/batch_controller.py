@@ -0,0 +1,235 @@
+import math
+import numpy as np
+from typing import List, Optional
+
+from array_memory import WORD_DTYPES, ArrayPolynomialMemory
+from dummy_insertion import DummyInsertion
+from memory import PolynomialMemory
+from trace_recorder import EVENT_INIT_HIGH, EVENT_INIT_LOW, EVENT_ROUND
+
+def _dense_memory(total_bits: int, word_size: int):
+    """ArrayPolynomialMemory, or the list-backed PolynomialMemory for widths it has no dtype for"""
+    if word_size in WORD_DTYPES:
+        return ArrayPolynomialMemory(total_bits=total_bits, word_size=word_size)
+    return PolynomialMemory(total_bits=total_bits, word_size=word_size)
+
+class BatchController:
+    """Controller datapath for B independent multiplications in lock-step.
+
+    Row b of normal_words / sparse_words / acc holds dataset b. Each sparse
+    word step runs the initial-acc block and every round of all B datasets
+    as (B, rounds) array operations, with the same per-dataset results as
+    Controller.execute (either mode). Datasets with fewer sparse words
+    (num_sparse_words) sit out the remaining steps. As in Controller's fast
+    mode, words up to 32 bits are uint64 arrays and wider words (64, 128)
+    Python-int object arrays.
+
+    An optional observer sees every acc write, like Controller's trace hook:
+    observer.observe(event, rows, word_idx, valid, loaded, operands, shifted,
+    acc_before, acc_after). The arrays are (len(rows), k), with k = 1 for
+    the initial-acc events and one column per round (load_word_idx 1, 2, ...)
+    for EVENT_ROUND; valid marks the rounds a dataset runs. loaded is the
+    dense word read for the step and operands the four XOR adder inputs
+    (high_left, high_right, low_left, low_right; normal words 0,
+    num_words - 2, num_words - 1 and 0 for initial-acc events). shifted
+    holds the two words the adder extracts from them (normal_high_bits and
+    normal_low_bits in xor_adder.v); the adder is idle, so zero, for
+    initial-acc events.
+    """
+    def __init__(self, normal_words: np.ndarray, sparse_words: np.ndarray,
+                 num_sparse_words: Optional[np.ndarray] = None, acc_words: Optional[np.ndarray] = None,
+                 total_bits: int = 17669, shift_register_size: int = 19, observer=None, word_size: int = 32):
+        self.total_bits = total_bits
+        self.word_size = word_size
+        self.num_words = math.ceil(total_bits / self.word_size)
+        self.tail_bits = total_bits % self.word_size
+        if self.tail_bits == 0:
+            raise ValueError(f"total_bits {total_bits} is a multiple of the word size {word_size}")
+        self.word_mask = (1 << word_size) - 1
+        self.dtype = np.uint64 if word_size <= 32 else object
+        self.normal_words = np.asarray(normal_words).astype(self.dtype)
+        self.sparse_words = np.asarray(sparse_words, dtype=np.uint64)
+        self.batch_size = self.normal_words.shape[0]
+        if self.normal_words.shape != (self.batch_size, self.num_words):
+            raise ValueError(f"normal_words must have shape (B, {self.num_words}), got {self.normal_words.shape}")
+        if self.sparse_words.shape[0] != self.batch_size:
+            raise ValueError("sparse_words and normal_words need the same number of datasets")
+        if num_sparse_words is None:
+            num_sparse_words = np.full(self.batch_size, self.sparse_words.shape[1])
+        self.num_sparse_words = np.asarray(num_sparse_words, dtype=np.int64)
+        if acc_words is None:
+            acc_words = np.zeros((self.batch_size, self.num_words), dtype=np.uint64)
+        self.acc = np.array(acc_words).astype(self.dtype)
+        self.shift_register_size = shift_register_size
+        self.observer = observer
+
+    @classmethod
+    def from_positions(cls, r2_rows: np.ndarray, h_rows: List[List[int]], total_bits: int = 17669,
+                       num_dummy_pairs: Optional[int] = None, word_size: int = 32) -> 'BatchController':
+        """Dummy-insert and pack a (B, weight) r2 index matrix and load one h polynomial per dataset
+
+        Odd weights are padded per row as in DummyInsertion.pad_odd_weight, with
+        each accumulator starting at x^z * h.
+        """
+        dummy_inserter = DummyInsertion(acc_word_size=word_size, total_bits=total_bits)
+        r2_rows = np.asarray(r2_rows)
+        extra_positions = [None] * len(r2_rows)
+        if r2_rows.shape[1] % 2:
+            padded = [dummy_inserter.pad_odd_weight(row.tolist()) for row in r2_rows]
+            r2_rows = np.array([row for row, _ in padded])
+            extra_positions = [extra for _, extra in padded]
+        _, packed_words, _, num_words = dummy_inserter.process_batch(r2_rows, num_dummy_pairs)
+
+        num_dense_words = math.ceil(total_bits / word_size)
+        dtype = np.uint64 if word_size <= 32 else object
+        normal_words = np.zeros((len(h_rows), num_dense_words), dtype=dtype)
+        acc_words = np.zeros((len(h_rows), num_dense_words), dtype=dtype)
+        for b, (h_positions, extra) in enumerate(zip(h_rows, extra_positions)):
+            h_mem = _dense_memory(total_bits, word_size)
+            h_mem.set_bit_positions(h_positions)
+            normal_words[b] = h_mem.memory
+            if extra is not None:
+                acc_mem = _dense_memory(total_bits, word_size)
+                acc_mem.set_bit_positions(((np.asarray(h_positions, dtype=np.int64) + extra) % total_bits).tolist())
+                acc_words[b] = acc_mem.memory
+        return cls(normal_words, packed_words, num_words, acc_words, total_bits=total_bits, word_size=word_size)
+
+    def _initial_acc_words(self, normal, acc_shift_idx, shift):
+        """Vectorized Controller._initial_acc_word"""
+        word_size = self.word_size
+        acc_shift_idx = acc_shift_idx.astype(self.dtype)
+        shift_remainder = (shift % word_size).astype(self.dtype)
+        normal_word_zero = normal[:, 0]
+        normal_word_second_last = normal[:, -2]
+        normal_word_last = normal[:, -1]
+        scalar = np.uint64 if self.dtype is np.uint64 else int
+        one, size, tail_bits = scalar(1), scalar(word_size), scalar(self.tail_bits)
+        high_bits = normal_word_zero & ((one << acc_shift_idx) - one)
+
+        # high_shift % word_size >= tail_bits: high | tail of the last word | top of the second-last word
+        wide_shift = shift_remainder >= tail_bits
+        remaining_bits = np.where(wide_shift, shift_remainder - tail_bits, 0).astype(self.dtype)
+        low_bits = (normal_word_second_last >> (size - remaining_bits)) & ((one << remaining_bits) - one)
+        wide = (high_bits << (size - acc_shift_idx)) | \
+               ((normal_word_last & ((one << tail_bits) - one)) << remaining_bits) | low_bits
+
+        # high_shift % word_size < tail_bits: high | top shift_remainder bits of the tail
+        narrow_remainder = np.minimum(shift_remainder, tail_bits).astype(self.dtype)
+        narrow = (high_bits << narrow_remainder) | \
+                 ((normal_word_last >> (tail_bits - narrow_remainder)) & ((one << narrow_remainder) - one))
+        return np.where(wide_shift, wide, narrow) & self.word_mask
+
+    def _register_words(self, normal, load_word_idx, offsets, valid):
+        """Controller._register_words for every dataset: (B, rounds) shift register reads"""
+        size = np.minimum(load_word_idx + 1, self.shift_register_size)
+        slot = size - 1 - offsets
+        if np.any(valid & ((slot < -size) | (slot >= size))):
+            raise IndexError("list index out of range")
+        loaded_idx = load_word_idx - offsets
+        loaded_idx += size * (slot < 0)
+        loaded_idx[~valid] = 0
+        loaded_idx[loaded_idx >= self.num_words] -= self.num_words
+        words = np.take_along_axis(normal, loaded_idx, axis=1)
+        words[~valid] = 0
+        return words
+
+    def _extract_shifted(self, word_left, word_right, acc_shift_idx):
+        if self.dtype is object:
+            concat = (word_left << self.word_size) | word_right
+            return (concat >> acc_shift_idx.astype(object)) & self.word_mask
+        concat = (word_left << np.uint64(self.word_size)) | word_right
+        return (concat >> acc_shift_idx.astype(np.uint64)) & np.uint64(self.word_mask)
+
+    def process_word(self, word_idx: int) -> None:
+        """One sparse word (start_process) for every dataset that still has one"""
+        rows = np.flatnonzero(word_idx < self.num_sparse_words)
+        if rows.size == 0:
+            return
+        sparse_word = self.sparse_words[rows, word_idx]
+        high_shift = ((sparse_word >> np.uint64(16)) & np.uint64(0xFFFF)).astype(np.int64)
+        low_shift = (sparse_word & np.uint64(0xFFFF)).astype(np.int64)
+
+        word_size = self.word_size
+        acc_start_idx_high = high_shift // word_size
+        acc_shift_idx_high = word_size - high_shift % word_size
+        acc_start_idx_low = low_shift // word_size
+        acc_shift_idx_low = word_size - low_shift % word_size
+        high_low_diff = acc_start_idx_low - acc_start_idx_high
+
+        # Setup round block (the high and low writes may hit the same acc word)
+        normal = self.normal_words[rows]
+        for event, acc_start_idx, acc_shift_idx, shift in (
+                (EVENT_INIT_HIGH, acc_start_idx_high, acc_shift_idx_high, high_shift),
+                (EVENT_INIT_LOW, acc_start_idx_low, acc_shift_idx_low, low_shift)):
+            acc_before = self.acc[rows, acc_start_idx]
+            self.acc[rows, acc_start_idx] ^= self._initial_acc_words(normal, acc_shift_idx, shift)
+            if self.observer is not None:
+                zero = np.zeros_like(normal[:, :1])
+                operands = (normal[:, :1], normal[:, -2:-1], normal[:, -1:], zero)
+                self.observer.observe(event, rows, word_idx, np.ones((rows.size, 1), dtype=bool), normal[:, :1],
+                                      operands, (zero, zero), acc_before[:, None],
+                                      self.acc[rows, acc_start_idx][:, None])
+
+        # Rounds: load_word_idx = 1 .. num_words + high_low_diff - 1 per dataset
+        num_rounds = np.maximum(self.num_words + high_low_diff - 1, 0)
+        max_rounds = int(num_rounds.max(initial=0))
+        if max_rounds == 0:
+            return
+        load_word_idx = np.arange(1, max_rounds + 1, dtype=np.int32)[None, :]
+        in_round = load_word_idx <= num_rounds[:, None]
+
+        # _update_latency fires once, after the round that writes the last acc word
+        switch_idx = (self.num_words - 1 - acc_start_idx_high)[:, None]
+        switched = (load_word_idx > switch_idx) & (switch_idx >= 1)
+        high_wide = (high_shift % word_size >= self.tail_bits)[:, None]
+        low_wide = (low_shift % word_size >= self.tail_bits)[:, None]
+        high_latency = (switched & high_wide).astype(np.int32)
+        low_latency = (switched & low_wide).astype(np.int32)
+        tail_bits = self.tail_bits
+        high_shift_idx = np.where(switched, np.where(high_wide, acc_shift_idx_high[:, None] + tail_bits,
+                                                     tail_bits - high_shift[:, None] % word_size), acc_shift_idx_high[:, None])
+        low_shift_idx = np.where(switched, np.where(low_wide, acc_shift_idx_low[:, None] + tail_bits,
+                                                    tail_bits - low_shift[:, None] % word_size), acc_shift_idx_low[:, None])
+
+        diff = high_low_diff[:, None].astype(np.int32)
+        high_valid = in_round & (load_word_idx < self.num_words)
+        low_valid = in_round & (load_word_idx >= diff + 1)
+        high_left = self._register_words(normal, load_word_idx, high_latency, high_valid)
+        high_right = self._register_words(normal, load_word_idx, high_latency + 1, high_valid)
+        low_left = self._register_words(normal, load_word_idx, diff + low_latency, low_valid)
+        low_right = self._register_words(normal, load_word_idx, diff + 1 + low_latency, low_valid)
+
+        high_bits = self._extract_shifted(high_left, high_right, high_shift_idx)
+        low_bits = self._extract_shifted(low_left, low_right, low_shift_idx)
+        contribution = high_bits ^ low_bits
+        acc_idx = (load_word_idx + acc_start_idx_high[:, None]) % self.num_words
+        row_idx = np.broadcast_to(rows[:, None], acc_idx.shape)
+        if self.observer is not None:
+            self._observe_rounds(rows, word_idx, in_round, normal, load_word_idx, row_idx, acc_idx, contribution,
+                                 (high_left, high_right, low_left, low_right), (high_bits, low_bits))
+        np.bitwise_xor.at(self.acc, (row_idx[in_round], acc_idx[in_round]), contribution[in_round])
+
+    def _observe_rounds(self, rows, word_idx, in_round, normal, load_word_idx, row_idx, acc_idx, contribution,
+                        operands, shifted) -> None:
+        """Pass the round writes of one sparse word to the observer (before they are applied)"""
+        contribution = np.where(in_round, contribution, 0).astype(self.dtype)
+        acc_before = self.acc[row_idx, acc_idx]
+        # Rounds past num_words - 1 revisit the acc word written num_words rounds earlier
+        wrapped = contribution.shape[1] - self.num_words
+        if wrapped > 0:
+            acc_before[:, self.num_words:] ^= contribution[:, :wrapped]
+        loaded = np.take(normal, load_word_idx[0] % self.num_words, axis=1)
+        self.observer.observe(EVENT_ROUND, rows, word_idx, in_round, loaded, operands, shifted,
+                              acc_before, acc_before ^ contribution)
+
+    def execute(self) -> np.ndarray:
+        """Run every sparse word of every dataset; returns the (B, num_words) accumulators"""
+        for word_idx in range(int(self.num_sparse_words.max(initial=0))):
+            self.process_word(word_idx)
+        return self.acc
+
+    def acc_memory(self, dataset: int) -> ArrayPolynomialMemory:
+        """Accumulator of one dataset as a memory object (e.g. for ResultVerifier)"""
+        acc_mem = _dense_memory(self.total_bits, self.word_size)
+        acc_mem.memory[:] = self.acc[dataset].tolist()
+        return acc_mem
@@ -0,0 +1,130 @@
+import argparse
+import os
+from multiprocessing import Pool
+from typing import Iterable, List, Optional, Tuple
+
+from data_loader import DataLoader
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
+from main import multiply_and_verify, print_failure, print_summary
+
+# (dataset_num, success, missing, extra, error_rate, error)
+DatasetResult = Tuple[int, bool, int, int, float, Optional[str]]
+
+_loader: Optional[DataLoader] = None
+_shared_h_positions: Optional[List[int]] = None
+_mode = "fast"
+_params = HQC_128
+
+def _init_worker(y_file: str, h_file: Optional[str], s_file: Optional[str],
+                 h_positions: Optional[List[int]], mode: str, params: HQCParams) -> None:
+    global _loader, _shared_h_positions, _mode, _params
+    _loader = DataLoader(y_file, h_file, s_file)
+    _shared_h_positions = h_positions
+    _mode = mode
+    _params = params
+
+def run_dataset(dataset_num: int) -> DatasetResult:
+    """Worker entry point: load, multiply and verify one dataset.
+
+    Without an h file every row uses the shared h; without an s file the
+    expected product comes from the rotation reference.
+    """
+    try:
+        r2_positions, h_positions, result_positions = _loader.load(dataset_num)
+        if h_positions is None:
+            h_positions = _shared_h_positions
+        if result_positions is None:
+            result_positions = _params.reference().multiply(r2_positions, h_positions)
+        success, missing, extra, error_rate = multiply_and_verify(r2_positions, h_positions,
+                                                                  result_positions, mode=_mode, params=_params)
+    except (ValueError, IndexError) as e:
+        return dataset_num, False, 0, 0, 100.0, str(e)
+    return dataset_num, success, len(missing), len(extra), error_rate, None
+
+class BatchRunner:
+    def __init__(self, workers: Optional[int] = None, mode: str = "fast", chunksize: int = 8,
+                 verbose: bool = True, params: HQCParams = HQC_128):
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.params = params
+        self.chunksize = chunksize
+        self.verbose = verbose
+
+    def _report(self, result: DatasetResult) -> None:
+        dataset_num, success, missing, extra, error_rate, error = result
+        if success:
+            print(f"✓ Dataset {dataset_num} passed")
+        elif error is not None:
+            print(f"\n⚠️ WARNING: Dataset {dataset_num} raised: {error}")
+        else:
+            print_failure(dataset_num, missing, extra, error_rate)
+
+    def run(self, y_file: str, h_file: Optional[str] = None, s_file: Optional[str] = None,
+            h_positions: Optional[List[int]] = None,
+            dataset_indices: Optional[Iterable[int]] = None) -> Tuple[int, int, List[int], float]:
+        """Fan dataset indices out to the worker pool, report results as they finish and print the summary"""
+        if dataset_indices is None:
+            # Also builds the line index once, before the workers start
+            dataset_indices = range(DataLoader().num_rows(y_file))
+
+        total_datasets = 0
+        successful_tests = 0
+        failed_tests = []
+        total_error_rate = 0.0
+
+        initargs = (y_file, h_file, s_file, h_positions, self.mode, self.params)
+        with Pool(self.workers, initializer=_init_worker, initargs=initargs) as pool:
+            for result in pool.imap_unordered(run_dataset, dataset_indices, chunksize=self.chunksize):
+                dataset_num, success, _, _, error_rate, _ = result
+                total_datasets += 1
+                total_error_rate += error_rate
+                if success:
+                    successful_tests += 1
+                else:
+                    failed_tests.append(dataset_num)
+                if self.verbose or not success:
+                    self._report(result)
+
+        failed_tests.sort()
+        if total_datasets:
+            print_summary(total_datasets, successful_tests, failed_tests, total_error_rate)
+        return total_datasets, successful_tests, failed_tests, total_error_rate
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate many datasets against the Controller model in parallel")
+    parser.add_argument('--sparse-file', help="sparse index CSV (e.g. ./sparse_indices.csv); "
+                                              "expected results come from the rotation reference")
+    parser.add_argument('--h-file', default='./simulation/data/66/h_for_y_bits.csv')
+    parser.add_argument('--h-row', type=int, default=0, help="row of --h-file shared by all --sparse-file rows")
+    parser.add_argument('--y-file', default='./simulation/data/66/y_bits.csv')
+    parser.add_argument('--s-file', default='./simulation/data/66/s_bits.csv')
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--mode', choices=["fast", "cycle"], default="fast")
+    parser.add_argument('--chunksize', type=int, default=8)
+    parser.add_argument('--quiet', action='store_true', help="only report failing datasets")
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--word-size', type=int, help="datapath width (default: the parameter set's)")
+    args = parser.parse_args()
+
+    print("\n=== Starting Batch Dataset Test ===")
+    params = get_params(args.params).with_options(word_size=args.word_size)
+    runner = BatchRunner(workers=args.workers, mode=args.mode, chunksize=args.chunksize, verbose=not args.quiet,
+                         params=params)
+    loader = DataLoader()
+    try:
+        if args.sparse_file:
+            y_file, h_file, s_file = args.sparse_file, None, None
+            h_positions = loader.read_positions(args.h_file, args.h_row)
+        else:
+            y_file, h_file, s_file = args.y_file, args.h_file, args.s_file
+            h_positions = None
+        num_rows = loader.num_rows(y_file)
+    finally:
+        loader.close_files()
+
+    dataset_indices = range(num_rows if args.limit is None else min(args.limit, num_rows))
+    runner.run(y_file, h_file, s_file, h_positions, dataset_indices)
+
+if __name__ == "__main__":
+    main()
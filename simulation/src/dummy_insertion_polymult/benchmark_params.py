@@ -0,0 +1,75 @@
+import argparse
+import random
+import time
+from typing import List
+
+from hqc_params import PARAMETER_SETS, HQCParams, get_params
+from main import run_multiplication
+from result_verifier import ResultVerifier
+
+def random_operands(params: HQCParams, rng: random.Random) -> tuple[list[int], list[int]]:
+    """Sparse operand of weight w and a uniformly random dense h"""
+    sparse_positions = sorted(rng.sample(range(params.n), params.weight))
+    h_positions = [i for i in range(params.n) if rng.getrandbits(1)]
+    return sparse_positions, h_positions
+
+def benchmark(params: HQCParams, modes: List[str], trials: int, seed: int) -> dict:
+    """Mean wall time per multiplication for the reference and each Controller mode, plus model cycles"""
+    if not modes:
+        raise ValueError("benchmark needs at least one Controller mode")
+    if trials < 1:
+        raise ValueError("benchmark needs at least one trial")
+    rng = random.Random(seed)
+    operands = [random_operands(params, rng) for _ in range(trials)]
+    result = {'params': params, 'times': {}, 'verified': True}
+
+    start = time.perf_counter()
+    expected = [params.reference().multiply(sparse, h) for sparse, h in operands]
+    result['times']['reference'] = (time.perf_counter() - start) / trials
+
+    for mode in modes:
+        start = time.perf_counter()
+        controllers = [run_multiplication(sparse, h, mode=mode, params=params) for sparse, h in operands]
+        result['times'][mode] = (time.perf_counter() - start) / trials
+        result['verified'] &= all(ResultVerifier(controller.acc_mem, positions).matches()
+                                  for controller, positions in zip(controllers, expected))
+
+    result['sparse_words'] = sum(controller.sparse_mem.num_words for controller in controllers) / trials
+    result['cycles'] = sum(controller.cycle for controller in controllers) / trials
+    return result
+
+def print_results(results: List[dict], modes: List[str], clock_hz: float) -> None:
+    print("\n=== Parameter Set Benchmark ===")
+    header = f"{'set':8s} {'n':>6s} {'w':>4s} {'width':>5s} {'words':>6s} {'cycles':>10s} {'hw ms':>8s} {'ref ms':>8s}"
+    print(header + "".join(f" {mode + ' ms':>9s}" for mode in modes) + "  verified")
+    base = results[0]
+    for result in results:
+        params = result['params']
+        line = (f"{params.name:8s} {params.n:6d} {params.weight:4d} {params.word_size:5d} "
+                f"{result['sparse_words']:6.1f} {result['cycles']:10.0f} {result['cycles'] / clock_hz * 1e3:8.2f} "
+                f"{result['times']['reference'] * 1e3:8.2f}")
+        line += "".join(f" {result['times'][mode] * 1e3:9.2f}" for mode in modes)
+        print(line + f"  {'yes' if result['verified'] else 'NO'}")
+    print("\nScaling relative to the first row:")
+    for result in results[1:]:
+        ratios = ", ".join(f"{mode} x{result['times'][mode] / base['times'][mode]:.2f}" for mode in modes)
+        params = result['params']
+        print(f"{params.name}/{params.word_size}: cycles x{result['cycles'] / base['cycles']:.2f}, {ratios}")
+    print("===============================")
+
+def main():
+    parser = argparse.ArgumentParser(description="Runtime and cycle scaling of the Controller model across HQC sets")
+    parser.add_argument('--params', nargs='+', choices=sorted(PARAMETER_SETS), default=sorted(PARAMETER_SETS))
+    parser.add_argument('--word-size', type=int, nargs='+', default=[32])
+    parser.add_argument('--modes', nargs='+', choices=["fast", "cycle"], default=["fast", "cycle"])
+    parser.add_argument('--trials', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clock-mhz', type=float, default=10.0)
+    args = parser.parse_args()
+
+    results = [benchmark(get_params(name).with_options(word_size=word_size), args.modes, args.trials, args.seed)
+               for name in args.params for word_size in args.word_size]
+    print_results(results, args.modes, args.clock_mhz * 1e6)
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,113 @@
+import numpy as np
 from typing import List
 from memory import PolynomialMemory
 from xor_adder import XORAdder
-from shift_register import ShiftRegister
+from shift_register import RingShiftRegister
+from cycle_model import CycleModel
+from trace_recorder import EVENT_INIT_HIGH, EVENT_INIT_LOW, EVENT_ROUND, TraceRecorder
 
 class Controller:
-    def __init__(self, normal_mem, sparse_mem, acc_mem, debug_mode: bool = False):
+    def __init__(self, normal_mem, sparse_mem, acc_mem, debug_mode: bool = False, shift_register=None,
+                 trace: TraceRecorder = None, cycle_model: CycleModel = None):
         self.normal_mem = normal_mem
         self.sparse_mem = sparse_mem
         self.acc_mem = acc_mem
-        self.word_size = 32
+        # Datapath width follows the dense memories; the wrap-around uses the n mod word_size tail bits
+        self.word_size = normal_mem.word_size
+        if acc_mem.word_size != self.word_size:
+            raise ValueError(f"normal_mem and acc_mem word sizes differ: {self.word_size} vs {acc_mem.word_size}")
+        self.tail_bits = normal_mem.total_bits % self.word_size
+        if self.tail_bits == 0:
+            raise ValueError(f"total_bits {normal_mem.total_bits} must not be a multiple of the word size")
+        self.word_mask = (1 << self.word_size) - 1
+        # Fast mode word type: uint64 holds two concatenated words up to 32 bits, wider ones use Python ints
+        self.fast_dtype = np.uint64 if self.word_size <= 32 else object
         self.debug_mode = debug_mode
-        self.xor_adder = XORAdder(debug_mode=debug_mode)
-        self.shift_register = ShiftRegister(debug_mode=debug_mode)
+        self.xor_adder = XORAdder(debug_mode=debug_mode, word_size=self.word_size)
+        # Any object with the ShiftRegister interface; shift_register.ShiftRegister is the list-backed reference
+        self.shift_register = shift_register or RingShiftRegister(debug_mode=debug_mode, word_size=self.word_size)
         self.low_latency = 0
         self.high_latency = 0
         self.high_low_diff = 0
+        # Structured event trace; when None (and debug_mode is off) the round loop has no hooks at all
+        self.trace = trace
+        # Clock cycles of controller.v; word_cycles holds the cost of every processed sparse word
+        self.cycle_model = cycle_model or CycleModel()
+        self.cycle = 0
+        self.word_cycles = []
+        self.current_word_idx = 0
+        self.current_sparse_word = 0
 
     def debug_print(self, message: str) -> None:
         if self.debug_mode:
             print(message)
 
-    def _process_initial_acc(self, normal_word_zero, acc_start_idx, acc_shift_idx, high_shift):
-            """Process shift when shift is >= 5 for both high and low cases"""
+    def _process_initial_acc(self, normal_word_zero, acc_start_idx, acc_shift_idx, high_shift,
+                             event: int = EVENT_INIT_HIGH):
+            """XOR the wrapped word into the first acc word of a high or low shift"""
+            acc_word_first = self.acc_mem.get_word(acc_start_idx - 1)
+            combined_word = self._initial_acc_word(normal_word_zero, acc_shift_idx, high_shift)
+            result = acc_word_first ^ combined_word
+            
+            # print(f"Result: {result:032b}")
+            self.acc_mem.set_word(acc_start_idx - 1, result)
+
+            self.cycle += self.cycle_model.initial_cycles(event)
+            if self.trace is not None:
+                self.trace.record(self.cycle, event, self.current_word_idx, self.current_sparse_word, -1,
+                                  acc_start_idx - 1, normal_word_zero,
+                                  self.normal_mem.get_word(len(self.normal_mem.memory) - 2),
+                                  self.normal_mem.get_word(len(self.normal_mem.memory) - 1), 0,
+                                  acc_word_first, result)
+            return result
+
+    def _initial_acc_word(self, normal_word_zero, acc_shift_idx, high_shift):
+            """Build the wrapped word XOR-ed into the first acc word of a shift"""
+            word_size = self.word_size
+            tail_bits = self.tail_bits
             normal_word_551 = self.normal_mem.get_word(len(self.normal_mem.memory) - 2)
             normal_word_552 = self.normal_mem.get_word(len(self.normal_mem.memory) - 1)
-            acc_word_first = self.acc_mem.get_word(acc_start_idx - 1)
 
-            if high_shift % 32 >= 5:
+            if high_shift % word_size >= tail_bits:
                 # Extract high bits
                 high_bits = normal_word_zero & ((1 << acc_shift_idx) - 1)
                 
                 # Extract mid bits
-                mid_bits = normal_word_552 & ((1 << 5) - 1)
+                mid_bits = normal_word_552 & ((1 << tail_bits) - 1)
                 
                 # Extract low bits
-                remaining_bits = 32 - 5 - acc_shift_idx
-                low_bits = (normal_word_551 >> (32 - remaining_bits)) & ((1 << remaining_bits) - 1)
+                remaining_bits = word_size - tail_bits - acc_shift_idx
+                low_bits = (normal_word_551 >> (word_size - remaining_bits)) & ((1 << remaining_bits) - 1)
                 
                 # Combine bits
-                combined_word = (high_bits << (32 - acc_shift_idx)) | \
+                combined_word = (high_bits << (word_size - acc_shift_idx)) | \
                             (mid_bits << remaining_bits) | \
                             low_bits
-                
-                # XOR operation
-                result = acc_word_first ^ combined_word
             else:
-                shift_remainder = high_shift % 32
+                shift_remainder = high_shift % word_size
                 high_bits = normal_word_zero & ((1 << acc_shift_idx) - 1)
                 
                 # Extract low bits
-                low_bits = (normal_word_552 >> (5 - shift_remainder)) & ((1 << shift_remainder) - 1)
+                low_bits = (normal_word_552 >> (tail_bits - shift_remainder)) & ((1 << shift_remainder) - 1)
 
                 combined_word = (high_bits << shift_remainder) | low_bits
 
-                result = acc_word_first ^ combined_word
-            
-            # print(f"Result: {result:032b}")
-            self.acc_mem.set_word(acc_start_idx - 1, result)
-            return result
+            return combined_word
               
     def process_word(self, word_idx: int) -> None:
         sparse_word = self.sparse_mem.get_word(word_idx)
+        self.current_word_idx = word_idx
+        self.current_sparse_word = sparse_word
         
         # Extract shift amounts
         high_shift = (sparse_word >> 16) & 0xFFFF
         low_shift = sparse_word & 0xFFFF
         
         # Calculate indices and differences
-        acc_start_idx_high = (high_shift // 32)
-        acc_shift_idx_high = 32 - (high_shift % 32)
-        acc_start_idx_low = (low_shift // 32)
-        acc_shift_idx_low = 32 - (low_shift % 32)
+        acc_start_idx_high = (high_shift // self.word_size)
+        acc_shift_idx_high = self.word_size - (high_shift % self.word_size)
+        acc_start_idx_low = (low_shift // self.word_size)
+        acc_shift_idx_low = self.word_size - (low_shift % self.word_size)
         self.high_low_diff = acc_start_idx_low - acc_start_idx_high
 
         if self.debug_mode:
@@ -89,16 +126,75 @@ class Controller:
             self.debug_print("===================================\n")
         
         # Setup round block
+        start_cycle = self.cycle
         normal_word_zero = self.normal_mem.get_word(0)
         self.shift_register.add_word(normal_word_zero, 0)
 
         self._process_initial_acc(normal_word_zero, acc_start_idx_high + 1, acc_shift_idx_high, high_shift)
 
-        self._process_initial_acc(normal_word_zero, acc_start_idx_low + 1, acc_shift_idx_low, low_shift)  
+        self._process_initial_acc(normal_word_zero, acc_start_idx_low + 1, acc_shift_idx_low, low_shift,
+                                  event=EVENT_INIT_LOW)
 
         # Process words
         self.low_latency = self.high_latency = 0
+        self.cycle += self.cycle_model.LOAD_ZERO_CYCLES
+
+        if self.trace is None and not self.debug_mode:
+            self._run_rounds(acc_start_idx_high, acc_shift_idx_high, acc_shift_idx_low, high_shift, low_shift)
+        else:
+            self._run_rounds_instrumented(acc_start_idx_high, acc_shift_idx_high, acc_shift_idx_low,
+                                          high_shift, low_shift)
+
+        self.cycle += self.cycle_model.END_CYCLES
+        self.word_cycles.append(self.cycle - start_cycle)
+
+    def _run_rounds(self, acc_start_idx_high, acc_shift_idx_high, acc_shift_idx_low, high_shift, low_shift):
+        """Round loop of process_word without debug or trace hooks (same results as the instrumented loop)"""
+        num_words = self.acc_mem.num_words
+        normal_num_words = self.normal_mem.num_words
+        high_low_diff = self.high_low_diff
+        switch_idx = num_words - 1 - acc_start_idx_high
+        get_normal_word = self.normal_mem.get_word
+        get_acc_word = self.acc_mem.get_word
+        set_acc_word = self.acc_mem.set_word
+        add_word = self.shift_register.add_word
+        register_size = self.shift_register.size
+        get_word_pair = self.shift_register.get_word_pair
+        xor_words = self.xor_adder.xor_words
+        round_cycles = self.cycle_model.round_cycles()
+
+        for load_word_idx in range(1, normal_num_words + high_low_diff):
+            normal_idx = load_word_idx % num_words
+            acc_idx = (load_word_idx + acc_start_idx_high) % num_words
+            add_word(get_normal_word(normal_idx), normal_idx)
+            shift_register_size = register_size()
+
+            # _get_index
+            if load_word_idx >= normal_num_words:
+                high_left_idx = high_right_idx = None
+            else:
+                high_left_idx = shift_register_size - 1 - self.high_latency
+                high_right_idx = high_left_idx - 1
+            if load_word_idx < high_low_diff + 1:
+                low_left_idx = low_right_idx = None
+            else:
+                low_left_idx = shift_register_size - high_low_diff - 1 - self.low_latency
+                low_right_idx = low_left_idx - 1
+
+            high_left, high_right, low_left, low_right = get_word_pair(
+                high_left_idx, high_right_idx, low_left_idx, low_right_idx)
+            set_acc_word(acc_idx, xor_words(high_left, high_right, low_left, low_right,
+                                            get_acc_word(acc_idx), acc_shift_idx_high, acc_shift_idx_low))
+            self.cycle += round_cycles
+
+            if load_word_idx == switch_idx:
+                acc_shift_idx_high, acc_shift_idx_low = self._update_latency(acc_start_idx_high, load_word_idx,
+                                                                            high_shift, low_shift,
+                                                                            acc_shift_idx_high, acc_shift_idx_low)
 
+    def _run_rounds_instrumented(self, acc_start_idx_high, acc_shift_idx_high, acc_shift_idx_low,
+                                 high_shift, low_shift):
+        """Round loop of process_word with debug output and trace recording"""
         for load_word_idx in range(1, self.normal_mem.num_words + self.high_low_diff):#self.normal_mem.num_words + self.high_low_diff
             
             normal_word_high = self.normal_mem.get_word(load_word_idx % self.acc_mem.num_words)
@@ -114,10 +210,17 @@ class Controller:
             
             xor_result = self.xor_adder.process_xor(
                 high_left, high_right, low_left, low_right,
-                acc_word, (acc_shift_idx_high, acc_shift_idx_high + 31), (acc_shift_idx_low, acc_shift_idx_low + 31))
+                acc_word, (acc_shift_idx_high, acc_shift_idx_high + self.word_size - 1),
+                (acc_shift_idx_low, acc_shift_idx_low + self.word_size - 1))
             
             self.acc_mem.set_word((load_word_idx + acc_start_idx_high) % self.acc_mem.num_words, xor_result)
 
+            self.cycle += self.cycle_model.round_cycles()
+            if self.trace is not None:
+                self.trace.record(self.cycle, EVENT_ROUND, self.current_word_idx, self.current_sparse_word,
+                                  load_word_idx, (load_word_idx + acc_start_idx_high) % self.acc_mem.num_words,
+                                  high_left, high_right, low_left, low_right, acc_word, xor_result)
+
             # Update latency
             acc_shift_idx_high, acc_shift_idx_low = self._update_latency(acc_start_idx_high, load_word_idx,
                                                            high_shift, low_shift,
@@ -157,31 +260,130 @@ class Controller:
         """Update latency values based on current state"""
         
         if acc_start_idx_high + load_word_idx == (self.acc_mem.num_words - 1):
+            self.cycle += self.cycle_model.UPDATE_LATENCY_CYCLES
             
-            if high_shift % 32 >= 5:
+            if high_shift % self.word_size >= self.tail_bits:
                 self.high_latency = 1
-                acc_shift_idx_high += 5
+                acc_shift_idx_high += self.tail_bits
             else:
                 self.high_latency = 0
-                acc_shift_idx_high = 5 - high_shift % 32
+                acc_shift_idx_high = self.tail_bits - high_shift % self.word_size
             
-            if low_shift % 32 >= 5:
+            if low_shift % self.word_size >= self.tail_bits:
                 self.low_latency = 1
-                acc_shift_idx_low += 5
+                acc_shift_idx_low += self.tail_bits
             else:
                 self.low_latency = 0
-                acc_shift_idx_low = 5 - low_shift % 32
+                acc_shift_idx_low = self.tail_bits - low_shift % self.word_size
                 
         return acc_shift_idx_high, acc_shift_idx_low
 
-    def execute(self, iter = None) -> None:
-        """Execute the multiplication operation"""
+    def _register_words(self, normal, load_word_idx, offsets, valid):
+        """Words read at `offsets` back from the newest shift register slot, for every round at once.
+
+        Mirrors ShiftRegister indexing, including Python's wrap-around for negative
+        slots while the low side reaches further back than the register holds.
+        """
+        size = np.minimum(load_word_idx + 1, self.shift_register.max_size)
+        slot = size - 1 - offsets
+        if np.any(valid & ((slot < -size) | (slot >= size))):
+            raise IndexError("list index out of range")
+        loaded_idx = np.where(slot >= 0, load_word_idx - offsets, load_word_idx + size - offsets)
+        words = normal[np.where(valid, loaded_idx, 0) % self.acc_mem.num_words]
+        return np.where(valid, words, 0)
+
+    def _extract_shifted(self, word_left, word_right, acc_shift_idx):
+        """Vectorized XORAdder.concatenate_words + extract_bits"""
+        if self.fast_dtype is object:
+            concat = (word_left << self.word_size) | word_right
+            return (concat >> acc_shift_idx.astype(object)) & self.word_mask
+        concat = (word_left << np.uint64(self.word_size)) | word_right
+        return (concat >> acc_shift_idx.astype(np.uint64)) & np.uint64(self.word_mask)
+
+    def process_word_fast(self, word_idx: int, normal: np.ndarray, acc: np.ndarray) -> None:
+        """Same acc result as process_word, with all rounds of one sparse word as array operations"""
+        sparse_word = self.sparse_mem.get_word(word_idx)
+        high_shift = (sparse_word >> 16) & 0xFFFF
+        low_shift = sparse_word & 0xFFFF
+        num_words = self.acc_mem.num_words
+        word_size = self.word_size
+        tail_bits = self.tail_bits
+
+        acc_start_idx_high = (high_shift // word_size)
+        acc_shift_idx_high = word_size - (high_shift % word_size)
+        acc_start_idx_low = (low_shift // word_size)
+        acc_shift_idx_low = word_size - (low_shift % word_size)
+        self.high_low_diff = acc_start_idx_low - acc_start_idx_high
+
+        # Setup round block
+        to_word = int if self.fast_dtype is object else np.uint64
+        normal_word_zero = int(normal[0])
+        acc[acc_start_idx_high] ^= to_word(self._initial_acc_word(normal_word_zero, acc_shift_idx_high, high_shift))
+        acc[acc_start_idx_low] ^= to_word(self._initial_acc_word(normal_word_zero, acc_shift_idx_low, low_shift))
+
+        # _update_latency fires once, after the round that writes the last acc word
+        num_rounds = max(self.normal_mem.num_words + self.high_low_diff - 1, 0)
+        switch_idx = num_words - 1 - acc_start_idx_high
+        word_cycles = self.cycle_model.sparse_word_cycles(num_rounds, 1 <= switch_idx <= num_rounds)
+        self.cycle += word_cycles
+        self.word_cycles.append(word_cycles)
 
-        if iter is None:
-            for i in range(self.sparse_mem.num_words):
+        load_word_idx = np.arange(1, num_rounds + 1)
+        if load_word_idx.size == 0:
+            return
+
+        switched = (load_word_idx > switch_idx) & (switch_idx >= 1)
+        if high_shift % word_size >= tail_bits:
+            high_latency, high_shift_after = 1, acc_shift_idx_high + tail_bits
+        else:
+            high_latency, high_shift_after = 0, tail_bits - high_shift % word_size
+        if low_shift % word_size >= tail_bits:
+            low_latency, low_shift_after = 1, acc_shift_idx_low + tail_bits
+        else:
+            low_latency, low_shift_after = 0, tail_bits - low_shift % word_size
+        high_latency = np.where(switched, high_latency, 0)
+        low_latency = np.where(switched, low_latency, 0)
+        high_shift_idx = np.where(switched, high_shift_after, acc_shift_idx_high)
+        low_shift_idx = np.where(switched, low_shift_after, acc_shift_idx_low)
+
+        high_valid = load_word_idx < self.normal_mem.num_words
+        low_valid = load_word_idx >= self.high_low_diff + 1
+        high_left = self._register_words(normal, load_word_idx, high_latency, high_valid)
+        high_right = self._register_words(normal, load_word_idx, high_latency + 1, high_valid)
+        low_left = self._register_words(normal, load_word_idx, self.high_low_diff + low_latency, low_valid)
+        low_right = self._register_words(normal, load_word_idx, self.high_low_diff + 1 + low_latency, low_valid)
+
+        contribution = self._extract_shifted(high_left, high_right, high_shift_idx) ^ \
+                       self._extract_shifted(low_left, low_right, low_shift_idx)
+        np.bitwise_xor.at(acc, (load_word_idx + acc_start_idx_high) % num_words, contribution)
+
+    def _execute_fast(self, num_sparse_words: int) -> None:
+        normal = np.array(self.normal_mem.get_memory(), dtype=self.fast_dtype)
+        initial = np.array(self.acc_mem.get_memory(), dtype=self.fast_dtype)
+        acc = initial.copy()
+        for i in range(num_sparse_words):
+            self.process_word_fast(i, normal, acc)
+
+        for word_idx in np.flatnonzero(acc != initial):
+            self.acc_mem.set_word(int(word_idx), int(acc[word_idx]))
+
+    def execute(self, iter = None, mode: str = "cycle") -> None:
+        """Execute the multiplication operation
+
+        mode="cycle" steps the datapath word by word like controller.v,
+        mode="fast" computes each sparse word's contribution as array operations
+        and leaves acc_mem exactly as the cycle mode would. It has no round hooks,
+        so a trace recorder or debug_mode needs the cycle mode.
+        """
+        num_sparse_words = self.sparse_mem.num_words if iter is None else iter
+
+        if mode == "fast" and (self.trace is not None or self.debug_mode):
+            raise ValueError("mode='fast' records no trace or debug output; use mode='cycle'")
+        if mode == "fast":
+            self._execute_fast(num_sparse_words)
+        elif mode == "cycle":
+            for i in range(num_sparse_words):
                 self.shift_register.clear()
                 self.process_word(i)
         else:
-            for i in range(iter):
-                self.shift_register.clear()
-                self.process_word(i)
\ No newline at end of file
+            raise ValueError(f"Unknown execution mode: {mode}")
\ No newline at end of file
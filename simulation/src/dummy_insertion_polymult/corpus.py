@@ -0,0 +1,194 @@
+"""Binary corpus files for sparse index sets and dense polynomials.
+
+Sparse file: 16-byte header (magic b'SPIX', version, row width, rows, total_bits)
+followed by fixed-size records of a uint16 index count and `width` uint16
+indices (unused slots are 0xFFFF).
+
+Dense file: 16-byte header (magic b'DNPK', version, reserved, rows, total_bits)
+followed by one bit-packed row of ceil(total_bits / 64) little-endian uint64
+words per polynomial (bit i of the polynomial is bit i % 64 of word i // 64).
+
+All integers are little-endian. The writers stream rows in chunks and fill
+in the row count last. Both readers memory-map the file, so opening
+a corpus of any size costs only the header read.
+"""
+import argparse
+import struct
+import numpy as np
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Union
+
+SPARSE_MAGIC = b'SPIX'
+DENSE_MAGIC = b'DNPK'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')  # magic, version, width/reserved, rows, total_bits
+ROWS_OFFSET = 8  # byte offset of rows in HEADER
+PAD_INDEX = 0xFFFF
+CHUNK_ROWS = 4096
+
+def sparse_record_dtype(width: int) -> np.dtype:
+    return np.dtype([('count', '<u2'), ('indices', '<u2', (width,))])
+
+def dense_row_words(total_bits: int) -> int:
+    return (total_bits + 63) // 64
+
+def sparse_header(width: int, rows: int, total_bits: int) -> bytes:
+    return HEADER.pack(SPARSE_MAGIC, VERSION, width, rows, total_bits)
+
+def dense_header(rows: int, total_bits: int) -> bytes:
+    return HEADER.pack(DENSE_MAGIC, VERSION, 0, rows, total_bits)
+
+def pack_positions(positions: Union[List[int], np.ndarray], total_bits: int) -> np.ndarray:
+    """One dense row (bit positions) as packed little-endian uint64 words"""
+    positions = np.asarray(positions, dtype=np.int64)
+    bits = np.zeros(dense_row_words(total_bits) * 64, dtype=np.uint8)
+    bits[positions[(positions >= 0) & (positions < total_bits)]] = 1
+    return np.packbits(bits, bitorder='little').view('<u8')
+
+def read_magic(filename: str) -> bytes:
+    with open(filename, 'rb') as f:
+        return f.read(4)
+
+def _read_header(filename: str, magic: bytes):
+    with open(filename, 'rb') as f:
+        header = HEADER.unpack(f.read(HEADER.size))
+    if header[0] != magic:
+        raise ValueError(f"{filename} is not a {magic.decode()} corpus file")
+    if header[1] != VERSION:
+        raise ValueError(f"Unsupported corpus version {header[1]} in {filename}")
+    return header
+
+def _read_csv_rows(csv_filename: str) -> Iterator[List[int]]:
+    with open(csv_filename, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield [int(x) for x in line.split(',')]
+
+def _csv_width(csv_filename: str) -> int:
+    """Largest number of entries in a row, without parsing them"""
+    with open(csv_filename, 'r') as f:
+        return max((line.count(',') + 1 for line in f if line.strip()), default=0)
+
+def patch_rows(f, rows: int) -> None:
+    """Write the final row count into the header of an open corpus file"""
+    f.seek(ROWS_OFFSET)
+    f.write(struct.pack('<I', rows))
+
+def write_sparse(filename: str, rows: Iterable[Iterable[int]], total_bits: int = 17669,
+                 width: Optional[int] = None, chunk_rows: int = CHUNK_ROWS) -> None:
+    """Write sparse index sets as fixed-width uint16 records, chunk_rows at a time
+
+    The record width must be known before the first record. Without width
+    the rows are collected first to find it; pass it to stream a corpus of
+    any size in bounded memory.
+    """
+    if total_bits > PAD_INDEX:
+        raise ValueError(f"total_bits {total_bits} does not fit uint16 indices")
+    if width is None:
+        rows = [list(row) for row in rows]
+        width = max((len(row) for row in rows), default=0)
+    rows = iter(rows)
+    dtype = sparse_record_dtype(width)
+    count = 0
+    with open(filename, 'wb') as f:
+        f.write(sparse_header(width, 0, total_bits))
+        while True:
+            chunk = [list(row) for row in islice(rows, chunk_rows)]
+            if not chunk:
+                break
+            records = np.zeros(len(chunk), dtype=dtype)
+            records['indices'] = PAD_INDEX
+            for i, row in enumerate(chunk):
+                if len(row) > width:
+                    raise ValueError(f"Row {count + i} has {len(row)} indices, the records hold {width}")
+                if any(not 0 <= index < total_bits for index in row):
+                    raise ValueError(f"Row {count + i} has an index outside 0 .. {total_bits - 1}")
+                records['count'][i] = len(row)
+                records['indices'][i, :len(row)] = row
+            records.tofile(f)
+            count += len(chunk)
+        patch_rows(f, count)
+
+def write_dense(filename: str, rows: Iterable[Iterable[int]], total_bits: int = 17669,
+                chunk_rows: int = CHUNK_ROWS) -> None:
+    """Write dense polynomials (given as 1-bit positions) as packed bit vectors, chunk_rows at a time"""
+    rows = iter(rows)
+    row_bytes = dense_row_words(total_bits) * 8
+    count = 0
+    with open(filename, 'wb') as f:
+        f.write(dense_header(0, total_bits))
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                break
+            bits = np.zeros((len(chunk), row_bytes * 8), dtype=np.uint8)
+            for i, row in enumerate(chunk):
+                positions = np.asarray(list(row), dtype=np.int64)
+                bits[i, positions[positions < total_bits]] = 1
+            np.packbits(bits, axis=1, bitorder='little').tofile(f)
+            count += len(chunk)
+        patch_rows(f, count)
+
+def convert_sparse_csv(csv_filename: str, filename: str, total_bits: int = 17669) -> None:
+    write_sparse(filename, _read_csv_rows(csv_filename), total_bits, width=_csv_width(csv_filename))
+
+def convert_dense_csv(csv_filename: str, filename: str, total_bits: int = 17669) -> None:
+    write_dense(filename, _read_csv_rows(csv_filename), total_bits)
+
+class SparseCorpus:
+    def __init__(self, filename: str):
+        _, _, self.width, self.num_rows, self.total_bits = _read_header(filename, SPARSE_MAGIC)
+        self.records = np.memmap(filename, dtype=sparse_record_dtype(self.width), mode='r',
+                                 offset=HEADER.size, shape=(self.num_rows,))
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def positions(self, row: int) -> np.ndarray:
+        """Indices of one row (view into the mapped file)"""
+        record = self.records[row]
+        return record['indices'][:record['count']]
+
+    def index_matrix(self) -> np.ndarray:
+        """(rows, width) index matrix; slots past each row's count hold 0xFFFF"""
+        return self.records['indices']
+
+class DenseCorpus:
+    def __init__(self, filename: str):
+        _, _, _, self.num_rows, self.total_bits = _read_header(filename, DENSE_MAGIC)
+        self.row_words = dense_row_words(self.total_bits)
+        self.rows = np.memmap(filename, dtype='<u8', mode='r', offset=HEADER.size,
+                              shape=(self.num_rows, self.row_words))
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def packed(self, row: int) -> np.ndarray:
+        """Packed uint64 words of one row (view into the mapped file)"""
+        return self.rows[row]
+
+    def words(self, row: int, word_size: int = 32) -> np.ndarray:
+        """Row as word_size-bit memory words (8/16/32/64), the layout PolynomialMemory uses"""
+        num_words = -(-self.total_bits // word_size)
+        return self.rows[row].view(f'<u{word_size // 8}')[:num_words]
+
+    def positions(self, row: int) -> np.ndarray:
+        bits = np.unpackbits(self.rows[row].view(np.uint8), bitorder='little')
+        return np.flatnonzero(bits[:self.total_bits])
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert position CSV files to binary corpus files")
+    parser.add_argument('kind', choices=['sparse', 'dense'])
+    parser.add_argument('csv_file')
+    parser.add_argument('output')
+    parser.add_argument('--total-bits', type=int, default=17669)
+    args = parser.parse_args()
+
+    if args.kind == 'sparse':
+        convert_sparse_csv(args.csv_file, args.output, args.total_bits)
+    else:
+        convert_dense_csv(args.csv_file, args.output, args.total_bits)
+    print(f"Converted {args.csv_file} -> {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Correlation power analysis of the sparse indices on simulated traces.
+
+For a candidate index p the Controller's XOR adder extracts, in the round
+that writes acc word J, the 32-bit word J of x^p * h (normal_high_bits or
+normal_low_bits in xor_adder.v). That is the circular window of h starting
+at bit (32 * J - p) mod n, for every J, the tail word num_words - 1
+included. Its Hamming weight is the hypothesis. Over all p it is a
+sliding-window popcount of h, so every candidate 0..n-1 costs O(n) per
+trace (window_weights).
+
+Consecutive rounds write consecutive acc words, and 32 * (J + 1) - p =
+32 * J - (p - 32). So candidate p - 32 predicts p's words one round later,
+and the two cannot be told apart, except across the wrap from acc word
+num_words - 1 to word 0. There the window start moves 32 * num_words - n
+(27) bits less than the alias expects. The default target words are that
+pair, -1 and 0 (num_words - 1 and 0), expected in consecutive samples.
+For every alias p + 32m one of them is off by 27 bits. A start sample scores
+the weaker of the two correlations (pattern_scores), so an alias that matches
+one word exactly, e.g. on the single-window sample of a step's last round,
+still scores low. A candidate's score is its best start. Neighbours p +- 1
+share 31 of the 32 window bits and score just below a real index, so the
+ranking puts local peaks first (peak_scores).
+
+Only steps whose rounds write both wrap words can be attacked: indices in
+the first or last acc word are written there by the initial-acc block, and
+the wrap must fall inside the simulated window. covered_indices lists the
+processed indices that qualify, and the report scores against those.
+
+CorrelationAccumulator keeps the sums of h, h^2, t, t^2 and h * t, the
+last as a (candidates, samples) BLAS matrix product per chunk of traces.
+Workers take blocks of candidates, and each streams the whole trace file
+(.npy or trace store) through a memmap. Scores are taken at each checkpoint
+trace count, to see how many traces an attack needs. The traces must hold
+the 'shift' source.
+
+The known h of trace i comes from the simulator that wrote the set
+(TraceSimulator.from_metadata(...).trace_input(start + i)). The report
+marks which ranked candidates are real indices of y and which are dummies
+the datapath also processes. Runs with different --num-dummy-pairs in
+leakage_simulator.py give the comparison with and without extra dummies.
+"""
+import argparse
+import json
+import os
+from functools import partial
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from leakage_simulator import TraceSimulator
+from tvla import open_traces
+
+# The acc words on either side of the wrap (-1 is num_words - 1; see the module docstring)
+DEFAULT_TARGET_WORDS = (-1, 0)
+
+class CorrelationAccumulator:
+    """Running sums for Pearson correlation of C hypothesis columns with S trace samples"""
+    def __init__(self, candidates: int, samples: int):
+        self.count = 0
+        self.sum_h = np.zeros(candidates)
+        self.sum_h2 = np.zeros(candidates)
+        self.sum_t = np.zeros(samples)
+        self.sum_t2 = np.zeros(samples)
+        self.sum_ht = np.zeros((candidates, samples))
+
+    def update(self, hypotheses: np.ndarray, traces: np.ndarray) -> None:
+        """Add (rows, candidates) hypotheses and the matching (rows, samples) traces"""
+        hypotheses = np.asarray(hypotheses, dtype=np.float64)
+        traces = np.asarray(traces, dtype=np.float64)
+        self.count += len(traces)
+        self.sum_h += hypotheses.sum(axis=0)
+        self.sum_h2 += np.einsum('ij,ij->j', hypotheses, hypotheses)
+        self.sum_t += traces.sum(axis=0)
+        self.sum_t2 += np.einsum('ij,ij->j', traces, traces)
+        self.sum_ht += hypotheses.T @ traces
+
+    def merge(self, other: 'CorrelationAccumulator') -> 'CorrelationAccumulator':
+        self.count += other.count
+        for name in ('sum_h', 'sum_h2', 'sum_t', 'sum_t2', 'sum_ht'):
+            getattr(self, name)[...] += getattr(other, name)
+        return self
+
+    def correlation(self) -> np.ndarray:
+        """(candidates, samples) Pearson correlation; 0 where a side has no variance"""
+        n = self.count
+        covariance = self.sum_ht - np.outer(self.sum_h, self.sum_t) / n
+        deviation_h = np.sqrt(np.maximum(self.sum_h2 - self.sum_h ** 2 / n, 0.0))
+        deviation_t = np.sqrt(np.maximum(self.sum_t2 - self.sum_t ** 2 / n, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rho = covariance / np.outer(deviation_h, deviation_t)
+        return np.nan_to_num(rho, nan=0.0, posinf=0.0, neginf=0.0)
+
+def h_bits(packed_rows: np.ndarray, n: int) -> np.ndarray:
+    """(rows, n) bits of packed uint64 rows"""
+    return np.unpackbits(np.ascontiguousarray(packed_rows, dtype='<u8').view(np.uint8).reshape(len(packed_rows), -1),
+                         axis=1, bitorder='little')[:, :n]
+
+def window_weights(bits: np.ndarray, width: int = 32) -> np.ndarray:
+    """(rows, n): popcount of bits u .. u + width - 1 (mod n) for every start u"""
+    n = bits.shape[1]
+    extended = np.concatenate([bits, bits[:, :width]], axis=1)
+    prefix = np.zeros((len(bits), n + width + 1), dtype=np.int32)
+    np.cumsum(extended, axis=1, out=prefix[:, 1:])
+    return prefix[:, width:width + n] - prefix[:, :n]
+
+def index_hypotheses(weights: np.ndarray, candidates: np.ndarray, word: int, word_size: int = 32) -> np.ndarray:
+    """(rows, len(candidates)) HW of word `word` of x^p * h for each candidate p"""
+    n = weights.shape[1]
+    return weights[:, (word * word_size - candidates) % n]
+
+def word_offsets(target_words: Sequence[int], num_words: int) -> Tuple[List[int], List[int]]:
+    """Target words mod num_words and the sample offset of each relative to the first"""
+    words = [word % num_words for word in target_words]
+    return words, [(word - words[0]) % num_words for word in words]
+
+def pattern_scores(correlations: List[np.ndarray], offsets: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Best weakest-word correlation of the pattern over its start sample, and that start, per candidate
+
+    The pattern holds only if every word correlates with the same sign, so a
+    start scores the smallest |rho| of the words (0 if their signs differ).
+    """
+    span = correlations[0].shape[1] - max(offsets)
+    if span <= 0:
+        raise ValueError(f"Traces are shorter than the word pattern ({max(offsets) + 1} samples)")
+    aligned = [rho[:, offset:offset + span] for rho, offset in zip(correlations, offsets)]
+    combined = np.maximum(np.minimum.reduce(aligned), -np.maximum.reduce(aligned))
+    combined = np.maximum(combined, 0.0)
+    return combined.max(axis=1), combined.argmax(axis=1)
+
+def covered_indices(simulator: TraceSimulator,
+                    target_words: Sequence[int] = DEFAULT_TARGET_WORDS) -> Dict[int, List[int]]:
+    """Processed indices whose target-word rounds all lie in the trace window, with their first-word samples
+
+    A dummy processed in two steps can be covered twice. Every trace runs
+    the same sparse words, so a step's samples are its two initial-acc
+    writes and then rounds load_word_idx = 1, 2, ... in order. The high
+    index extracts acc word J in round (J - high // 32) mod num_words, the
+    low index in the same round or num_words later.
+    """
+    num_words = simulator.params.num_words
+    words, offsets = word_offsets(target_words, num_words)
+    covered = {}
+    position = 0
+    for sparse_word in simulator.sparse_words.tolist():
+        high, low = (sparse_word >> 16) & 0xFFFF, sparse_word & 0xFFFF
+        diff = low // 32 - high // 32
+        rounds = max(num_words + diff - 1, 0)
+        for index, is_low in ((high, False), (low, True)):
+            load_word_idx = [(word - high // 32) % num_words for word in words]
+            if is_low:
+                load_word_idx = [idx + num_words if idx < diff + 1 else idx for idx in load_word_idx]
+            valid = all(1 <= idx <= rounds and (is_low or idx < num_words) for idx in load_word_idx)
+            samples = [position + 1 + idx - simulator.offset for idx in load_word_idx]
+            if valid and [sample - samples[0] for sample in samples] == offsets and \
+                    samples[0] >= 0 and samples[-1] < simulator.samples:
+                covered.setdefault(index, []).append(samples[0])
+        position += 2 + rounds
+    return covered
+
+def attack_block(trace_file: str, metadata: dict, target_words: Tuple[int, ...], chunk_size: int,
+                 checkpoints: Tuple[int, ...], candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Worker entry point: (len(checkpoints), C) scores and best samples for one candidate block"""
+    traces = open_traces(trace_file)
+    simulator = TraceSimulator.from_metadata(metadata)
+    n = metadata['n']
+    target_words, offsets = word_offsets(target_words, simulator.params.num_words)
+    rows = checkpoints[-1]
+    accumulators = [CorrelationAccumulator(len(candidates), traces.shape[1]) for _ in target_words]
+    scores = np.zeros((len(checkpoints), len(candidates)))
+    best_samples = np.zeros((len(checkpoints), len(candidates)), dtype=np.int64)
+    bounds = sorted(set(range(0, rows, chunk_size)) | set(checkpoints) | {0})
+    checkpoint = 0
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        packed = np.stack([simulator.trace_input(metadata['start'] + i)[0] for i in range(start, stop)])
+        weights = window_weights(h_bits(packed, n))
+        chunk = traces[start:stop]
+        for accumulator, word in zip(accumulators, target_words):
+            accumulator.update(index_hypotheses(weights, candidates, word), chunk)
+        if stop == checkpoints[checkpoint]:
+            scores[checkpoint], best_samples[checkpoint] = pattern_scores(
+                [accumulator.correlation() for accumulator in accumulators], offsets)
+            checkpoint += 1
+    return scores, best_samples
+
+def run(trace_file: str, metadata: dict, target_words: Sequence[int] = DEFAULT_TARGET_WORDS, chunk_size: int = 1024,
+        checkpoints: Optional[Sequence[int]] = None, candidates: Optional[np.ndarray] = None,
+        block_size: int = 2048, workers: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, List[int]]:
+    """Scores and best samples of every candidate, (len(checkpoints), C) each, and the checkpoints"""
+    if not metadata['sources'].get('shift'):
+        raise ValueError(f"The traces were simulated without the 'shift' source ({sorted(metadata['sources'])}), "
+                         "which is what the hypotheses predict; add it to leakage_simulator.py --sources")
+    rows = len(open_traces(trace_file))
+    checkpoints = sorted({min(int(c), rows) for c in (checkpoints or [rows]) if c > 0})
+    candidates = np.arange(metadata['n']) if candidates is None else np.asarray(candidates)
+    blocks = [candidates[i:i + block_size] for i in range(0, len(candidates), block_size)]
+    worker = partial(attack_block, trace_file, metadata, tuple(target_words), chunk_size, tuple(checkpoints))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = list(map(worker, blocks))
+    else:
+        with Pool(workers) as pool:
+            results = pool.map(worker, blocks)
+    scores = np.concatenate([block_scores for block_scores, _ in results], axis=1)
+    best_samples = np.concatenate([block_samples for _, block_samples in results], axis=1)
+    return scores, best_samples, checkpoints
+
+def peak_scores(scores: np.ndarray) -> np.ndarray:
+    """Scores with every candidate below an adjacent one (p - 1 or p + 1) moved after all local peaks
+
+    Expects consecutive candidates along the last axis. A real index p beats
+    its neighbours, whose windows share 31 of its 32 bits, so this keeps
+    p + 1 and p - 1 out of the top ranks.
+    """
+    left = np.concatenate([np.full(scores.shape[:-1] + (1,), -np.inf), scores[..., :-1]], axis=-1)
+    right = np.concatenate([scores[..., 1:], np.full(scores.shape[:-1] + (1,), -np.inf)], axis=-1)
+    return np.where((scores >= left) & (scores >= right), scores, scores - 1.0)
+
+def rank_candidates(scores: np.ndarray) -> np.ndarray:
+    """Candidate positions by descending score, local peaks first (peak_scores)"""
+    return np.argsort(-peak_scores(scores), kind='stable')
+
+def index_ranks(scores: np.ndarray, candidates: np.ndarray, positions: Sequence[int]) -> Dict[int, int]:
+    """Rank (0 = best) of each given index among the candidates"""
+    order = candidates[rank_candidates(scores)]
+    rank_of = {int(candidate): rank for rank, candidate in enumerate(order)}
+    return {int(pos): rank_of[int(pos)] for pos in positions if int(pos) in rank_of}
+
+def print_report(scores: np.ndarray, best_samples: np.ndarray, checkpoints: List[int], candidates: np.ndarray,
+                 metadata: dict, target_words: Sequence[int] = DEFAULT_TARGET_WORDS, top: int = 20) -> None:
+    simulator = TraceSimulator.from_metadata(metadata)
+    y = set(metadata['y'])
+    dummies = set(simulator.processed_positions) - y
+    in_range = set(candidates.tolist())
+    covered = {index: samples for index, samples in covered_indices(simulator, target_words).items()
+               if index in in_range}
+    covered_y = sorted(set(covered) & y)
+    k = len(covered)
+    print("\n=== CPA Report ===")
+    print(f"The window covers the target words of {k} processed indices "
+          f"({len(covered_y)} of y, {k - len(covered_y)} dummies)")
+    if k == 0:
+        print("Nothing to recover: move --offset / --samples over a step's acc wrap")
+    print(f"{'traces':>8s} {'covered in top k':>17s} {'y in top k':>11s} {'median covered rank':>20s}")
+    for scores_at, count in zip(scores, checkpoints):
+        top_k = set(candidates[rank_candidates(scores_at)[:k]].tolist())
+        ranks = list(index_ranks(scores_at, candidates, sorted(covered)).values())
+        median = f"{int(np.median(ranks))}" if ranks else "-"
+        print(f"{count:8d} {len(top_k & set(covered)):13d}/{k:<3d} {len(top_k & y):7d}/{len(covered_y):<3d} "
+              f"{median:>20s}")
+
+    print(f"\nTop {top} candidates after {checkpoints[-1]} traces:")
+    for rank, column in enumerate(rank_candidates(scores[-1])[:top]):
+        candidate = int(candidates[column])
+        kind = "y" if candidate in y else ("dummy" if candidate in dummies else "")
+        if candidate in covered:
+            kind += f" (wrap at sample {', '.join(map(str, covered[candidate]))})"
+        print(f"{rank:4d}  index {candidate:6d}  |rho| {scores[-1, column]:.4f}  "
+              f"sample {int(best_samples[-1, column]):6d}  {kind}")
+
+def main():
+    parser = argparse.ArgumentParser(description="CPA of the sparse indices on simulated power traces")
+    parser.add_argument('trace_dir', help="leakage_simulator.py output (traces.npy and metadata.json)")
+    parser.add_argument('--traces', help="trace file to attack instead of trace_dir/traces.npy (e.g. a trace store)")
+    parser.add_argument('--target-words', type=int, nargs='+', default=list(DEFAULT_TARGET_WORDS),
+                        help="acc words of the hypothesis pattern (negative: from num_words)")
+    parser.add_argument('--checkpoints', type=int, nargs='+', help="trace counts to score at (default: all traces)")
+    parser.add_argument('--candidates', type=int, nargs=2, metavar=('FIRST', 'STOP'),
+                        help="candidate range (default: 0 .. n - 1)")
+    parser.add_argument('--chunk-size', type=int, default=1024)
+    parser.add_argument('--block-size', type=int, default=2048, help="candidates per worker task")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="save the scores and best samples to this .npz")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.trace_dir, 'metadata.json')) as f:
+        metadata = json.load(f)
+    trace_file = args.traces or os.path.join(args.trace_dir, 'traces.npy')
+    candidates = np.arange(*args.candidates) if args.candidates else np.arange(metadata['n'])
+    scores, best_samples, checkpoints = run(trace_file, metadata, args.target_words, args.chunk_size,
+                                            args.checkpoints, candidates, args.block_size, args.workers)
+    print_report(scores, best_samples, checkpoints, candidates, metadata, args.target_words, args.top)
+    if args.output:
+        np.savez(args.output, scores=scores, best_samples=best_samples, checkpoints=checkpoints,
+                 candidates=candidates)
+        print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from typing import List
+
+from trace_recorder import EVENT_INIT_HIGH, EVENT_INIT_LOW
+
+class CycleModel:
+    """Clock-cycle cost of hardware/controller.v for one sparse word (one start_process).
+
+    The handshakes with shift_register.v and initial_shift_processor.v are
+    counted as in the RTL, assuming memories that answer in the cycle after the
+    address is set; mem_wait_cycles adds stall cycles to every ROUND_ADD.
+    """
+    # IDLE, READ_SPARSE, READ_NORMAL_ZERO, READ_NORMAL_551, READ_NORMAL_552, READ_ACC_HIGH
+    READ_CYCLES = 6
+    # PROCESS_HIGH/PROCESS_LOW: start registered -> EXTRACT_HIGH -> COMBINE_HIGH -> processing_done
+    INITIAL_PROCESS_CYCLES = 4
+    WRITE_CYCLES = 1          # WRITE_HIGH / WRITE_LOW
+    READ_ACC_LOW_CYCLES = 1
+    LOAD_ZERO_CYCLES = 3      # ROUND_LOAD_ZERO waits for word_accepted
+    # LOAD_WAIT 1, LOAD 1, ADD 1, ADD_WAIT_WAIT 1, ADD_WAIT 2 (word_accepted), GET_INDEX 1, GET_PAIR 3 (pair_valid)
+    ROUND_CYCLES = 10
+    UPDATE_LATENCY_CYCLES = 1
+    END_CYCLES = 3            # last ROUND_LOAD_WAIT, ROUND_LOAD (end detected), ROUND_END
+
+    def __init__(self, mem_wait_cycles: int = 0):
+        self.mem_wait_cycles = mem_wait_cycles
+
+    def initial_cycles(self, event: int) -> int:
+        """Cycles from the previous step up to WRITE_HIGH (event=EVENT_INIT_HIGH) or WRITE_LOW"""
+        if event == EVENT_INIT_HIGH:
+            return self.READ_CYCLES + self.INITIAL_PROCESS_CYCLES + self.WRITE_CYCLES
+        return self.READ_ACC_LOW_CYCLES + self.INITIAL_PROCESS_CYCLES + self.WRITE_CYCLES
+
+    def round_cycles(self) -> int:
+        return self.ROUND_CYCLES + self.mem_wait_cycles
+
+    def sparse_word_cycles(self, num_rounds: int, latency_switched: bool) -> int:
+        """Total cycles of one sparse word with num_rounds = num_words + high_low_diff - 1"""
+        return (self.initial_cycles(EVENT_INIT_HIGH) + self.initial_cycles(EVENT_INIT_LOW) +
+                self.LOAD_ZERO_CYCLES + num_rounds * self.round_cycles() +
+                (self.UPDATE_LATENCY_CYCLES if latency_switched else 0) + self.END_CYCLES)
+
+def throughput_report(word_cycles: List[int], clock_hz: float = 10e6) -> dict:
+    """Cycle totals of one multiplication and the resulting time/throughput at clock_hz"""
+    total_cycles = sum(word_cycles)
+    seconds = total_cycles / clock_hz
+    return {
+        'sparse_words': len(word_cycles),
+        'total_cycles': total_cycles,
+        'min_word_cycles': min(word_cycles, default=0),
+        'max_word_cycles': max(word_cycles, default=0),
+        'clock_hz': clock_hz,
+        'seconds': seconds,
+        'multiplications_per_second': 1 / seconds if seconds else float('inf'),
+    }
+
+def print_report(report: dict) -> None:
+    print("\n=== Cycle Report ===")
+    print(f"Sparse words: {report['sparse_words']}")
+    print(f"Total cycles: {report['total_cycles']}")
+    print(f"Cycles per sparse word: {report['min_word_cycles']} - {report['max_word_cycles']}")
+    print(f"Time at {report['clock_hz'] / 1e6:g} MHz: {report['seconds'] * 1e3:.3f} ms")
+    print(f"Throughput: {report['multiplications_per_second']:.1f} multiplications/s")
+    print("====================")
@@ -0,0 +1,35 @@
+import argparse
+
+from cycle_model import CycleModel, print_report, throughput_report
+from data_loader import DataLoader
+from hqc_params import HQC_128, PARAMETER_SETS, get_params
+from main import run_multiplication
+from result_verifier import ResultVerifier
+
+def main():
+    parser = argparse.ArgumentParser(description="Cycle count and throughput of the Controller model")
+    parser.add_argument('--y-file', default='./simulation/data/66/y_bits.csv')
+    parser.add_argument('--h-file', default='./simulation/data/66/h_for_y_bits.csv')
+    parser.add_argument('--s-file', default='./simulation/data/66/s_bits.csv')
+    parser.add_argument('--dataset', type=int, default=0)
+    parser.add_argument('--clock-mhz', type=float, default=10.0, help="CW305 PLL output (10 MHz in the notebook)")
+    parser.add_argument('--mem-wait-cycles', type=int, default=0)
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--word-size', type=int, help="datapath width (default: the parameter set's)")
+    args = parser.parse_args()
+    params = get_params(args.params).with_options(word_size=args.word_size)
+
+    loader = DataLoader(args.y_file, args.h_file, args.s_file)
+    try:
+        r2_positions, h_positions, result_positions = loader.load(args.dataset)
+    finally:
+        loader.close_files()
+
+    cycle_model = CycleModel(mem_wait_cycles=args.mem_wait_cycles)
+    controller = run_multiplication(r2_positions, h_positions, mode="fast", cycle_model=cycle_model, params=params)
+    success = ResultVerifier(controller.acc_mem, result_positions).matches()
+    print(f"Dataset {args.dataset}: {'passed' if success else 'FAILED'} verification")
+    print_report(throughput_report(controller.word_cycles, args.clock_mhz * 1e6))
+
+if __name__ == "__main__":
+    main()
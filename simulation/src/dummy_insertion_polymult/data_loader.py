@@ -1,7 +1,23 @@
+import mmap
+import os
+from array import array
+from typing import Optional
+
+import numpy as np
+
+from corpus import DENSE_MAGIC, SPARSE_MAGIC, DenseCorpus, SparseCorpus, pack_positions, read_magic
+
 class DataLoader:
-    def __init__(self):
+    def __init__(self, y_file: Optional[str] = None, h_file: Optional[str] = None,
+                 s_file: Optional[str] = None):
         self.file_pointers = {}  # 파일별 현재 위치를 추적
         self.current_line = {}   # 파일별 현재 라인 번호
+        self.y_file = y_file
+        self.h_file = h_file
+        self.s_file = s_file
+        self.line_offsets = {}   # 파일별 라인 시작 오프셋 인덱스
+        self.mapped_files = {}   # 파일별 (file, mmap)
+        self.corpora = {}        # 파일별 바이너리 코퍼스 (CSV면 None)
         
     def _initialize_file(self, filename: str) -> None:
         """파일 초기화 및 포인터 설정"""
@@ -26,6 +42,103 @@ class DataLoader:
             print(f"Error reading file {filename}: {str(e)}")
             return []
             
+    @staticmethod
+    def index_filename(filename: str) -> str:
+        return filename + '.idx'
+
+    def build_index(self, filename: str) -> array:
+        """라인 시작 오프셋 인덱스를 만들고 <파일>.idx 로 저장합니다 (마지막 항목은 파일 끝)."""
+        offsets = array('Q', [0])
+        with open(filename, 'rb') as f:
+            data = f.read()
+        pos = data.find(b'\n')
+        while pos != -1:
+            offsets.append(pos + 1)
+            pos = data.find(b'\n', pos + 1)
+        if offsets[-1] != len(data):
+            offsets.append(len(data))
+
+        try:
+            with open(self.index_filename(filename), 'wb') as f:
+                offsets.tofile(f)
+        except OSError:
+            pass  # 읽기 전용 위치면 메모리 인덱스만 사용
+        return offsets
+
+    def _load_index(self, filename: str) -> array:
+        """저장된 인덱스가 CSV보다 최신이면 재사용하고, 아니면 새로 만듭니다."""
+        if filename in self.line_offsets:
+            return self.line_offsets[filename]
+
+        index_file = self.index_filename(filename)
+        offsets = None
+        if os.path.exists(index_file) and os.path.getmtime(index_file) >= os.path.getmtime(filename):
+            offsets = array('Q')
+            with open(index_file, 'rb') as f:
+                offsets.frombytes(f.read())
+            if not offsets or offsets[-1] != os.path.getsize(filename):
+                offsets = None
+        if offsets is None:
+            offsets = self.build_index(filename)
+
+        self.line_offsets[filename] = offsets
+        return offsets
+
+    def _map_file(self, filename: str) -> mmap.mmap:
+        if filename not in self.mapped_files:
+            f = open(filename, 'rb')
+            self.mapped_files[filename] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return self.mapped_files[filename][1]
+
+    def _corpus(self, filename: str):
+        """바이너리 코퍼스 파일이면 메모리 매핑된 코퍼스를, CSV면 None을 반환합니다."""
+        if filename not in self.corpora:
+            magic = read_magic(filename)
+            if magic == SPARSE_MAGIC:
+                self.corpora[filename] = SparseCorpus(filename)
+            elif magic == DENSE_MAGIC:
+                self.corpora[filename] = DenseCorpus(filename)
+            else:
+                self.corpora[filename] = None
+        return self.corpora[filename]
+
+    def num_rows(self, filename: str) -> int:
+        """파일의 라인(데이터셋) 수를 반환합니다."""
+        corpus = self._corpus(filename)
+        if corpus is not None:
+            return len(corpus)
+        return len(self._load_index(filename)) - 1
+
+    def read_positions(self, filename: str, dataset_idx: int) -> list[int]:
+        """dataset_idx 번째 라인의 비트 위치들을 O(1)로 읽어옵니다 (CSV 또는 바이너리 코퍼스)."""
+        corpus = self._corpus(filename)
+        if corpus is not None:
+            if not 0 <= dataset_idx < len(corpus):
+                raise IndexError(f"Dataset {dataset_idx} out of range for {filename} ({len(corpus)} rows)")
+            return corpus.positions(dataset_idx).tolist()
+
+        offsets = self._load_index(filename)
+        if not 0 <= dataset_idx < len(offsets) - 1:
+            raise IndexError(f"Dataset {dataset_idx} out of range for {filename} ({len(offsets) - 1} rows)")
+        line = self._map_file(filename)[offsets[dataset_idx]:offsets[dataset_idx + 1]].strip()
+        if line:
+            return [int(x) for x in line.split(b',')]
+        return []
+
+    def read_packed(self, filename: str, dataset_idx: int, total_bits: int) -> np.ndarray:
+        """dataset_idx 번째 dense 다항식을 packed uint64 워드로 읽어옵니다 (DenseCorpus면 복사 없이 그대로)."""
+        corpus = self._corpus(filename)
+        if isinstance(corpus, DenseCorpus):
+            if not 0 <= dataset_idx < len(corpus):
+                raise IndexError(f"Dataset {dataset_idx} out of range for {filename} ({len(corpus)} rows)")
+            return corpus.packed(dataset_idx)
+        return pack_positions(self.read_positions(filename, dataset_idx), total_bits)
+
+    def load(self, dataset_idx: int) -> tuple[list[int], Optional[list[int]], Optional[list[int]]]:
+        """y/h/s 세 파일에서 dataset_idx 번째 데이터셋을 한 번에 읽어옵니다 (지정되지 않은 파일은 None)."""
+        return tuple(self.read_positions(filename, dataset_idx) if filename else None
+                     for filename in (self.y_file, self.h_file, self.s_file))
+
     def reset_file(self, filename: str) -> None:
         """파일 포인터를 처음으로 되돌립니다."""
         if filename in self.file_pointers:
@@ -37,4 +150,9 @@ class DataLoader:
         for fp in self.file_pointers.values():
             fp.close()
         self.file_pointers.clear()
-        self.current_line.clear()
\ No newline at end of file
+        self.current_line.clear()
+        for f, mapped in self.mapped_files.values():
+            mapped.close()
+            f.close()
+        self.mapped_files.clear()
+        self.corpora.clear()
\ No newline at end of file
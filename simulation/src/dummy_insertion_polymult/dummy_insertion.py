@@ -1,9 +1,17 @@
-from typing import List, Tuple, Dict
+import heapq
+import math
+import numpy as np
+from typing import List, Tuple, Dict, Optional
 
 class DummyInsertion:
-    def __init__(self, word_size: int = 16, gap_threshold: int = 1024):
+    def __init__(self, word_size: int = 16, gap_threshold: int = 1024, max_word_distance: int = 16,
+                 acc_word_size: int = 32, total_bits: int = 17669):
         self.word_size = word_size
         self.gap_threshold = gap_threshold
+        # Controller reads the low word max_word_distance + 2 slots back in the 19-slot shift register
+        self.max_word_distance = max_word_distance
+        self.acc_word_size = acc_word_size
+        self.total_bits = total_bits
         
     def find_pair_gaps(self, positions: List[int], num_dummy_pairs: int) -> List[Tuple[int, int, int]]:
         """Find gaps between consecutive positions within pairs (a0,a1) and (a2,a3)"""
@@ -54,6 +62,233 @@ class DummyInsertion:
             
         return new_positions
     
+    def pad_odd_weight(self, positions: List[int]) -> Tuple[List[int], Optional[int]]:
+        """Make the index count even for the pair datapath.
+
+        Pairs can only represent an even number of indices, so an odd set gets
+        its smallest unused position z added and z is returned (None if the
+        count was already even). The product then carries an extra x^z * h,
+        which the caller cancels by starting the accumulator at x^z * h.
+        """
+        positions = sorted(positions)
+        if len(positions) % 2 == 0:
+            return positions, None
+        used = set(positions)
+        extra = next(z for z in range(len(positions) + 1) if z not in used)
+        return sorted(positions + [extra]), extra
+
+    def max_pair_end(self, start: int) -> int:
+        """Largest low position a pair starting at `start` may have (gap and word-distance limits)"""
+        word_limit = (start // self.acc_word_size + self.max_word_distance + 1) * self.acc_word_size - 1
+        return min(start + self.gap_threshold, word_limit)
+
+    def split_gap(self, start: int, end: int) -> List[int]:
+        """Fewest dummy positions that split start..end into pairs within the limits.
+
+        Greedy: each dummy goes as far as the previous point allows, which
+        needs no more dummies than any other placement.
+        """
+        dummies = []
+        current = start
+        while self.max_pair_end(current) < end:
+            current = self.max_pair_end(current)
+            dummies.append(current)
+        return dummies
+
+    def plan_dummies(self, positions: List[int], num_dummy_pairs: Optional[int] = None) -> List[List[int]]:
+        """Dummy positions to insert into each pair gap (a0,a1), (a2,a3), ...
+
+        Without num_dummy_pairs the plan is the minimum that keeps every pair
+        within the limits. With it, the remaining dummies halve the largest
+        pieces one by one, so exactly num_dummy_pairs are used (e.g. to keep
+        the packed word count fixed).
+        """
+        positions = sorted(positions)
+        plan = [self.split_gap(positions[i], positions[i+1]) for i in range(0, len(positions)-1, 2)]
+
+        if num_dummy_pairs is None:
+            return plan
+        required = sum(len(dummies) for dummies in plan)
+        if num_dummy_pairs < required:
+            raise ValueError(f"{num_dummy_pairs} dummy pairs cannot satisfy the gap limits; "
+                             f"at least {required} are needed")
+        if num_dummy_pairs > required and not plan:
+            raise ValueError("No pair gap to insert dummy pairs into")
+
+        heap = []
+        for pair, dummies in enumerate(plan):
+            points = [positions[2*pair]] + dummies + [positions[2*pair + 1]]
+            heap.extend((start - end, pair, start, end) for start, end in zip(points, points[1:]))
+        heapq.heapify(heap)
+        for _ in range(num_dummy_pairs - required):
+            _, pair, start, end = heapq.heappop(heap)
+            middle = (start + end) // 2
+            plan[pair].append(middle)
+            heapq.heappush(heap, (start - middle, pair, start, middle))
+            heapq.heappush(heap, (middle - end, pair, middle, end))
+        return [sorted(dummies) for dummies in plan]
+
+    def last_word_start(self) -> int:
+        """First position of the last (tail_bits wide) dense word"""
+        return (math.ceil(self.total_bits / self.acc_word_size) - 1) * self.acc_word_size
+
+    def reroute_last_word_pairs(self, positions: List[int]) -> List[int]:
+        """Rewrite pairs (a, b), a < b, whose high index a lies in the last dense word.
+
+        Such a pair writes the last acc word in the setup block, so the
+        Controller (like controller.v) never reaches the round that switches
+        to the wrapped word alignment and every later round is misaligned.
+        x^a + x^b = (x^d + x^a) + (x^d + x^b) with the dummy d = a - acc_word_size
+        moves a and b into low halves, which the datapath handles.
+        """
+        last_word_start = self.last_word_start()
+        new_positions = []
+        for i in range(0, len(positions) - 1, 2):
+            high, low = positions[i], positions[i+1]
+            if high >= last_word_start and low > high:
+                dummy_pos = high - self.acc_word_size
+                new_positions.extend([dummy_pos, high, dummy_pos, low])
+            else:
+                new_positions.extend([high, low])
+        if len(positions) % 2:
+            new_positions.append(positions[-1])
+        return new_positions
+
+    def min_dummy_pairs(self, positions: List[int]) -> int:
+        return sum(len(dummies) for dummies in self.plan_dummies(positions))
+
+    def insert_planned_dummies(self, positions: List[int], num_dummy_pairs: Optional[int] = None) -> List[int]:
+        """Insert the dummy pairs of plan_dummies (minimum count unless num_dummy_pairs is given)"""
+        positions = sorted(positions)
+        plan = self.plan_dummies(positions, num_dummy_pairs)
+
+        new_positions = []
+        for pair, dummies in enumerate(plan):
+            new_positions.append(positions[2*pair])
+            for dummy_pos in dummies:
+                new_positions.extend([dummy_pos, dummy_pos])
+            new_positions.append(positions[2*pair + 1])
+
+        if len(positions) % 2:
+            new_positions.append(positions[-1])
+        return self.reroute_last_word_pairs(new_positions)
+
+    def process_batch(self, index_matrix: np.ndarray,
+                      num_dummy_pairs: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """process_indices for every row of a (rows, weight) index matrix at once
+
+        Returns (positions, packed_words, dummy_mask, num_words): positions with
+        dummies as (rows, 2 * max_words) int64 padded with -1, the 16/16-bit
+        packed words as (rows, max_words) uint32 padded with 0, a bool mask of
+        the dummy entries of positions, and each row's packed word count.
+        Rows match process_indices exactly.
+        """
+        index_matrix = np.sort(np.asarray(index_matrix, dtype=np.int64), axis=1)
+        num_rows, weight = index_matrix.shape
+        num_pairs = weight // 2
+        pair_start = index_matrix[:, 0:2*num_pairs:2].ravel()
+        pair_end = index_matrix[:, 1:2*num_pairs:2].ravel()
+
+        # Greedy split (split_gap) over the gaps that still need a dummy
+        gap_ids, dummies = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        active = np.arange(pair_start.size)
+        current = pair_start
+        while active.size:
+            reach = np.minimum(current + self.gap_threshold,
+                               (current // self.acc_word_size + self.max_word_distance + 1) * self.acc_word_size - 1)
+            needed = reach < pair_end[active]
+            active, current = active[needed], reach[needed]
+            gap_ids.append(active)
+            dummies.append(current)
+        order = np.argsort(np.concatenate(gap_ids), kind='stable')
+        gap_ids = np.concatenate(gap_ids)[order]
+        dummies = np.concatenate(dummies)[order]
+        gap_dummies = np.bincount(gap_ids, minlength=pair_start.size).reshape(num_rows, num_pairs)
+        required = gap_dummies.sum(axis=1)
+
+        if num_dummy_pairs is None:
+            extra = np.zeros(num_rows, dtype=np.int64)
+        else:
+            if np.any(required > num_dummy_pairs):
+                row = int(np.argmax(required > num_dummy_pairs))
+                raise ValueError(f"{num_dummy_pairs} dummy pairs cannot satisfy the gap limits; "
+                                 f"row {row} needs at least {required[row]}")
+            extra = num_dummy_pairs - required
+            if num_pairs == 0 and np.any(extra):
+                raise ValueError("No pair gap to insert dummy pairs into")
+
+        # Every packed word is one piece (start, end) of a split gap
+        num_words = num_pairs + required + extra
+        max_words = int(num_words.max(initial=0)) + weight % 2
+        piece_start = np.full((num_rows, max_words), -1, dtype=np.int64)
+        piece_end = np.full((num_rows, max_words), -1, dtype=np.int64)
+        start_dummy = np.zeros((num_rows, max_words), dtype=bool)
+        end_dummy = np.zeros((num_rows, max_words), dtype=bool)
+
+        gap_row = np.repeat(np.arange(num_rows), num_pairs)
+        first_word = (np.arange(num_pairs) + np.cumsum(gap_dummies, axis=1) - gap_dummies).ravel()
+        piece_start[gap_row, first_word] = pair_start
+        piece_end[gap_row, first_word + gap_dummies.ravel()] = pair_end
+        dummy_word = first_word[gap_ids] + np.arange(gap_ids.size) - np.searchsorted(gap_ids, gap_ids)
+        piece_end[gap_row[gap_ids], dummy_word] = dummies
+        end_dummy[gap_row[gap_ids], dummy_word] = True
+        piece_start[gap_row[gap_ids], dummy_word + 1] = dummies
+        start_dummy[gap_row[gap_ids], dummy_word + 1] = True
+
+        # Padding dummies halve the largest piece (ties: lowest start), like plan_dummies
+        for step in range(int(extra.max(initial=0))):
+            rows = np.flatnonzero(extra > step)
+            new_word = num_pairs + required[rows] + step
+            key = np.where(piece_end[rows] >= 0,
+                           (piece_end[rows] - piece_start[rows]) * (1 << 17) + (1 << 17) - 1 - piece_start[rows], -1)
+            largest = np.argmax(key, axis=1)
+            middle = (piece_start[rows, largest] + piece_end[rows, largest]) // 2
+            piece_start[rows, new_word] = middle
+            piece_end[rows, new_word] = piece_end[rows, largest]
+            start_dummy[rows, new_word] = True
+            end_dummy[rows, new_word] = end_dummy[rows, largest]
+            piece_end[rows, largest] = middle
+            end_dummy[rows, largest] = True
+        if extra.any():
+            order = np.argsort(np.where(piece_end >= 0, piece_start * (1 << 17) + piece_end, np.iinfo(np.int64).max),
+                               axis=1, kind='stable')
+            piece_start = np.take_along_axis(piece_start, order, axis=1)
+            piece_end = np.take_along_axis(piece_end, order, axis=1)
+            start_dummy = np.take_along_axis(start_dummy, order, axis=1)
+            end_dummy = np.take_along_axis(end_dummy, order, axis=1)
+
+        # reroute_last_word_pairs: (a, b) -> (d, a), (d, b) for pieces starting in the last dense word
+        last_word = (piece_start >= self.last_word_start()) & (piece_end > piece_start)
+        if last_word.any():
+            grow = int(last_word.sum(axis=1).max())
+            arrays = []
+            for array, fill in ((piece_start, -1), (piece_end, -1), (start_dummy, False), (end_dummy, False)):
+                arrays.append(np.concatenate([array, np.full((num_rows, grow), fill, dtype=array.dtype)], axis=1))
+            piece_start, piece_end, start_dummy, end_dummy = arrays
+            for row in np.flatnonzero(last_word.any(axis=1)):
+                for word in np.flatnonzero(last_word[row])[::-1]:
+                    dummy_pos = piece_start[row, word] - self.acc_word_size
+                    for array, first, second in ((piece_start, dummy_pos, dummy_pos),
+                                                 (piece_end, piece_start[row, word], piece_end[row, word]),
+                                                 (start_dummy, True, True),
+                                                 (end_dummy, start_dummy[row, word], end_dummy[row, word])):
+                        array[row, word + 1:] = array[row, word:-1].copy()
+                        array[row, word:word + 2] = first, second
+            num_words = num_words + last_word.sum(axis=1)
+            max_words += grow
+
+        used = np.arange(max_words) < num_words[:, None]
+        if weight % 2:
+            # Trailing unpaired index goes in the high half of its own word
+            piece_start[np.arange(num_rows), num_words] = index_matrix[:, -1]
+            num_words = num_words + 1
+            used = np.arange(max_words) < num_words[:, None]
+
+        positions = np.stack([piece_start, piece_end], axis=2).reshape(num_rows, -1)
+        dummy_mask = np.stack([start_dummy, end_dummy], axis=2).reshape(num_rows, -1)
+        packed_words = np.where(used, ((piece_start & 0xFFFF) << 16) | (np.maximum(piece_end, 0) & 0xFFFF), 0)
+        return positions, packed_words.astype(np.uint32), dummy_mask, num_words
+
     def create_packed_words(self, positions: List[int]) -> List[int]:
         """Pack positions into 32-bit words (16-bit pairs)"""
         words = []
@@ -68,9 +303,13 @@ class DummyInsertion:
             
         return words
     
-    def process_indices(self, positions: List[int], num_dummy_pairs: int = 12) -> Tuple[List[int], List[int]]:
-        """Process indices by inserting dummies and packing into words"""
-        positions_with_dummies = self.insert_dummies(positions, num_dummy_pairs)
+    def process_indices(self, positions: List[int], num_dummy_pairs: Optional[int] = None) -> Tuple[List[int], List[int]]:
+        """Process indices by inserting dummies and packing into words
+
+        num_dummy_pairs=None inserts the minimum number of dummy pairs; a count
+        pads up to exactly that many (ValueError if it is below the minimum).
+        """
+        positions_with_dummies = self.insert_planned_dummies(positions, num_dummy_pairs)
         packed_words = self.create_packed_words(positions_with_dummies)
         return positions_with_dummies, packed_words
 
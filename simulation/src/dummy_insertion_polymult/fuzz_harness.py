@@ -0,0 +1,234 @@
+"""Differential fuzzing of the Controller model against the rotation reference.
+
+Case i of a seed is drawn from vector_rng(seed, i), so every case can be
+regenerated from (seed, i). Cases cycle through these kinds:
+- random: a uniform weight-w or weight-w_r set,
+- residue: indices with p % word_size at 0, 1, tail_bits - 1, tail_bits,
+  tail_bits + 1 or word_size - 1. These are the wrap-around branches of
+  _initial_acc_word and _update_latency.
+- adjacent: runs of neighbouring indices (p, p + 1, ...),
+- gap: pairs 1024 +- 2 apart, plus pairs whose word distance is near the
+  shift-register limit,
+- wrap: indices at both ends of the ring (0.., n - 1..).
+Each case runs through run_multiplication (dummy insertion plus the
+Controller) in every requested mode. The result is compared with
+RotationMultiplier, and any exception counts as a failure.
+
+A failing case is shrunk in the worker. ddmin first removes sparse indices,
+down to a single failing pair when possible, then removes bits of h. The
+result is saved as a JSON regression case, and --replay re-runs saved cases.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from functools import partial
+from multiprocessing import Pool
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
+from main import run_multiplication
+from result_verifier import ResultVerifier
+from vector_generator import packed_positions, random_dense_words, vector_rng
+
+CASE_KINDS = ('random', 'residue', 'adjacent', 'gap', 'wrap')
+DEFAULT_REGRESSION_DIR = './simulation/data/regressions'
+
+# (case index, kind, failure or None); a failure is a regression case dict
+CaseResult = Tuple[int, str, Optional[dict]]
+
+def _edge_positions(params: HQCParams, kind: str, rng: np.random.Generator) -> List[int]:
+    n, word_size, tail_bits = params.n, params.word_size, params.tail_bits
+    count = int(rng.integers(1, 9))
+    if kind == 'residue':
+        residues = [0, 1, tail_bits - 1, tail_bits, tail_bits + 1, word_size - 1]
+        words = rng.integers(0, n // word_size, size=count)
+        return [int(word) * word_size + int(rng.choice(residues)) for word in words]
+    if kind == 'adjacent':
+        positions = []
+        for start in rng.integers(0, n, size=count):
+            positions.extend(int(start) + k for k in range(int(rng.integers(2, 5))))
+        return positions
+    if kind == 'gap':
+        register_gap = params.dummy_inserter().max_word_distance * word_size
+        positions = []
+        for start in rng.integers(0, n, size=count):
+            gap = int(rng.choice([1024, register_gap])) + int(rng.integers(-2, 3))
+            positions.extend([int(start), int(start) + gap])
+        return positions
+    if kind == 'wrap':
+        return [int(k) for k in rng.integers(0, 4, size=count)] + \
+               [n - 1 - int(k) for k in rng.integers(0, 4, size=count)]
+    return []
+
+def fuzz_case(params: HQCParams, seed: int, index: int) -> Tuple[str, List[int], List[int]]:
+    """Case `index` of the seed's stream: (kind, sparse positions, h positions)"""
+    rng = vector_rng(seed, index)
+    kind = CASE_KINDS[index % len(CASE_KINDS)]
+    weight = int(rng.choice([params.weight, params.weight_r]))
+    edges = sorted({pos % params.n for pos in _edge_positions(params, kind, rng)})[:weight]
+    rest = np.setdiff1d(rng.choice(params.n, size=weight, replace=False), edges)[:weight - len(edges)]
+    sparse = sorted(edges + rest.tolist())
+    h = packed_positions(random_dense_words(rng, params.n), params.n).tolist()
+    return kind, sparse, h
+
+def check_case(params: HQCParams, sparse: List[int], h: List[int], mode: str = "fast") -> Optional[str]:
+    """None if the Controller matches the reference, else a short description of the failure"""
+    expected = params.reference().multiply(sparse, h)
+    try:
+        controller = run_multiplication(sparse, h, mode=mode, params=params)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    verifier = ResultVerifier(controller.acc_mem, expected)
+    if verifier.matches():
+        return None
+    _, missing, extra, _ = verifier.verify_results()
+    return f"mismatch: {len(missing)} missing, {len(extra)} extra bits"
+
+def ddmin(items: List[int], fails: Callable[[List[int]], bool]) -> List[int]:
+    """Delta-debugging minimisation: a 1-minimal sublist of items that still fails"""
+    granularity = 2
+    while len(items) >= 2:
+        chunk = max(len(items) // granularity, 1)
+        for start in range(0, len(items), chunk):
+            complement = items[:start] + items[start + chunk:]
+            if complement and fails(complement):
+                items = complement
+                granularity = max(granularity - 1, 2)
+                break
+        else:
+            if chunk == 1:
+                break
+            granularity = min(granularity * 2, len(items))
+    return items
+
+def shrink_case(params: HQCParams, sparse: List[int], h: List[int], mode: str) -> Tuple[List[int], List[int], str]:
+    """Smallest sparse set (then h) that still fails; returns (sparse, h, failure)"""
+    sparse = ddmin(sorted(sparse), lambda candidate: check_case(params, candidate, h, mode) is not None)
+    if check_case(params, sparse, [0], mode) is not None:
+        h = [0]
+    else:
+        h = ddmin(sorted(h), lambda candidate: check_case(params, sparse, candidate, mode) is not None)
+    return sparse, h, check_case(params, sparse, h, mode)
+
+def regression_case(params: HQCParams, mode: str, sparse: List[int], h: List[int], failure: str,
+                    seed: Optional[int] = None, index: Optional[int] = None, kind: Optional[str] = None) -> dict:
+    return {'params': params.name, 'word_size': params.word_size, 'num_dummy_pairs': params.num_dummy_pairs,
+            'mode': mode, 'sparse': sparse, 'h': h, 'failure': failure,
+            'seed': seed, 'index': index, 'kind': kind}
+
+def save_case(case: dict, directory: str = DEFAULT_REGRESSION_DIR) -> str:
+    """Write a regression case as JSON, named by its content so repeats overwrite each other"""
+    os.makedirs(directory, exist_ok=True)
+    key = json.dumps([case['params'], case['word_size'], case['mode'], case['sparse'], case['h']])
+    filename = os.path.join(directory, f"{case['params']}_w{case['word_size']}_{case['mode']}_"
+                                       f"{hashlib.sha1(key.encode()).hexdigest()[:12]}.json")
+    with open(filename, 'w') as f:
+        json.dump(case, f, indent=1)
+    return filename
+
+def case_params(case: dict) -> HQCParams:
+    return get_params(case['params']).with_options(word_size=case['word_size'],
+                                                   num_dummy_pairs=case.get('num_dummy_pairs'))
+
+def replay(directory: str = DEFAULT_REGRESSION_DIR) -> List[Tuple[str, Optional[str]]]:
+    """Re-run every saved case; returns (filename, failure or None) per case"""
+    results = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name)) as f:
+                case = json.load(f)
+            results.append((name, check_case(case_params(case), case['sparse'], case['h'], case['mode'])))
+    return results
+
+def run_case(params: HQCParams, seed: int, modes: Tuple[str, ...], shrink: bool, index: int) -> CaseResult:
+    """Worker entry point: generate, check and (on failure) shrink one case"""
+    kind, sparse, h = fuzz_case(params, seed, index)
+    for mode in modes:
+        failure = check_case(params, sparse, h, mode)
+        if failure is not None:
+            if shrink:
+                sparse, h, failure = shrink_case(params, sparse, h, mode)
+            return index, kind, regression_case(params, mode, sparse, h, failure, seed, index, kind)
+    return index, kind, None
+
+class FuzzHarness:
+    def __init__(self, params: HQCParams = HQC_128, modes: Tuple[str, ...] = ("fast",), seed: int = 0,
+                 workers: Optional[int] = None, chunksize: int = 4, shrink: bool = True,
+                 regression_dir: str = DEFAULT_REGRESSION_DIR):
+        self.params = params
+        self.modes = modes
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.shrink = shrink
+        self.regression_dir = regression_dir
+
+    def run(self, iterations: Optional[int] = None, duration: Optional[float] = None,
+            start: int = 0, verbose: bool = True) -> Tuple[int, List[dict]]:
+        """Check cases start, start + 1, ... until `iterations` cases or `duration` seconds; returns (checked, failures)"""
+        if iterations is None and duration is None:
+            raise ValueError("Give iterations and/or duration")
+        deadline = None if duration is None else time.monotonic() + duration
+        end = None if iterations is None else start + iterations
+        # Bounded blocks: Pool.imap_unordered would drain an endless index stream up front
+        block_size = self.workers * self.chunksize * 16
+        worker = partial(run_case, self.params, self.seed, self.modes, self.shrink)
+        checked = 0
+        failures = []
+        with Pool(self.workers) as pool:
+            while (end is None or start < end) and (deadline is None or time.monotonic() < deadline):
+                block = range(start, start + block_size if end is None else min(start + block_size, end))
+                for index, kind, failure in pool.imap_unordered(worker, block, chunksize=self.chunksize):
+                    checked += 1
+                    if failure is not None:
+                        failures.append(failure)
+                        filename = save_case(failure, self.regression_dir)
+                        print(f"\n⚠️ Case {index} ({kind}, {failure['mode']}) failed: {failure['failure']}; "
+                              f"shrunk to {len(failure['sparse'])} indices {failure['sparse'][:8]}, "
+                              f"{len(failure['h'])} h bits -> {filename}")
+                    if verbose and checked % 100 == 0:
+                        print(f"\r{checked} cases, {len(failures)} failures", end='', flush=True)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        break
+                start = block.stop
+        if verbose:
+            print(f"\r{checked} cases, {len(failures)} failures")
+        return checked, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the Controller model against the reference")
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--word-size', type=int, help="datapath width (default: the parameter set's)")
+    parser.add_argument('--num-dummy-pairs', type=int, help="fixed dummy budget (default: the planner's minimum)")
+    parser.add_argument('--modes', nargs='+', choices=["fast", "cycle"], default=["fast"])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=int, default=0, help="index of the first case")
+    parser.add_argument('--iterations', type=int)
+    parser.add_argument('--duration', type=float, help="seconds to run (with no --iterations: until then)")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--no-shrink', action='store_true')
+    parser.add_argument('--regression-dir', default=DEFAULT_REGRESSION_DIR)
+    parser.add_argument('--replay', action='store_true', help="re-run the saved regression cases and exit")
+    args = parser.parse_args()
+
+    if args.replay:
+        results = replay(args.regression_dir)
+        for name, failure in results:
+            print(f"{'✓' if failure is None else '✗'} {name}" + ("" if failure is None else f": {failure}"))
+        print(f"{sum(failure is None for _, failure in results)}/{len(results)} regression cases pass")
+        return
+
+    params = get_params(args.params).with_options(word_size=args.word_size, num_dummy_pairs=args.num_dummy_pairs)
+    iterations = args.iterations if args.iterations is not None or args.duration is not None else 1000
+    harness = FuzzHarness(params, tuple(args.modes), seed=args.seed, workers=args.workers,
+                          shrink=not args.no_shrink, regression_dir=args.regression_dir)
+    print(f"\n=== Fuzzing {params} ===")
+    checked, failures = harness.run(iterations, args.duration, start=args.start)
+    print(f"{checked} cases checked, {len(failures)} failures")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Golden per-event expectation streams for the Verilog testbenches.
+
+Each dataset runs through the Controller in cycle mode with a
+TraceRecorder. Every acc write becomes one fixed-width hex line of
+golden_<w>.mem, for $readmemh into `reg [GOLDEN_WIDTH-1:0] golden [0:GOLDEN_COUNT-1]`.
+The writes are the two initial-acc blocks of each sparse word and one
+per round. Fields, MSB first:
+
+    cycle (32) | event (8) | sparse_word_idx (16) | acc_addr (16) |
+    acc_value (w) | high_left (w) | high_right (w) | low_left (w) | low_right (w)
+
+cycle is the CycleModel count after the event. acc_value is the word
+written to acc_addr. For rounds, the four operand fields are the shift
+register words the XOR adder reads. For initial-acc events they are
+normal words 0, num_words - 2, num_words - 1 and 0 (see TraceRecorder).
+golden_<w>.vh holds the matching localparams: width, count and each
+field's LSB. The dataset directory also gets the operand files from
+MemGenerator for the same width and acc_<w>.mem, the final accumulator
+including the bits past n that the datapath leaves in the last word.
+"""
+import argparse
+import os
+from functools import partial
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from corpus import pack_positions
+from data_loader import DataLoader
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
+from main import run_multiplication
+from mem_generator import MemGenerator, format_words
+from readback import memory_words
+from trace_recorder import EVENT_NAMES, TraceRecorder
+
+def golden_layout(word_size: int = 32) -> List[Tuple[str, str, int]]:
+    """(field, trace field, bits) from MSB to LSB"""
+    return [('cycle', 'cycle', 32), ('event', 'event', 8), ('sparse_word_idx', 'sparse_word_idx', 16),
+            ('acc_addr', 'acc_addr', 16), ('acc_value', 'acc_after', word_size),
+            ('high_left', 'high_left', word_size), ('high_right', 'high_right', word_size),
+            ('low_left', 'low_left', word_size), ('low_right', 'low_right', word_size)]
+
+def golden_words(records: np.ndarray, word_size: int = 32) -> np.ndarray:
+    """(records, golden_width // 8) little-endian byte rows of the golden lines"""
+    if word_size % 8:
+        raise ValueError(f"Word size {word_size} is not a whole number of bytes")
+    if len(records) and int(records['cycle'].max()) >= 1 << 32:
+        raise ValueError("cycle count does not fit the 32-bit golden field")
+    columns = []
+    for _, trace_field, bits in reversed(golden_layout(word_size)):
+        values = np.ascontiguousarray(records[trace_field], dtype='<u8')
+        columns.append(values.view(np.uint8).reshape(len(records), -1)[:, :bits // 8])
+    return np.concatenate(columns, axis=1)
+
+def golden_header(count: int, word_size: int = 32) -> str:
+    """Verilog localparams describing golden_<w>.mem"""
+    layout = golden_layout(word_size)
+    lines = ["// Golden Controller event stream (golden_dump.py): one line per acc write, fields MSB -> LSB",
+             f"localparam GOLDEN_WIDTH = {sum(bits for _, _, bits in layout)};",
+             f"localparam GOLDEN_COUNT = {count};"]
+    lsb = 0
+    for field, _, bits in reversed(layout):
+        lines.append(f"localparam GOLDEN_{field.upper()}_LSB = {lsb};")
+        lsb += bits
+    lines.extend(f"localparam GOLDEN_EVENT_{name.upper()} = {kind};" for kind, name in EVENT_NAMES.items())
+    return "\n".join(lines) + "\n"
+
+def dump_dataset(r2_positions: List[int], h_positions: List[int], out_dir: str,
+                 params: HQCParams = HQC_128, s_positions: Optional[List[int]] = None) -> int:
+    """Run one multiplication with a trace and write its golden files; returns the event count"""
+    trace = TraceRecorder(word_size=params.word_size)
+    controller = run_multiplication(r2_positions, h_positions, mode="cycle", trace=trace, params=params)
+    records = trace.records
+
+    os.makedirs(out_dir, exist_ok=True)
+    word_size = params.word_size
+    files = {f"golden_{word_size}.mem": format_words(golden_words(records, word_size), 'hex'),
+             f"golden_{word_size}.vh": golden_header(len(records), word_size).encode(),
+             f"acc_{word_size}.mem": format_words(memory_words(controller.acc_mem))}
+    h_packed = pack_positions(h_positions, params.n)
+    s_packed = pack_positions(s_positions, params.n) if s_positions is not None else None
+    files.update(MemGenerator(params, widths=(word_size,)).dataset_files(r2_positions, h_packed, s_packed))
+    for name, contents in files.items():
+        with open(os.path.join(out_dir, name), 'wb') as f:
+            f.write(contents)
+    return len(records)
+
+_loader: Optional[DataLoader] = None
+
+def _init_worker(y_file: str, h_file: str, s_file: Optional[str]) -> None:
+    global _loader
+    _loader = DataLoader(y_file, h_file, s_file)
+
+def _dump_worker(params: HQCParams, out_dir: str, dataset: int) -> Tuple[int, int]:
+    r2_positions, h_positions, s_positions = _loader.load(dataset)
+    count = dump_dataset(r2_positions, h_positions, os.path.join(out_dir, f"dataset_{dataset:05d}"),
+                         params, s_positions)
+    return dataset, count
+
+def dump_datasets(y_file: str, h_file: str, s_file: Optional[str], out_dir: str, params: HQCParams = HQC_128,
+                  dataset_indices=None, workers: Optional[int] = None, verbose: bool = False) -> int:
+    """Golden files for many datasets, one worker-written directory each; returns the number written"""
+    if dataset_indices is None:
+        loader = DataLoader()
+        try:
+            dataset_indices = range(loader.num_rows(y_file))
+        finally:
+            loader.close_files()
+    worker = partial(_dump_worker, params, out_dir)
+    written = 0
+    with Pool(workers or os.cpu_count() or 1, initializer=_init_worker, initargs=(y_file, h_file, s_file)) as pool:
+        for dataset, count in pool.imap_unordered(worker, dataset_indices):
+            written += 1
+            if verbose:
+                print(f"dataset {dataset}: {count} golden events")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Write golden Controller event streams for the testbenches")
+    parser.add_argument('out_dir')
+    parser.add_argument('--y-file', default='./simulation/data/66/y_bits.csv')
+    parser.add_argument('--h-file', default='./simulation/data/66/h_for_y_bits.csv')
+    parser.add_argument('--s-file', default='./simulation/data/66/s_bits.csv', help="'' to skip the product")
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--word-size', type=int, help="datapath width (default: the parameter set's)")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    params = get_params(args.params).with_options(word_size=args.word_size)
+    dataset_indices = None
+    if args.limit is not None:
+        loader = DataLoader()
+        try:
+            dataset_indices = range(min(args.limit, loader.num_rows(args.y_file)))
+        finally:
+            loader.close_files()
+    count = dump_datasets(args.y_file, args.h_file, args.s_file or None, args.out_dir, params,
+                          dataset_indices, args.workers, verbose=True)
+    print(f"Wrote golden streams for {count} datasets to {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import math
+from typing import Dict, Optional
+
+from dummy_insertion import DummyInsertion
+from memory import PolynomialMemory
+from reference_multiplier import RotationMultiplier
+
+class HQCParams:
+    """One HQC parameter set plus the simulated datapath settings.
+
+    n is the ring size (polynomials mod x^n - 1), weight the weight of x/y
+    (w) and weight_r the weight of r1/r2/e (w_r = w_e). word_size is the
+    dense datapath width and num_dummy_pairs the dummy budget per sparse
+    operand (None inserts the minimum DummyInsertion.plan_dummies needs).
+    """
+    def __init__(self, name: str, n: int, weight: int, weight_r: int, word_size: int = 32,
+                 num_dummy_pairs: Optional[int] = None):
+        if n % word_size == 0:
+            raise ValueError(f"n={n} must not be a multiple of the word size {word_size}")
+        if n > 0xFFFF:
+            raise ValueError(f"n={n} does not fit the 16-bit sparse index fields")
+        self.name = name
+        self.n = n
+        self.weight = weight
+        self.weight_r = weight_r
+        self.word_size = word_size
+        self.num_dummy_pairs = num_dummy_pairs
+
+    @property
+    def num_words(self) -> int:
+        return math.ceil(self.n / self.word_size)
+
+    @property
+    def tail_bits(self) -> int:
+        """Bits used in the last dense word (n mod word_size), the Controller's wrap-around width"""
+        return self.n % self.word_size
+
+    def with_options(self, word_size: Optional[int] = None,
+                     num_dummy_pairs: Optional[int] = None) -> 'HQCParams':
+        """Copy with another datapath width and/or dummy budget"""
+        return HQCParams(self.name, self.n, self.weight, self.weight_r,
+                         self.word_size if word_size is None else word_size,
+                         self.num_dummy_pairs if num_dummy_pairs is None else num_dummy_pairs)
+
+    def dense_memory(self, debug_mode: bool = False) -> PolynomialMemory:
+        """Memory for h or the accumulator"""
+        return PolynomialMemory(total_bits=self.n, word_size=self.word_size, debug_mode=debug_mode)
+
+    def sparse_memory(self, num_packed_words: int) -> PolynomialMemory:
+        """Memory for 16/16-bit packed sparse words (always 32-bit words)"""
+        return PolynomialMemory(total_bits=num_packed_words * 32, word_size=32)
+
+    def dummy_inserter(self) -> DummyInsertion:
+        return DummyInsertion(acc_word_size=self.word_size, total_bits=self.n)
+
+    def reference(self) -> RotationMultiplier:
+        return RotationMultiplier(total_bits=self.n)
+
+    def __repr__(self) -> str:
+        return (f"HQCParams({self.name}, n={self.n}, w={self.weight}, w_r={self.weight_r}, "
+                f"word_size={self.word_size}, num_dummy_pairs={self.num_dummy_pairs})")
+
+HQC_128 = HQCParams('hqc-128', n=17669, weight=66, weight_r=75)
+HQC_192 = HQCParams('hqc-192', n=35851, weight=100, weight_r=114)
+HQC_256 = HQCParams('hqc-256', n=57637, weight=131, weight_r=149)
+
+PARAMETER_SETS: Dict[str, HQCParams] = {params.name: params for params in (HQC_128, HQC_192, HQC_256)}
+
+def get_params(name: str) -> HQCParams:
+    try:
+        return PARAMETER_SETS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown parameter set: {name} (expected one of {sorted(PARAMETER_SETS)})") from None
@@ -0,0 +1,273 @@
+"""Synthetic power traces from the Controller datapath.
+
+One fixed sparse operand y (the secret, as in CW305_vulnerable_attack.ipynb)
+is multiplied with a dense h per trace, B traces at a time in a
+BatchController. Every acc write (init_high, init_low, each round) is one
+sample. The sample is the weighted sum of its leakage sources:
+- acc_read / acc_write: the acc word before / after the write,
+- load: the dense word read into the shift register,
+- xor: the four XOR adder operands,
+- shift: the two words the adder extracts from them, i.e. h rotated by the
+  high and low index (off by default; the CPA target in cpa.py).
+The model is 'hw' (Hamming weight of each value) or 'hd' (Hamming distance
+from the value the same source had at the previous sample). Gaussian noise
+of noise_std is added on top. Traces hold samples [offset, offset + samples)
+of each run. A run that ends early is padded with noise, and the
+multiplication stops once every trace of the batch has filled its window.
+
+Trace i is drawn from vector_rng(seed, i): its h, then (with
+fixed_vs_random) its class, then its noise. A class-0 trace uses the fixed h
+of the seed instead of its own. So trace_input(i) regenerates the known
+input of any trace, whatever chunk size or worker count wrote it. The CLI's
+random y comes from default_rng(seed). The output directory holds traces.npy
+(float32, written chunk by chunk through a memmap), labels.npy for
+fixed-vs-random sets and metadata.json.
+"""
+import argparse
+import json
+import os
+from functools import partial
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from batch_controller import BatchController
+from data_loader import DataLoader
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
+from vector_generator import random_dense_words, vector_rng
+
+LEAKAGE_SOURCES = ('acc_read', 'acc_write', 'load', 'xor', 'shift')
+LEAKAGE_MODELS = ('hw', 'hd')
+DEFAULT_SOURCES = {'acc_read': 1.0, 'acc_write': 1.0, 'load': 1.0, 'xor': 1.0}
+# Entropy tag of the fixed h stream, apart from the per-trace streams and the random y (default_rng(seed))
+FIXED_H_STREAM = 0xF1ED
+BYTE_WEIGHTS = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+# (traces (count, samples) float32, labels (count,) uint8 or None)
+TraceChunk = Tuple[np.ndarray, Optional[np.ndarray]]
+
+def hamming_weight(words: np.ndarray) -> np.ndarray:
+    """Bit count of every uint64 element"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    as_bytes = np.ascontiguousarray(words, dtype='<u8').view(np.uint8).reshape(words.shape + (8,))
+    return BYTE_WEIGHTS[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+class LeakageRecorder:
+    """BatchController observer that turns acc writes into the samples of a trace window"""
+    def __init__(self, batch_size: int, offset: int, samples: int, model: str = 'hw',
+                 sources: Dict[str, float] = None):
+        if model not in LEAKAGE_MODELS:
+            raise ValueError(f"Unknown leakage model: {model} (expected one of {LEAKAGE_MODELS})")
+        self.sources = sources or dict(DEFAULT_SOURCES)
+        unknown = set(self.sources) - set(LEAKAGE_SOURCES)
+        if unknown:
+            raise ValueError(f"Unknown leakage source(s): {sorted(unknown)} (expected {LEAKAGE_SOURCES})")
+        self.model = model
+        self.offset = offset
+        self.samples = samples
+        self.traces = np.zeros((batch_size, samples), dtype=np.float32)
+        # Samples seen so far per trace
+        self.position = np.zeros(batch_size, dtype=np.int64)
+        # Last value of every bus, for the Hamming distance model (acc_read, acc_write, load, 4 operands, 2 shifted)
+        self.previous = np.zeros((9, batch_size), dtype=np.uint64)
+
+    @property
+    def filled(self) -> bool:
+        return bool((self.position >= self.offset + self.samples).all())
+
+    def _values(self, loaded, operands, shifted, acc_before, acc_after) -> List[Tuple[int, str, np.ndarray]]:
+        """(bus, source, values) for every enabled source"""
+        buses = [(0, 'acc_read', acc_before), (1, 'acc_write', acc_after), (2, 'load', loaded)]
+        buses += [(3 + k, 'xor', operand) for k, operand in enumerate(operands)]
+        buses += [(7 + k, 'shift', word) for k, word in enumerate(shifted)]
+        return [(bus, source, values) for bus, source, values in buses if source in self.sources]
+
+    def observe(self, event, rows, word_idx, valid, loaded, operands, shifted, acc_before, acc_after) -> None:
+        counts = valid.sum(axis=1)
+        last = np.maximum(counts - 1, 0)
+        leakage = np.zeros(valid.shape, dtype=np.float32)
+        for bus, source, values in self._values(loaded, operands, shifted, acc_before, acc_after):
+            values = np.broadcast_to(values, valid.shape)
+            if self.model == 'hd':
+                previous = np.concatenate([self.previous[bus, rows][:, None], values[:, :-1]], axis=1)
+                self.previous[bus, rows] = np.where(counts > 0, values[np.arange(len(rows)), last],
+                                                    self.previous[bus, rows])
+                values = values ^ previous
+            leakage += self.sources[source] * hamming_weight(values)
+
+        # Valid writes are a prefix of the columns, so the k-th valid one is sample position + k
+        sample = self.position[rows][:, None] + np.arange(valid.shape[1]) - self.offset
+        keep = valid & (sample >= 0) & (sample < self.samples)
+        self.traces[np.broadcast_to(rows[:, None], keep.shape)[keep], sample[keep]] = leakage[keep]
+        self.position[rows] += counts
+
+class TraceSimulator:
+    def __init__(self, y_positions: Sequence[int], params: HQCParams = HQC_128, model: str = 'hw',
+                 sources: Optional[Dict[str, float]] = None, noise_std: float = 1.0, offset: int = 0,
+                 samples: int = 1000, seed: int = 0, fixed_vs_random: bool = False):
+        if params.word_size != 32:
+            raise ValueError("The trace simulator runs the 32-bit BatchController datapath")
+        self.params = params
+        self.y_positions = sorted(int(pos) for pos in y_positions)
+        self.model = model
+        self.sources = sources or dict(DEFAULT_SOURCES)
+        self.noise_std = noise_std
+        self.offset = offset
+        self.samples = samples
+        self.seed = seed
+        self.fixed_vs_random = fixed_vs_random
+
+        dummy_inserter = params.dummy_inserter()
+        positions, self.extra = dummy_inserter.pad_odd_weight(self.y_positions)
+        # Indices the datapath really processes: y, the odd-weight pad and the dummies
+        self.processed_positions, packed_words = dummy_inserter.process_indices(positions, params.num_dummy_pairs)
+        self.sparse_words = np.array(packed_words, dtype=np.uint64)
+        self.fixed_h = random_dense_words(np.random.default_rng([seed, FIXED_H_STREAM]), params.n)
+
+    def trace_input(self, index: int) -> Tuple[np.ndarray, int, np.random.Generator]:
+        """Packed h, class (1 = random, 0 = fixed) and the noise generator of trace `index`"""
+        rng = vector_rng(self.seed, index)
+        h = random_dense_words(rng, self.params.n)
+        label = int(rng.integers(2)) if self.fixed_vs_random else 1
+        return (h if label else self.fixed_h), label, rng
+
+    def _dense_words(self, packed_rows: np.ndarray) -> np.ndarray:
+        """(B, num_words) 32-bit words of packed uint64 rows"""
+        words = np.ascontiguousarray(packed_rows, dtype='<u8').view('<u4')[:, :self.params.num_words]
+        return words.astype(np.uint64)
+
+    def _rotated(self, packed_rows: np.ndarray, shift: int) -> np.ndarray:
+        """x^shift * h for every row, as 32-bit words (the odd-weight acc preload)"""
+        n = self.params.n
+        bits = np.unpackbits(np.ascontiguousarray(packed_rows, dtype='<u8').view(np.uint8), axis=1,
+                             bitorder='little')[:, :n]
+        rotated = np.packbits(np.roll(bits, shift, axis=1), axis=1, bitorder='little')
+        padded = np.zeros((len(rotated), self.params.num_words * 4), dtype=np.uint8)
+        padded[:, :rotated.shape[1]] = rotated
+        return padded.view('<u4').astype(np.uint64)
+
+    def simulate(self, start: int, count: int) -> TraceChunk:
+        """Traces start .. start + count - 1 (and their classes for fixed-vs-random sets)"""
+        h_rows = np.empty((count, len(self.fixed_h)), dtype=np.uint64)
+        labels = np.empty(count, dtype=np.uint8)
+        noise = np.empty((count, self.samples), dtype=np.float32)
+        for i in range(count):
+            h_rows[i], labels[i], rng = self.trace_input(start + i)
+            noise[i] = rng.normal(0.0, self.noise_std, self.samples)
+
+        recorder = LeakageRecorder(count, self.offset, self.samples, self.model, self.sources)
+        acc_words = None if self.extra is None else self._rotated(h_rows, self.extra)
+        controller = BatchController(self._dense_words(h_rows), np.tile(self.sparse_words, (count, 1)),
+                                     acc_words=acc_words, total_bits=self.params.n, observer=recorder)
+        for word_idx in range(len(self.sparse_words)):
+            controller.process_word(word_idx)
+            if recorder.filled:
+                break
+        return recorder.traces + noise, (labels if self.fixed_vs_random else None)
+
+    def chunks(self, count: int, start: int = 0, chunk_size: int = 256,
+               workers: Optional[int] = None) -> Iterator[TraceChunk]:
+        """Traces start .. start + count - 1 in chunk_size pieces, in order, computed by the worker pool"""
+        spans = [(chunk_start, min(chunk_size, start + count - chunk_start))
+                 for chunk_start in range(start, start + count, chunk_size)]
+        worker = partial(_simulate_span, self)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            yield from map(worker, spans)
+            return
+        with Pool(workers) as pool:
+            yield from pool.imap(worker, spans)
+
+    @classmethod
+    def from_metadata(cls, metadata: dict) -> 'TraceSimulator':
+        """The simulator that wrote a trace set, from its metadata.json"""
+        params = get_params(metadata['params']).with_options(num_dummy_pairs=metadata.get('num_dummy_pairs'))
+        return cls(metadata['y'], params, metadata['model'], metadata['sources'], metadata['noise_std'],
+                   metadata['offset'], metadata['samples'], metadata['seed'], metadata['fixed_vs_random'])
+
+    def metadata(self, start: int, count: int) -> dict:
+        return {'params': self.params.name, 'n': self.params.n, 'num_dummy_pairs': self.params.num_dummy_pairs,
+                'y': self.y_positions, 'seed': self.seed,
+                'start': start, 'count': count, 'model': self.model, 'sources': self.sources,
+                'noise_std': self.noise_std, 'offset': self.offset, 'samples': self.samples,
+                'fixed_vs_random': self.fixed_vs_random}
+
+    def generate(self, out_dir: str, count: int, start: int = 0, chunk_size: int = 256,
+                 workers: Optional[int] = None, verbose: bool = False) -> List[str]:
+        """Write traces start .. start + count - 1 to out_dir; returns the written paths"""
+        os.makedirs(out_dir, exist_ok=True)
+        paths = [os.path.join(out_dir, 'traces.npy'), os.path.join(out_dir, 'metadata.json')]
+        traces = np.lib.format.open_memmap(paths[0], mode='w+', dtype=np.float32, shape=(count, self.samples))
+        labels = np.empty(count, dtype=np.uint8)
+        done = 0
+        for chunk_traces, chunk_labels in self.chunks(count, start, chunk_size, workers):
+            traces[done:done + len(chunk_traces)] = chunk_traces
+            if chunk_labels is not None:
+                labels[done:done + len(chunk_labels)] = chunk_labels
+            done += len(chunk_traces)
+            if verbose:
+                print(f"\r{done}/{count} traces", end='', flush=True)
+        traces.flush()
+        del traces
+        if verbose:
+            print()
+        if self.fixed_vs_random:
+            paths.append(os.path.join(out_dir, 'labels.npy'))
+            np.save(paths[-1], labels)
+        with open(paths[1], 'w') as f:
+            json.dump(self.metadata(start, count), f, indent=1)
+        return paths
+
+def _simulate_span(simulator: TraceSimulator, span: Tuple[int, int]) -> TraceChunk:
+    return simulator.simulate(*span)
+
+def parse_sources(specs: Sequence[str]) -> Dict[str, float]:
+    """'acc_write' or 'acc_write=2.5' -> {source: weight}"""
+    sources = {}
+    for spec in specs:
+        source, _, weight = spec.partition('=')
+        sources[source] = float(weight) if weight else 1.0
+    return sources
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate power traces of the Controller datapath")
+    parser.add_argument('out_dir')
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=int, default=0, help="index of the first trace of the seed's stream")
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--y-file', help="take y from this file (default: random y of --weight)")
+    parser.add_argument('--dataset', type=int, default=0, help="row of --y-file")
+    parser.add_argument('--weight', type=int, help="weight of the random y (default: the parameter set's w)")
+    parser.add_argument('--num-dummy-pairs', type=int, help="fixed dummy budget (default: the planner's minimum)")
+    parser.add_argument('--model', choices=LEAKAGE_MODELS, default='hw')
+    parser.add_argument('--sources', nargs='+', default=list(DEFAULT_SOURCES),
+                        help=f"leakage sources with optional weights, e.g. acc_write=2 (from {LEAKAGE_SOURCES})")
+    parser.add_argument('--noise', type=float, default=1.0, help="standard deviation of the Gaussian noise")
+    parser.add_argument('--offset', type=int, default=0, help="first sample (acc write) of the window")
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--fixed-vs-random', action='store_true', help="mix fixed-h and random-h traces (TVLA)")
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    params = get_params(args.params).with_options(num_dummy_pairs=args.num_dummy_pairs)
+    if args.y_file:
+        loader = DataLoader()
+        try:
+            y_positions = loader.read_positions(args.y_file, args.dataset)
+        finally:
+            loader.close_files()
+    else:
+        weight = params.weight if args.weight is None else args.weight
+        y_positions = np.sort(np.random.default_rng(args.seed).choice(params.n, size=weight, replace=False))
+    simulator = TraceSimulator(y_positions, params, args.model, parse_sources(args.sources), args.noise,
+                               args.offset, args.samples, args.seed, args.fixed_vs_random)
+    paths = simulator.generate(args.out_dir, args.count, args.start, args.chunk_size, args.workers, verbose=True)
+    for path in paths:
+        print(f"Wrote {path}")
+
+if __name__ == "__main__":
+    main()
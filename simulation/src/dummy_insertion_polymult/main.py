@@ -1,54 +1,113 @@
+import argparse
+import os
+from typing import Optional
+
 from data_loader import DataLoader
-from memory import PolynomialMemory
-from dummy_insertion import DummyInsertion
 from controller import Controller
+from cycle_model import CycleModel
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
 from result_verifier import ResultVerifier
+from trace_recorder import TraceRecorder
+
+DEFAULT_DATA_DIR = './simulation/data/66'
 
-def test_dataset(dataset_num: int, loader: DataLoader, debug_mode: bool = False) -> tuple[bool, float]:
+def test_dataset(dataset_num: int, loader: DataLoader, debug_mode: bool = False,
+                 data_dir: str = DEFAULT_DATA_DIR, params: HQCParams = HQC_128) -> tuple[bool, float]:
     """Test a single dataset and return success status and error rate"""
     # Load next dataset from files
-    r2_positions = loader.read_next_positions('./simulation/data/66/y_bits.csv')
-    h_positions = loader.read_next_positions('./simulation/data/66/h_for_y_bits.csv')
-    result_positions = loader.read_next_positions('./simulation/data/66/s_bits.csv')
+    r2_positions = loader.read_next_positions(os.path.join(data_dir, 'y_bits.csv'))
+    h_positions = loader.read_next_positions(os.path.join(data_dir, 'h_for_y_bits.csv'))
+    result_positions = loader.read_next_positions(os.path.join(data_dir, 's_bits.csv'))
     
     if not r2_positions or not h_positions or not result_positions:
         print(f"\nError: Failed to load dataset {dataset_num}")
         return False, 100.0
 
+    success, missing, extra, error_rate = multiply_and_verify(r2_positions, h_positions, result_positions,
+                                                              debug_mode=debug_mode, params=params)
+    
+    if not success:
+        print_failure(dataset_num, len(missing), len(extra), error_rate)
+        
+    return success, error_rate
+
+def multiply_and_verify(r2_positions: list[int], h_positions: list[int], result_positions: list[int],
+                        debug_mode: bool = False, mode: str = "cycle", trace: TraceRecorder = None,
+                        params: HQCParams = HQC_128) -> tuple[bool, list[int], list[int], float]:
+    """Run one multiplication through the Controller model and verify it against result_positions"""
+    controller = run_multiplication(r2_positions, h_positions, debug_mode=debug_mode, mode=mode, trace=trace,
+                                    params=params)
+
+    # Verify results
+    verifier = ResultVerifier(controller.acc_mem, result_positions)
+    if verifier.matches():
+        return True, [], [], 0.0
+    return verifier.verify_results()
+
+def run_multiplication(r2_positions: list[int], h_positions: list[int], debug_mode: bool = False,
+                       mode: str = "cycle", trace: TraceRecorder = None,
+                       cycle_model: CycleModel = None, word_size: Optional[int] = None,
+                       params: HQCParams = HQC_128) -> Controller:
+    """Load h and the dummy-inserted r2 into memories and run the Controller; returns it with acc_mem filled
+
+    params sets n, the datapath width of the h/acc memories and the dummy budget;
+    word_size overrides its width. Sparse words stay 16/16-bit packed.
+    """
+    if word_size is not None:
+        params = params.with_options(word_size=word_size)
+
     # Initialize memories
-    h_mem = PolynomialMemory(total_bits=17669, word_size=32)
+    h_mem = params.dense_memory()
     h_mem.set_bit_positions(h_positions)
     
-    # Process r2 positions with dummy insertion
-    dummy_inserter = DummyInsertion()
-    r2_positions_with_dummies, r2_packed_words = dummy_inserter.process_indices(r2_positions, num_dummy_pairs=17)
+    # Process r2 positions with dummy insertion (odd weights get one extra index, cancelled in acc below)
+    dummy_inserter = params.dummy_inserter()
+    r2_positions, extra_position = dummy_inserter.pad_odd_weight(r2_positions)
+    r2_positions_with_dummies, r2_packed_words = dummy_inserter.process_indices(r2_positions, params.num_dummy_pairs)
 
-    r2_mem = PolynomialMemory(total_bits=1600, word_size=32)
+    r2_mem = params.sparse_memory(len(r2_packed_words))
     r2_mem.set_word_positions(r2_packed_words)
 
 
-    acc_mem = PolynomialMemory(total_bits=17669, word_size=32, debug_mode=debug_mode)
+    acc_mem = params.dense_memory(debug_mode=debug_mode)
+    if extra_position is not None:
+        acc_mem.set_bit_positions([(pos + extra_position) % params.n for pos in h_positions])
 
     # Execute multiplication
-    controller = Controller(normal_mem=h_mem, sparse_mem=r2_mem, acc_mem=acc_mem, debug_mode=debug_mode)
-    controller.execute()
+    controller = Controller(normal_mem=h_mem, sparse_mem=r2_mem, acc_mem=acc_mem, debug_mode=debug_mode,
+                            trace=trace, cycle_model=cycle_model)
+    controller.execute(mode=mode)
+    return controller
 
-    # Verify results
-    verifier = ResultVerifier(acc_mem, result_positions)
-    success, missing, extra, error_rate = verifier.verify_results()
-    
-    if not success:
-        print(f"\n⚠️ WARNING: Dataset {dataset_num} failed verification!")
-        print(f"Missing positions: {len(missing)}")
-        print(f"Extra positions: {len(extra)}")
-        print(f"Error rate: {error_rate:.2f}%")
-        
-    return success, error_rate
+def print_failure(dataset_num: int, num_missing: int, num_extra: int, error_rate: float) -> None:
+    print(f"\n⚠️ WARNING: Dataset {dataset_num} failed verification!")
+    print(f"Missing positions: {num_missing}")
+    print(f"Extra positions: {num_extra}")
+    print(f"Error rate: {error_rate:.2f}%")
+
+def print_summary(total_datasets: int, successful_tests: int, failed_tests: list[int],
+                  total_error_rate: float) -> None:
+    print("\n=== Test Summary ===")
+    print(f"Total datasets tested: {total_datasets}")
+    print(f"Successful tests: {successful_tests}")
+    print(f"Failed tests: {len(failed_tests)}")
+    if failed_tests:
+        print(f"Failed dataset numbers: {failed_tests}")
+    print(f"Average error rate: {total_error_rate/total_datasets:.2f}%")
+    print("=====================")
 
 def main():
+    parser = argparse.ArgumentParser(description="Verify the Controller model on the datasets of a CSV directory")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help="directory with y_bits.csv, h_for_y_bits.csv and s_bits.csv (e.g. from vector_generator.py)")
+    parser.add_argument('--datasets', type=int, default=5)
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    args = parser.parse_args()
+    params = get_params(args.params)
+
     print("\n=== Starting Multiple Dataset Test ===")
     
-    total_datasets = 5
+    total_datasets = args.datasets
     successful_tests = 0
     failed_tests = []
     total_error_rate = 0.0
@@ -59,7 +118,8 @@ def main():
     try:
         for dataset_num in range(total_datasets):
             print(f"\nTesting dataset {dataset_num}...")
-            success, error_rate = test_dataset(dataset_num, loader, debug_mode=False)
+            success, error_rate = test_dataset(dataset_num, loader, debug_mode=False,
+                                               data_dir=args.data_dir, params=params)
             
             if success:
                 successful_tests += 1
@@ -70,14 +130,7 @@ def main():
             total_error_rate += error_rate
         
         # Print summary
-        print("\n=== Test Summary ===")
-        print(f"Total datasets tested: {total_datasets}")
-        print(f"Successful tests: {successful_tests}")
-        print(f"Failed tests: {len(failed_tests)}")
-        if failed_tests:
-            print(f"Failed dataset numbers: {failed_tests}")
-        print(f"Average error rate: {total_error_rate/total_datasets:.2f}%")
-        print("=====================")
+        print_summary(total_datasets, successful_tests, failed_tests, total_error_rate)
         
     finally:
         # 파일들을 확실하게 닫아줍니다
@@ -0,0 +1,157 @@
+"""Testbench .mem files for many datasets in one streaming pass.
+
+Each dataset of the input (binary corpus files or position CSVs, read
+through DataLoader) gets its own directory. That directory holds:
+- h_for_y_<w>.mem / s_<w>.mem: the dense operand and product as <w>-bit
+  words for every requested width. Word k holds bits k*w .. k*w + w - 1,
+  MSB first on the line, as in PolynomialMemory.get_word.
+- y_<level>.mem: the sparse indices, one index_bits-wide binary number
+  per line (y_128.mem for the hardware_vulnerable / CW305 benches).
+- y_pairs_32.mem: the dummy-inserted 16/16 packed words that controller.v
+  reads. For odd weights it comes with acc_init_<w>.mem (the x^z * h
+  preload, see DummyInsertion.pad_odd_weight).
+
+Binary files are for $readmemb. With --radix hex the same words are
+written as h_for_y_<w>h.mem etc. for $readmemh. Every file is formatted
+as one array operation and written with a single write.
+"""
+import argparse
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from corpus import pack_positions
+from data_loader import DataLoader
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
+
+DEFAULT_WIDTHS = (32, 64, 128)
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+
+def word_bytes(packed: np.ndarray, total_bits: int, width: int) -> np.ndarray:
+    """(num_words, width // 8) little-endian bytes of each width-bit memory word"""
+    if width % 8:
+        raise ValueError(f"Word width {width} is not a whole number of bytes")
+    num_words = -(-total_bits // width)
+    raw = np.ascontiguousarray(packed, dtype='<u8').view(np.uint8)
+    needed = num_words * width // 8
+    if raw.size < needed:
+        raw = np.concatenate([raw, np.zeros(needed - raw.size, dtype=np.uint8)])
+    return raw[:needed].reshape(num_words, width // 8)
+
+def format_words(words: np.ndarray, radix: str = 'bin') -> bytes:
+    """One line per word (rows of little-endian bytes), MSB first, as $readmemb/$readmemh text"""
+    big_endian = words[:, ::-1]
+    if radix == 'hex':
+        digits = np.stack([HEX_DIGITS[big_endian >> 4], HEX_DIGITS[big_endian & 0xF]], axis=2)
+        chars = digits.reshape(len(words), -1)
+    elif radix == 'bin':
+        chars = np.unpackbits(big_endian, axis=1) + ord('0')
+    else:
+        raise ValueError(f"Unknown radix: {radix}")
+    lines = np.concatenate([chars, np.full((len(words), 1), ord('\n'), dtype=np.uint8)], axis=1)
+    return lines.tobytes()
+
+def format_values(values, bits: int, radix: str = 'bin') -> bytes:
+    """Integers (< 2^64) as fixed-width lines, e.g. sparse indices or packed pair words"""
+    values = np.asarray(values, dtype=np.uint64)
+    if radix == 'hex':
+        digits = -(-bits // 4)
+        shifts = np.arange(4 * (digits - 1), -1, -4, dtype=np.uint64)
+        chars = HEX_DIGITS[((values[:, None] >> shifts) & np.uint64(0xF)).astype(np.uint8)]
+    else:
+        shifts = np.arange(bits - 1, -1, -1, dtype=np.uint64)
+        chars = ((values[:, None] >> shifts) & np.uint64(1)).astype(np.uint8) + ord('0')
+    lines = np.concatenate([chars, np.full((len(values), 1), ord('\n'), dtype=np.uint8)], axis=1)
+    return lines.tobytes()
+
+def mem_name(stem: str, width: int, radix: str) -> str:
+    return f"{stem}_{width}{'h' if radix == 'hex' else ''}.mem"
+
+class MemGenerator:
+    def __init__(self, params: HQCParams = HQC_128, widths: Tuple[int, ...] = DEFAULT_WIDTHS,
+                 radixes: Tuple[str, ...] = ('bin',), index_bits: Optional[int] = None):
+        self.params = params
+        self.widths = widths
+        self.radixes = radixes
+        self.index_bits = index_bits or (params.n - 1).bit_length()
+        self.level = params.name.split('-')[-1]
+        self.dummy_inserter = params.dummy_inserter()
+
+    def dataset_files(self, y_positions: List[int], h_packed: np.ndarray,
+                      s_packed: Optional[np.ndarray]) -> Dict[str, bytes]:
+        """File name -> contents for one dataset"""
+        n = self.params.n
+        files = {}
+        for radix in self.radixes:
+            for width in self.widths:
+                files[mem_name('h_for_y', width, radix)] = format_words(word_bytes(h_packed, n, width), radix)
+                if s_packed is not None:
+                    files[mem_name('s', width, radix)] = format_words(word_bytes(s_packed, n, width), radix)
+            files[mem_name('y', int(self.level), radix)] = format_values(y_positions, self.index_bits, radix)
+
+        positions, extra = self.dummy_inserter.pad_odd_weight(y_positions)
+        _, packed_words = self.dummy_inserter.process_indices(positions, self.params.num_dummy_pairs)
+        for radix in self.radixes:
+            files[mem_name('y_pairs', 32, radix)] = format_values(packed_words, 32, radix)
+        if extra is not None:
+            h_positions = np.flatnonzero(np.unpackbits(np.ascontiguousarray(h_packed).view(np.uint8),
+                                                       bitorder='little')[:n])
+            acc_packed = pack_positions((h_positions + extra) % n, n)
+            for radix in self.radixes:
+                for width in self.widths:
+                    files[mem_name('acc_init', width, radix)] = format_words(word_bytes(acc_packed, n, width), radix)
+        return files
+
+    def run(self, y_file: str, h_file: str, s_file: Optional[str], out_dir: str,
+            dataset_indices=None, verbose: bool = False) -> int:
+        """Write one directory per dataset (dataset_00000, ...); returns the number written"""
+        loader = DataLoader(y_file, h_file, s_file)
+        count = 0
+        try:
+            if dataset_indices is None:
+                dataset_indices = range(loader.num_rows(y_file))
+            for dataset in dataset_indices:
+                y_positions = loader.read_positions(y_file, dataset)
+                h_packed = loader.read_packed(h_file, dataset, self.params.n)
+                s_packed = loader.read_packed(s_file, dataset, self.params.n) if s_file else None
+                dataset_dir = os.path.join(out_dir, f"dataset_{dataset:05d}")
+                os.makedirs(dataset_dir, exist_ok=True)
+                for name, contents in self.dataset_files(y_positions, h_packed, s_packed).items():
+                    with open(os.path.join(dataset_dir, name), 'wb') as f:
+                        f.write(contents)
+                count += 1
+                if verbose and count % 100 == 0:
+                    print(f"\r{count} datasets", end='', flush=True)
+        finally:
+            loader.close_files()
+        if verbose:
+            print(f"\r{count} datasets")
+        return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Write testbench .mem files for every dataset of a corpus")
+    parser.add_argument('out_dir')
+    parser.add_argument('--y-file', default='./simulation/data/66/y_bits.csv')
+    parser.add_argument('--h-file', default='./simulation/data/66/h_for_y_bits.csv')
+    parser.add_argument('--s-file', default='./simulation/data/66/s_bits.csv', help="'' to skip the product")
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--widths', type=int, nargs='+', default=list(DEFAULT_WIDTHS))
+    parser.add_argument('--radix', nargs='+', choices=['bin', 'hex'], default=['bin'])
+    parser.add_argument('--index-bits', type=int, help="width of the y index lines (default: bits of n - 1)")
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    generator = MemGenerator(get_params(args.params), tuple(args.widths), tuple(args.radix), args.index_bits)
+    dataset_indices = None
+    if args.limit is not None:
+        loader = DataLoader()
+        try:
+            dataset_indices = range(min(args.limit, loader.num_rows(args.y_file)))
+        finally:
+            loader.close_files()
+    count = generator.run(args.y_file, args.h_file, args.s_file or None, args.out_dir, dataset_indices, verbose=True)
+    print(f"Wrote {count} dataset directories to {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Load .mem files into packed arrays and compare FPGA readback against the simulator.
+
+read_mem_words parses a whole $readmemb/$readmemh file in one array
+operation. Each line becomes a row of little-endian bytes, the layout
+mem_generator.format_words writes. ReadbackComparator checks a full
+readback dump against an acc_mem in one vectorized call and lists the
+differing words and bit positions.
+
+LocalTarget stands in for the CW305 target of the attack notebook. It
+accepts the same fpga_write/go/fpga_read calls and register addresses
+and decodes key/data like poly_mult_top:
+- key < weight: index writes and reads,
+- weight <= key < weight + num_words: h words,
+- data of all ones: starts the multiplication.
+The stand-in differs from the RTL in two ways. It decodes the full key
+instead of 10 bits, and it exposes the product words for readback at
+keys result_base + k (result_base = weight + num_words).
+"""
+import argparse
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
+from main import run_multiplication
+
+HEX_VALUES = np.full(256, 255, dtype=np.uint8)
+HEX_VALUES[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+HEX_VALUES[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16)
+HEX_VALUES[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+
+def _mem_chars(filename: str) -> np.ndarray:
+    """(lines, digits) character matrix of a .mem file (one fixed-width word per line)"""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    if b'//' in data or b'@' in data:
+        raise ValueError(f"{filename}: comments and @address directives are not supported")
+    lines = data.split()
+    if not lines:
+        return np.zeros((0, 0), dtype=np.uint8)
+    width = len(lines[0])
+    if any(len(line) != width for line in lines):
+        raise ValueError(f"{filename}: lines of different widths")
+    return np.frombuffer(b''.join(lines), dtype=np.uint8).reshape(len(lines), width)
+
+def _detect_radix(chars: np.ndarray) -> str:
+    return 'bin' if np.all((chars == ord('0')) | (chars == ord('1'))) else 'hex'
+
+def read_mem_words(filename: str, radix: Optional[str] = None) -> np.ndarray:
+    """(num_words, bytes_per_word) little-endian bytes of each line (radix: 'bin', 'hex' or detect)
+
+    Detection picks 'bin' when every digit is 0 or 1, so pass radix='hex' for
+    hex files that could look binary.
+    """
+    chars = _mem_chars(filename)
+    radix = radix or _detect_radix(chars)
+    if radix == 'bin':
+        bits = chars - ord('0')
+        if np.any(bits > 1):
+            raise ValueError(f"{filename}: non-binary digit")
+        pad = -bits.shape[1] % 8
+        bits = np.concatenate([np.zeros((len(bits), pad), dtype=np.uint8), bits], axis=1)
+        big_endian = np.packbits(bits, axis=1)
+    elif radix == 'hex':
+        nibbles = HEX_VALUES[chars]
+        if np.any(nibbles == 255):
+            raise ValueError(f"{filename}: non-hex digit")
+        if nibbles.shape[1] % 2:
+            nibbles = np.concatenate([np.zeros((len(nibbles), 1), dtype=np.uint8), nibbles], axis=1)
+        big_endian = (nibbles[:, 0::2] << 4) | nibbles[:, 1::2]
+    else:
+        raise ValueError(f"Unknown radix: {radix}")
+    return np.ascontiguousarray(big_endian[:, ::-1])
+
+def read_mem_values(filename: str, radix: Optional[str] = None) -> np.ndarray:
+    """Lines of at most 64 bits as uint64 values (index lists, packed pair words)"""
+    words = read_mem_words(filename, radix)
+    if words.shape[1] > 8:
+        raise ValueError(f"{filename}: {words.shape[1] * 8}-bit lines do not fit uint64")
+    padded = np.zeros((len(words), 8), dtype=np.uint8)
+    padded[:, :words.shape[1]] = words
+    return padded.view('<u8').ravel()
+
+def read_mem_packed(filename: str, total_bits: int, radix: Optional[str] = None) -> np.ndarray:
+    """A dense polynomial .mem file as one packed little-endian uint64 row (the DenseCorpus layout)"""
+    raw = read_mem_words(filename, radix).ravel()
+    row_bytes = -(-total_bits // 64) * 8
+    packed = np.zeros(row_bytes, dtype=np.uint8)
+    packed[:min(raw.size, row_bytes)] = raw[:row_bytes]
+    bits = np.unpackbits(packed, bitorder='little')
+    bits[total_bits:] = 0
+    return np.packbits(bits, bitorder='little').view('<u8')
+
+def memory_words(memory) -> np.ndarray:
+    """(num_words, word_size // 8) little-endian bytes of a PolynomialMemory or ArrayPolynomialMemory"""
+    word_bytes = memory.word_size // 8
+    if word_bytes in (1, 2, 4, 8):
+        words = np.array(memory.get_memory(), dtype=f'<u{word_bytes}')
+        return words.view(np.uint8).reshape(-1, word_bytes)
+    raw = b''.join(int(word).to_bytes(word_bytes, 'little') for word in memory.get_memory())
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, word_bytes)
+
+class ReadbackComparator:
+    """Compares readback dumps (word byte rows) against one simulated acc_mem"""
+    def __init__(self, acc_mem):
+        self.word_size = acc_mem.word_size
+        self.total_bits = acc_mem.total_bits
+        # Bits past total_bits in the last word are datapath leftovers, not part of the product
+        words = memory_words(acc_mem)
+        bits = np.unpackbits(words.ravel(), bitorder='little')
+        bits[self.total_bits:] = 0
+        self.expected = np.packbits(bits, bitorder='little').reshape(words.shape)
+
+    def compare(self, readback: np.ndarray) -> Tuple[bool, np.ndarray, np.ndarray]:
+        """(matches, differing word indices, differing bit positions); missing words count as differing"""
+        readback = np.asarray(readback, dtype=np.uint8).reshape(-1, self.expected.shape[1])
+        num_words = len(self.expected)
+        got = np.zeros_like(self.expected)
+        got[:min(len(readback), num_words)] = readback[:num_words]
+        diff = got ^ self.expected
+        diff_bits = np.unpackbits(diff.ravel(), bitorder='little')[:self.total_bits]
+        diff_positions = np.flatnonzero(diff_bits)
+        diff_words = np.unique(diff_positions // self.word_size)
+        if len(readback) < num_words:
+            diff_words = np.union1d(diff_words, np.arange(len(readback), num_words))
+        return diff_words.size == 0, diff_words, diff_positions
+
+    def compare_file(self, filename: str, radix: Optional[str] = None) -> Tuple[bool, np.ndarray, np.ndarray]:
+        return self.compare(read_mem_words(filename, radix))
+
+    def print_report(self, readback: np.ndarray, max_words: int = 10) -> None:
+        matches, diff_words, diff_positions = self.compare(readback)
+        print("\n=== Readback Comparison ===")
+        print(f"Words: {len(self.expected)} x {self.word_size} bits")
+        if matches:
+            print("READBACK MATCHES ✓")
+        else:
+            print(f"READBACK DIFFERS ✗: {diff_words.size} words, {diff_positions.size} bits")
+            readback = np.asarray(readback, dtype=np.uint8).reshape(-1, self.expected.shape[1])
+            width = self.word_size // 4
+            for word in diff_words[:max_words]:
+                expected = int.from_bytes(self.expected[word].tobytes(), 'little')
+                got = int.from_bytes(readback[word].tobytes(), 'little') if word < len(readback) else None
+                got_text = f"{got:0{width}x}" if got is not None else "missing"
+                print(f"  word {word:4d}: expected {expected:0{width}x} got {got_text}")
+            if diff_words.size > max_words:
+                print(f"  ... {diff_words.size - max_words} more")
+        print("===========================")
+
+class LocalTarget:
+    """Software stand-in for the CW305 poly_mult target (see the module docstring for the key map)"""
+    REG_CRYPT_GO = 0x05
+    REG_CRYPT_TEXTIN = 0x06
+    REG_CRYPT_CIPHEROUT = 0x09
+    REG_CRYPT_KEY = 0x0a
+    START = (1 << 128) - 1
+
+    def __init__(self, params: HQCParams = HQC_128, weight: Optional[int] = None, word_size: int = 32,
+                 flip_bits: Optional[List[int]] = None):
+        self.params = params
+        self.weight = params.weight if weight is None else weight
+        self.word_size = word_size
+        self.num_words = -(-params.n // word_size)
+        self.result_base = self.weight + self.num_words
+        self.flip_bits = flip_bits or []  # product bits to corrupt, to exercise the comparator
+        self.registers = {self.REG_CRYPT_TEXTIN: bytearray(16), self.REG_CRYPT_KEY: bytearray(16),
+                          self.REG_CRYPT_CIPHEROUT: bytearray(16)}
+        self.positions = [0] * self.weight
+        self.h_words = [0] * self.num_words
+        self.result_words = [0] * self.num_words
+        self.runs = 0
+
+    def fpga_write(self, address: int, data) -> None:
+        self.registers[address] = bytearray(data)
+
+    def fpga_read(self, address: int, size: int) -> bytearray:
+        return bytearray(self.registers.get(address, bytearray(size))[:size])
+
+    def go(self) -> None:
+        key = int.from_bytes(self.registers[self.REG_CRYPT_KEY], 'little')
+        data = int.from_bytes(self.registers[self.REG_CRYPT_TEXTIN], 'little')
+        word_mask = (1 << self.word_size) - 1
+        out = data
+        if data == self.START:
+            self._multiply()
+            out = self.result_words[0]
+        elif data != 0:
+            if key < self.weight:
+                self.positions[key] = data & 0xFFFF
+            elif key < self.result_base:
+                self.h_words[key - self.weight] = data & word_mask
+        elif key < self.weight:
+            out = self.positions[key]
+        elif key < self.result_base:
+            out = self.h_words[key - self.weight]
+        elif key < self.result_base + self.num_words:
+            out = self.result_words[key - self.result_base]
+        else:
+            out = 1
+        self.registers[self.REG_CRYPT_CIPHEROUT] = bytearray(out.to_bytes(16, 'little'))
+
+    def _multiply(self) -> None:
+        multiplier = self.params.reference()
+        h_packed = sum(word << (self.word_size * i) for i, word in enumerate(self.h_words))
+        product = multiplier.multiply_packed(self.positions, h_packed)
+        for pos in self.flip_bits:
+            product ^= 1 << pos
+        word_mask = (1 << self.word_size) - 1
+        self.result_words = [(product >> (self.word_size * i)) & word_mask for i in range(self.num_words)]
+        self.runs += 1
+
+def write_word(target, key: int, value: int) -> None:
+    """One notebook-style register transaction (key, 128-bit data, go)"""
+    target.fpga_write(target.REG_CRYPT_KEY, key.to_bytes(16, 'little'))
+    target.fpga_write(target.REG_CRYPT_TEXTIN, value.to_bytes(16, 'little'))
+    target.go()
+
+def load_operands(target, positions: List[int], h_words: List[int]) -> None:
+    """Write the sparse indices (keys 0..) and the h words (keys weight..) like the notebook's load loop"""
+    for key, value in enumerate(list(positions) + list(h_words)):
+        write_word(target, key, int(value))
+
+def read_words(target, first_key: int, count: int, word_size: int = 32) -> np.ndarray:
+    """Read `count` words back (data 0 at keys first_key..) as (count, word_size // 8) byte rows"""
+    dump = bytearray()
+    for key in range(first_key, first_key + count):
+        write_word(target, key, 0)
+        dump += target.fpga_read(target.REG_CRYPT_CIPHEROUT, 16)[:word_size // 8]
+    return np.frombuffer(bytes(dump), dtype=np.uint8).reshape(count, word_size // 8)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a readback .mem dump with the Controller model result")
+    parser.add_argument('--y-mem', required=True, help="sparse index .mem (e.g. y_128.mem)")
+    parser.add_argument('--h-mem', required=True, help="dense operand .mem (e.g. h_for_y_32.mem)")
+    parser.add_argument('--readback', help="readback dump .mem; without it the LocalTarget stand-in is read")
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--radix', choices=['bin', 'hex'], help="default: detect per file")
+    parser.add_argument('--flip-bits', type=int, nargs='*', default=[], help="stand-in product bits to corrupt")
+    args = parser.parse_args()
+
+    params = get_params(args.params)
+    positions = read_mem_values(args.y_mem, args.radix).tolist()
+    h_words = read_mem_words(args.h_mem, args.radix)
+    word_size = h_words.shape[1] * 8
+    h_packed = read_mem_packed(args.h_mem, params.n, args.radix)
+    h_positions = np.flatnonzero(np.unpackbits(h_packed.view(np.uint8), bitorder='little')[:params.n]).tolist()
+
+    controller = run_multiplication(positions, h_positions, mode="fast",
+                                    params=params.with_options(word_size=word_size))
+    comparator = ReadbackComparator(controller.acc_mem)
+    if args.readback:
+        readback = read_mem_words(args.readback, args.radix)
+    else:
+        target = LocalTarget(params, weight=len(positions), word_size=word_size, flip_bits=args.flip_bits)
+        h_values = [int.from_bytes(word.tobytes(), 'little') for word in h_words]
+        load_operands(target, positions, h_values)
+        write_word(target, 7000, LocalTarget.START)
+        readback = read_words(target, target.result_base, target.num_words, word_size)
+    comparator.print_report(readback)
+
+if __name__ == "__main__":
+    main()
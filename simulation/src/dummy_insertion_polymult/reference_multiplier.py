@@ -0,0 +1,50 @@
+from typing import List
+
+class RotationMultiplier:
+    """Sparse x dense reference multiplier over GF(2)[x]/(x^n - 1).
+
+    The dense operand is kept bit-packed in a single Python integer, so the
+    product is the XOR of one cyclic rotation of it per sparse index.
+    """
+    def __init__(self, total_bits: int = 17669):
+        self.total_bits = total_bits
+        self.mask = (1 << total_bits) - 1
+
+    def pack_positions(self, positions: List[int]) -> int:
+        """Pack bit positions into an integer (positions >= total_bits are ignored)"""
+        packed = 0
+        for pos in positions:
+            if pos < self.total_bits:
+                packed |= (1 << pos)
+        return packed
+
+    def unpack_positions(self, packed: int) -> List[int]:
+        """Return the sorted positions of the 1-bits of a packed polynomial"""
+        bits = bin(packed & self.mask)[:1:-1]
+        return [pos for pos, bit in enumerate(bits) if bit == '1']
+
+    def rotate(self, packed: int, shift: int) -> int:
+        """Multiply a packed polynomial by x^shift mod (x^n - 1)"""
+        shift %= self.total_bits
+        if shift == 0:
+            return packed
+        return ((packed << shift) | (packed >> (self.total_bits - shift))) & self.mask
+
+    def multiply_packed(self, sparse_positions: List[int], dense_packed: int) -> int:
+        """XOR one rotation of the dense operand per sparse index
+
+        With the operand doubled (d | d << n), bits n..2n-1 of (doubled << pos)
+        are the rotation by pos, so each index costs one shift and one XOR and
+        the wrap-around is cut out once at the end.
+        """
+        doubled = dense_packed | (dense_packed << self.total_bits)
+        result = 0
+        for pos in sparse_positions:
+            if pos < self.total_bits:
+                result ^= doubled << pos
+        return (result >> self.total_bits) & self.mask
+
+    def multiply(self, sparse_positions: List[int], dense_positions: List[int]) -> List[int]:
+        """Multiply two polynomials given as bit positions and return the result positions"""
+        dense_packed = self.pack_positions(dense_positions)
+        return self.unpack_positions(self.multiply_packed(sparse_positions, dense_packed))
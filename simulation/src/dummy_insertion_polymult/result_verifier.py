@@ -1,36 +1,75 @@
+import numpy as np
 from typing import List, Tuple
 from memory import PolynomialMemory
+from reference_multiplier import RotationMultiplier
 
 class ResultVerifier:
     def __init__(self, acc_mem: PolynomialMemory, expected_positions: List[int]):
         self.acc_mem = acc_mem
         self.expected_positions = expected_positions
         self.total_bits = acc_mem.total_bits
+        self.num_bytes = (self.total_bits + 7) // 8
+
+        # Expected vector packed LSB-first, the same bit order as acc_mem words
+        positions = np.asarray(expected_positions, dtype=np.int64)
+        in_range = (positions >= 0) & (positions < self.total_bits)
+        self.out_of_range = sorted(set(positions[~in_range].tolist()))
+        expected_bits = np.zeros(self.num_bytes * 8, dtype=np.uint8)
+        expected_bits[positions[in_range]] = 1
+        self.expected_packed = np.packbits(expected_bits, bitorder='little')
+
+    @classmethod
+    def from_packed(cls, acc_mem: PolynomialMemory, expected_words: np.ndarray) -> 'ResultVerifier':
+        """Build a verifier from an already packed expected vector (e.g. a DenseCorpus row)"""
+        bits = np.unpackbits(np.ascontiguousarray(expected_words).view(np.uint8), bitorder='little')
+        return cls(acc_mem, np.flatnonzero(bits[:acc_mem.total_bits]).tolist())
+
+    @classmethod
+    def from_reference(cls, acc_mem: PolynomialMemory, sparse_positions: List[int],
+                       dense_positions: List[int]) -> 'ResultVerifier':
+        """Build a verifier whose expected positions come from the rotation reference multiplier"""
+        multiplier = RotationMultiplier(total_bits=acc_mem.total_bits)
+        return cls(acc_mem, multiplier.multiply(sparse_positions, dense_positions))
         
     def _get_bit_from_memory(self, position: int) -> int:
         """Get a bit from memory at given position"""
-        word_idx = position // 32
-        bit_idx = position % 32
+        word_idx = position // self.acc_mem.word_size
+        bit_idx = position % self.acc_mem.word_size
         word = self.acc_mem.get_word(word_idx)
         return (word >> bit_idx) & 1
         
+    def _computed_packed(self) -> np.ndarray:
+        """acc_mem as LSB-first bytes, with the bits past total_bits cleared"""
+        word_bytes = self.acc_mem.word_size // 8
+        if word_bytes <= 8:
+            words = np.array(self.acc_mem.get_memory(), dtype=f'<u{word_bytes}')
+            packed = words.view(np.uint8)[:self.num_bytes].copy()
+        else:
+            raw = b''.join(int(word).to_bytes(word_bytes, 'little') for word in self.acc_mem.get_memory())
+            packed = np.frombuffer(raw, dtype=np.uint8)[:self.num_bytes].copy()
+        if self.total_bits % 8:
+            packed[-1] &= (1 << (self.total_bits % 8)) - 1
+        return packed
+
+    def matches(self) -> bool:
+        """Early-exit equality check for bulk runs where only pass/fail matters"""
+        return not self.out_of_range and np.array_equal(self._computed_packed(), self.expected_packed)
+
     def verify_results(self) -> tuple[bool, List[int], List[int], float]:
         """Verify if the computed results match expected positions"""
-        computed_positions = []
-        for pos in range(self.total_bits):
-            if self._get_bit_from_memory(pos):
-                computed_positions.append(pos)
-                
+        computed = self._computed_packed()
+        diff = np.unpackbits(computed ^ self.expected_packed, bitorder='little')
+        expected_bits = np.unpackbits(self.expected_packed, bitorder='little')
+
         # Find differences
-        computed_set = set(computed_positions)
-        expected_set = set(self.expected_positions)
-        
-        missing_positions = sorted(list(expected_set - computed_set))
-        extra_positions = sorted(list(computed_set - expected_set))
+        diff_positions = np.flatnonzero(diff)
+        missing_positions = diff_positions[expected_bits[diff_positions] == 1].tolist() + self.out_of_range
+        extra_positions = diff_positions[expected_bits[diff_positions] == 0].tolist()
         
         # Calculate error rate
         total_errors = len(missing_positions) + len(extra_positions)
-        total_ones = len(expected_set | computed_set)  # Union of both sets
+        total_ones = int(np.count_nonzero(np.unpackbits(computed | self.expected_packed))) + \
+                     len(self.out_of_range)  # Union of both sets
         error_rate = (total_errors / total_ones * 100) if total_ones > 0 else 0
         
         return len(missing_positions) == 0 and len(extra_positions) == 0, missing_positions, extra_positions, error_rate
@@ -1,15 +1,18 @@
 from typing import Tuple, List
 
 class ShiftRegister:
-    def __init__(self, max_size: int = 19, debug_mode: bool = False):
+    def __init__(self, max_size: int = 19, debug_mode: bool = False, word_size: int = 32):
         """
         ShiftRegister 초기화
         
         Args:
             max_size: 최대 레지스터 크기
             debug_mode: 디버그 모드 활성화 여부
+            word_size: 워드 비트 폭 (데이터패스 폭)
         """
         self.max_size = max_size
+        self.word_size = word_size
+        self.word_mask = (1 << word_size) - 1
         self.register: List[Tuple[int, int]] = []  # (word, idx) 튜플의 리스트
         self.debug_mode = debug_mode
         
@@ -25,7 +28,7 @@ class ShiftRegister:
             print(f"Register size: {len(self.register)}/{self.max_size}")
             print("Register contents:")
             for i, (word, idx) in enumerate(self.register):
-                print(f"Position {i:2d}: [{idx:3d}] {word:032b} ({word:08X})")
+                print(f"Position {i:2d}: [{idx:3d}] {word:0{self.word_size}b} ({word:0{self.word_size // 4}X})")
             print("===================\n")
     
     def clear(self) -> None:
@@ -47,12 +50,12 @@ class ShiftRegister:
         if len(self.register) >= self.max_size:
             removed_word, removed_idx = self.register.pop(0)
             if self.debug_mode:
-                print(f"\nRemoved oldest word[{removed_idx}]: {removed_word:08X}")
+                print(f"\nRemoved oldest word[{removed_idx}]: {removed_word:0{self.word_size // 4}X}")
             
-        self.register.append((word & 0xFFFFFFFF, word_idx))
+        self.register.append((word & self.word_mask, word_idx))
         
         if self.debug_mode:
-            print(f"\nAdded word[{word_idx}]: {word:08X}")
+            print(f"\nAdded word[{word_idx}]: {word:0{self.word_size // 4}X}")
             self.visualize()
             
     def get_word_pair(self, high_left_idx: int, high_right_idx: int, 
@@ -95,15 +98,166 @@ class ShiftRegister:
         
         if self.debug_mode:
             print("\n=== Word Pair Retrieval ===")
-            print(f"High Right  {high_right:08X}")
-            print(f"High Left   {high_left:08X}")
-            print(f"Low Right   {low_right:08X}")
-            print(f"Low Left    {low_left:08X}")
+            print(f"High Right  {high_right:0{self.word_size // 4}X}")
+            print(f"High Left   {high_left:0{self.word_size // 4}X}")
+            print(f"Low Right   {low_right:0{self.word_size // 4}X}")
+            print(f"Low Left    {low_left:0{self.word_size // 4}X}")
             print("=========================\n")
         
         return (high_left, high_right, low_left, low_right)
 
 
+class RingShiftRegister:
+    def __init__(self, max_size: int = 19, debug_mode: bool = False, word_size: int = 32):
+        """
+        고정 용량 원형 버퍼 ShiftRegister (ShiftRegister와 동일한 동작, O(1) add_word)
+        
+        각 워드를 slot과 slot + max_size에 두 번 기록하므로 논리 위치 p의 워드는
+        항상 words[head + p]로 나머지 연산 없이 읽힌다.
+        
+        Args:
+            max_size: 최대 레지스터 크기
+            debug_mode: 디버그 모드 활성화 여부
+            word_size: 워드 비트 폭 (데이터패스 폭)
+        """
+        self.max_size = max_size
+        self.word_size = word_size
+        self.word_mask = (1 << word_size) - 1
+        self.words: List[int] = [0] * (2 * max_size)    # 슬롯별 워드 (미러 포함)
+        self.indices: List[int] = [0] * max_size        # 슬롯별 워드 인덱스
+        self.head = 0   # 가장 오래된 워드(논리 위치 0)의 슬롯
+        self.count = 0
+        self.debug_mode = debug_mode
+        
+    @property
+    def register(self) -> List[Tuple[int, int]]:
+        """논리 순서의 (word, idx) 목록 (ShiftRegister.register와 동일한 형태)"""
+        return [(self.words[self.head + i], self.indices[(self.head + i) % self.max_size])
+                for i in range(self.count)]
+        
+    def debug_print(self, message: str) -> None:
+        """디버그 메시지 출력"""
+        if self.debug_mode:
+            print(message)
+            
+    def visualize(self) -> None:
+        """레지스터의 현재 상태를 시각화"""
+        if self.debug_mode:
+            print("\n=== Register State ===")
+            print(f"Register size: {self.count}/{self.max_size}")
+            print("Register contents:")
+            for i, (word, idx) in enumerate(self.register):
+                print(f"Position {i:2d}: [{idx:3d}] {word:0{self.word_size}b} ({word:0{self.word_size // 4}X})")
+            print("===================\n")
+    
+    def clear(self) -> None:
+        """레지스터 초기화"""
+        self.head = 0
+        self.count = 0
+        
+    def size(self) -> int:
+        """현재 레지스터 크기 반환"""
+        return self.count
+        
+    def add_word(self, word: int, word_idx: int) -> None:
+        """
+        워드 추가 (가득 차 있으면 가장 오래된 슬롯을 덮어씀)
+        
+        Args:
+            word: 추가할 워드 값
+            word_idx: 워드의 인덱스
+        """
+        if self.count >= self.max_size:
+            slot = self.head
+            self.head = slot + 1 if slot + 1 < self.max_size else 0
+            if self.debug_mode:
+                print(f"\nRemoved oldest word[{self.indices[slot]}]: {self.words[slot]:0{self.word_size // 4}X}")
+        else:
+            slot = self.head + self.count
+            if slot >= self.max_size:
+                slot -= self.max_size
+            self.count += 1
+            
+        self.words[slot] = self.words[slot + self.max_size] = word & self.word_mask
+        self.indices[slot] = word_idx
+        
+        if self.debug_mode:
+            print(f"\nAdded word[{word_idx}]: {word:0{self.word_size // 4}X}")
+            self.visualize()
+            
+    def get_word(self, position: int) -> int:
+        """
+        논리 위치의 워드 반환 (list와 같이 음수 위치는 끝에서부터)
+        
+        Args:
+            position: 논리 위치 (0 = 가장 오래된 워드)
+        """
+        count = self.count
+        if position < 0:
+            position += count
+        if position < 0 or position >= count:
+            raise IndexError("list index out of range")
+        return self.words[self.head + position]
+            
+    def get_word_pair(self, high_left_idx: int, high_right_idx: int, 
+                     low_left_idx: int, low_right_idx: int) -> Tuple[int, int, 
+                                                                    int, int]:
+        """
+        지정된 인덱스의 워드 쌍들을 가져오기 (None 인덱스는 0)
+        
+        Returns:
+            (high_left, high_right, low_left, low_right)
+        """
+        # get_word inlined: this runs once per round in Controller.process_word
+        words, head, count = self.words, self.head, self.count
+        tail = head + count
+        
+        if high_right_idx is None:
+            high_right = 0
+        elif 0 <= high_right_idx < count:
+            high_right = words[head + high_right_idx]
+        elif -count <= high_right_idx < 0:
+            high_right = words[tail + high_right_idx]
+        else:
+            raise IndexError("list index out of range")
+        
+        if high_left_idx is None:
+            high_left = 0
+        elif 0 <= high_left_idx < count:
+            high_left = words[head + high_left_idx]
+        elif -count <= high_left_idx < 0:
+            high_left = words[tail + high_left_idx]
+        else:
+            raise IndexError("list index out of range")
+        
+        if low_right_idx is None:
+            low_right = 0
+        elif 0 <= low_right_idx < count:
+            low_right = words[head + low_right_idx]
+        elif -count <= low_right_idx < 0:
+            low_right = words[tail + low_right_idx]
+        else:
+            raise IndexError("list index out of range")
+        
+        if low_left_idx is None:
+            low_left = 0
+        elif 0 <= low_left_idx < count:
+            low_left = words[head + low_left_idx]
+        elif -count <= low_left_idx < 0:
+            low_left = words[tail + low_left_idx]
+        else:
+            raise IndexError("list index out of range")
+        
+        if self.debug_mode:
+            print("\n=== Word Pair Retrieval ===")
+            print(f"High Right  {high_right:0{self.word_size // 4}X}")
+            print(f"High Left   {high_left:0{self.word_size // 4}X}")
+            print(f"Low Right   {low_right:0{self.word_size // 4}X}")
+            print(f"Low Left    {low_left:0{self.word_size // 4}X}")
+            print("=========================\n")
+        
+        return (high_left, high_right, low_left, low_right)
+
 def run_tests():
     """ShiftRegister 테스트 실행"""
     print("\n=== Starting ShiftRegister Test ===")
@@ -0,0 +1,40 @@
+import argparse
+
+from trace_recorder import EVENT_NAMES, filter_trace, format_record, load_trace
+
+def parse_cycle_range(text: str) -> tuple[int, int]:
+    """'A:B' -> [A, B); either side may be empty"""
+    start, _, end = text.partition(':')
+    return int(start) if start else 0, int(end) if end else 2 ** 64 - 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Dump or filter a Controller trace saved by TraceRecorder.save")
+    parser.add_argument('trace_file')
+    parser.add_argument('--event', choices=list(EVENT_NAMES.values()))
+    parser.add_argument('--sparse-word-idx', type=int)
+    parser.add_argument('--load-word-idx', type=int)
+    parser.add_argument('--acc-addr', type=int)
+    parser.add_argument('--cycles', type=parse_cycle_range, help="cycle range A:B (B exclusive)")
+    parser.add_argument('--changed-only', action='store_true', help="only events that changed the acc word")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--count', action='store_true', help="print only the number of matching events")
+    parser.add_argument('--word-size', type=int, default=32, help="datapath width the trace was recorded with")
+    args = parser.parse_args()
+
+    event = None
+    if args.event is not None:
+        event = next(kind for kind, name in EVENT_NAMES.items() if name == args.event)
+
+    records = filter_trace(load_trace(args.trace_file), event=event, sparse_word_idx=args.sparse_word_idx,
+                           load_word_idx=args.load_word_idx, acc_addr=args.acc_addr,
+                           cycle_range=args.cycles, changed_only=args.changed_only)
+    if args.count:
+        print(len(records))
+        return
+    if args.limit is not None:
+        records = records[:args.limit]
+    for record in records:
+        print(format_record(record, args.word_size))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import numpy as np
+
+# Event kinds
+EVENT_INIT_HIGH = 0   # _process_initial_acc for the high shift
+EVENT_INIT_LOW = 1    # _process_initial_acc for the low shift
+EVENT_ROUND = 2       # one load_word_idx round of process_word
+EVENT_NAMES = {EVENT_INIT_HIGH: 'init_high', EVENT_INIT_LOW: 'init_low', EVENT_ROUND: 'round'}
+
+WORD_FIELDS = ('high_left', 'high_right', 'low_left', 'low_right', 'acc_before', 'acc_after')
+
+def trace_dtype(word_size: int = 32) -> np.dtype:
+    """Record layout; datapath words wider than 64 bits are stored as little-endian uint64 lanes"""
+    lanes = -(-word_size // 64)
+    word = '<u8' if lanes == 1 else ('<u8', (lanes,))
+    return np.dtype([
+        ('cycle', '<u8'),
+        ('event', 'u1'),
+        ('sparse_word_idx', '<u2'),
+        ('sparse_word', '<u4'),
+        ('load_word_idx', '<i4'),
+        ('acc_addr', '<u4'),
+    ] + [(field, word) for field in WORD_FIELDS])
+
+TRACE_DTYPE = trace_dtype()
+
+def word_value(value) -> int:
+    """A record word field as an int (joins the uint64 lanes of wide datapaths)"""
+    if np.ndim(value) == 0:
+        return int(value)
+    return sum(int(lane) << (64 * i) for i, lane in enumerate(value))
+
+class TraceRecorder:
+    """Collects Controller events into a preallocated structured array.
+
+    For initial-acc events the operand fields hold normal word 0, the two
+    tail words (551/552 for HQC-128) and 0.
+    """
+    def __init__(self, capacity: int = 1 << 16, word_size: int = 32):
+        self.buffer = np.zeros(capacity, dtype=trace_dtype(word_size))
+        self.lanes = -(-word_size // 64)
+        self.count = 0
+
+    def record(self, cycle: int, event: int, sparse_word_idx: int, sparse_word: int,
+               load_word_idx: int, acc_addr: int, high_left: int, high_right: int,
+               low_left: int, low_right: int, acc_before: int, acc_after: int) -> None:
+        if self.count == len(self.buffer):
+            self.buffer = np.resize(self.buffer, 2 * len(self.buffer))
+        words = (high_left, high_right, low_left, low_right, acc_before, acc_after)
+        if self.lanes > 1:
+            words = tuple(tuple((word >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(self.lanes))
+                          for word in words)
+        self.buffer[self.count] = (cycle, event, sparse_word_idx, sparse_word, load_word_idx, acc_addr) + words
+        self.count += 1
+
+    @property
+    def records(self) -> np.ndarray:
+        return self.buffer[:self.count]
+
+    def clear(self) -> None:
+        self.count = 0
+
+    def save(self, filename: str) -> None:
+        """Save the recorded events as .npy (read back with load_trace or trace_dump.py)"""
+        np.save(filename, self.records)
+
+def load_trace(filename: str) -> np.ndarray:
+    return np.load(filename)
+
+def filter_trace(records: np.ndarray, event: int = None, sparse_word_idx: int = None,
+                 load_word_idx: int = None, acc_addr: int = None, cycle_range: tuple = None,
+                 changed_only: bool = False) -> np.ndarray:
+    """Select records matching every given criterion"""
+    mask = np.ones(len(records), dtype=bool)
+    if event is not None:
+        mask &= records['event'] == event
+    if sparse_word_idx is not None:
+        mask &= records['sparse_word_idx'] == sparse_word_idx
+    if load_word_idx is not None:
+        mask &= records['load_word_idx'] == load_word_idx
+    if acc_addr is not None:
+        mask &= records['acc_addr'] == acc_addr
+    if cycle_range is not None:
+        mask &= (records['cycle'] >= cycle_range[0]) & (records['cycle'] < cycle_range[1])
+    if changed_only:
+        changed = records['acc_before'] != records['acc_after']
+        mask &= changed.any(axis=1) if changed.ndim > 1 else changed
+    return records[mask]
+
+def format_record(record, word_size: int = 32) -> str:
+    width = word_size // 4
+    return (f"{int(record['cycle']):8d} {EVENT_NAMES[int(record['event'])]:9s} "
+            f"sw[{int(record['sparse_word_idx']):3d}]={int(record['sparse_word']):08X} "
+            f"load={int(record['load_word_idx']):4d} acc[{int(record['acc_addr']):4d}] "
+            f"HL={word_value(record['high_left']):0{width}X} HR={word_value(record['high_right']):0{width}X} "
+            f"LL={word_value(record['low_left']):0{width}X} LR={word_value(record['low_right']):0{width}X} "
+            f"{word_value(record['acc_before']):0{width}X} -> {word_value(record['acc_after']):0{width}X}")
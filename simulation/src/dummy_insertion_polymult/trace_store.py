@@ -0,0 +1,235 @@
+"""Append-only binary trace store (replaces the notebook's traces.csv dumps).
+
+File: 32-byte header (magic b'TRCS', version, sample type, samples per
+trace, scale, offset) followed by fixed-size records:
+
+    key (uint32) | textin (16 bytes) | sparse_word (int32, -1 = unknown) | samples
+
+key is the REG_CRYPT_KEY index of the capture (number_to_bytearray's value
+in CW305_vulnerable_attack.ipynb) and textin the 16 data bytes written with
+it. Samples are float32, or int16 when the store is quantized: a stored q
+stands for q * scale + offset. Without a given scale the writer picks one
+from the first appended block, with 2x headroom; later samples outside the
+int16 range are clipped.
+
+The row count is not in the header. It is (file size - header) // record
+size, so appending is a plain write at the end of the file and a store cut
+short by a crash loses at most the last partial record. TraceStore
+memory-maps the records, so opening a store of any size costs only the
+header read. Slicing it returns dequantized float32 traces.
+
+Capture loop:
+
+    with TraceStoreWriter('traces.trs', scope.adc.samples, 'int16') as store:
+        for i in range(N):
+            ret = cw.capture_trace(scope, target, text, key)
+            store.append(ret.wave, key=7000, textin=text)
+"""
+import argparse
+import struct
+from itertools import islice
+from typing import Optional, Union
+
+import numpy as np
+
+from corpus import read_magic
+
+TRACE_MAGIC = b'TRCS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIdd4x')  # magic, version, sample type, samples, scale, offset
+SAMPLE_TYPES = {0: 'float32', 1: 'int16'}
+SAMPLE_CODES = {name: code for code, name in SAMPLE_TYPES.items()}
+INT16_HEADROOM = 16384
+
+def trace_record_dtype(samples: int, sample_type: str = 'float32') -> np.dtype:
+    sample = '<f4' if sample_type == 'float32' else '<i2'
+    return np.dtype([('key', '<u4'), ('textin', 'u1', (16,)), ('sparse_word', '<i4'),
+                     ('samples', sample, (samples,))])
+
+def trace_header(samples: int, sample_type: str = 'float32', scale: float = 1.0, offset: float = 0.0) -> bytes:
+    return HEADER.pack(TRACE_MAGIC, VERSION, SAMPLE_CODES[sample_type], samples, scale, offset)
+
+def _read_header(filename: str):
+    with open(filename, 'rb') as f:
+        header = HEADER.unpack(f.read(HEADER.size))
+    if header[0] != TRACE_MAGIC:
+        raise ValueError(f"{filename} is not a trace store")
+    if header[1] != VERSION:
+        raise ValueError(f"Unsupported trace store version {header[1]} in {filename}")
+    return SAMPLE_TYPES[header[2]], header[3], header[4], header[5]
+
+def is_trace_store(filename: str) -> bool:
+    return read_magic(filename) == TRACE_MAGIC
+
+def quantize(traces: np.ndarray, scale: float, offset: float = 0.0) -> np.ndarray:
+    return np.clip(np.rint((traces - offset) / scale), -32768, 32767).astype('<i2')
+
+def _textin_bytes(textin: Union[None, bytes, bytearray, np.ndarray]) -> np.ndarray:
+    """(16,) or (rows, 16) uint8 from bytes, byte rows or None (all zero)"""
+    if textin is None:
+        return np.zeros(16, dtype=np.uint8)
+    if isinstance(textin, (bytes, bytearray)):
+        return np.frombuffer(bytes(textin).ljust(16, b'\0')[:16], dtype=np.uint8)
+    return np.asarray(textin, dtype=np.uint8)
+
+class TraceStoreWriter:
+    """Appends traces to a new or existing store"""
+    def __init__(self, filename: str, samples: Optional[int] = None, sample_type: str = 'float32',
+                 scale: Optional[float] = None, offset: float = 0.0, append: bool = False):
+        self.filename = filename
+        if append:
+            self.sample_type, self.samples, self.scale, self.offset = _read_header(filename)
+            dtype = trace_record_dtype(self.samples, self.sample_type)
+            self.file = open(filename, 'r+b', buffering=1 << 20)
+            # Drop a partial record left by an interrupted capture
+            self.file.seek(0, 2)
+            rows = (self.file.tell() - HEADER.size) // dtype.itemsize
+            self.file.truncate(HEADER.size + rows * dtype.itemsize)
+            self.file.seek(0, 2)
+            self.header_written = True
+        else:
+            if sample_type not in SAMPLE_CODES:
+                raise ValueError(f"Unknown sample type: {sample_type} (expected one of {sorted(SAMPLE_CODES)})")
+            if samples is None:
+                raise ValueError("A new trace store needs the number of samples per trace")
+            self.sample_type = sample_type
+            self.samples = samples
+            self.scale = 1.0 if sample_type == 'float32' else scale
+            self.offset = offset
+            self.file = open(filename, 'wb', buffering=1 << 20)
+            self.header_written = False
+            if self.scale is not None:
+                self._write_header()
+        self.dtype = trace_record_dtype(self.samples, self.sample_type)
+
+    def _write_header(self) -> None:
+        self.file.write(trace_header(self.samples, self.sample_type, self.scale, self.offset))
+        self.header_written = True
+
+    def append(self, traces: np.ndarray, key: Union[int, np.ndarray] = 0, textin=None,
+               sparse_word: Union[int, np.ndarray] = -1) -> None:
+        """Add one trace (samples,) or a block (rows, samples); metadata is per trace or shared"""
+        traces = np.asarray(traces, dtype=np.float64)
+        if traces.ndim == 1:
+            traces = traces[None, :]
+        if traces.shape[1] != self.samples:
+            raise ValueError(f"Traces have {traces.shape[1]} samples, the store holds {self.samples}")
+        if not self.header_written:
+            peak = float(np.abs(traces - self.offset).max(initial=0.0))
+            self.scale = peak / INT16_HEADROOM if peak > 0 else 1.0
+            self._write_header()
+        records = np.zeros(len(traces), dtype=self.dtype)
+        records['key'] = key
+        records['textin'] = _textin_bytes(textin)
+        records['sparse_word'] = sparse_word
+        records['samples'] = traces if self.sample_type == 'float32' else quantize(traces, self.scale, self.offset)
+        self.file.write(records.tobytes())
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        if not self.header_written:
+            self.scale = 1.0
+            self._write_header()
+        self.file.close()
+
+    def __enter__(self) -> 'TraceStoreWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class TraceStore:
+    """Memory-mapped trace store; store[i] / store[a:b] are dequantized float32 traces"""
+    def __init__(self, filename: str, mode: str = 'r'):
+        self.filename = filename
+        self.sample_type, self.samples, self.scale, self.offset = _read_header(filename)
+        dtype = trace_record_dtype(self.samples, self.sample_type)
+        with open(filename, 'rb') as f:
+            f.seek(0, 2)
+            self.num_rows = (f.tell() - HEADER.size) // dtype.itemsize
+        self.records = np.memmap(filename, dtype=dtype, mode=mode, offset=HEADER.size, shape=(self.num_rows,))
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    @property
+    def shape(self):
+        return self.num_rows, self.samples
+
+    @property
+    def key(self) -> np.ndarray:
+        return self.records['key']
+
+    @property
+    def textin(self) -> np.ndarray:
+        return self.records['textin']
+
+    @property
+    def sparse_word(self) -> np.ndarray:
+        return self.records['sparse_word']
+
+    @property
+    def raw(self) -> np.ndarray:
+        """Stored samples as they are in the file (int16 codes for quantized stores)"""
+        return self.records['samples']
+
+    def __getitem__(self, rows) -> np.ndarray:
+        samples = self.records['samples'][rows]
+        if self.sample_type == 'float32':
+            return np.asarray(samples, dtype=np.float32)
+        return (samples * np.float32(self.scale) + np.float32(self.offset)).astype(np.float32)
+
+    def write_traces(self, start: int, traces: np.ndarray) -> None:
+        """Overwrite rows start .. start + len(traces) - 1 in place (store opened with mode='r+')"""
+        traces = np.asarray(traces, dtype=np.float64)
+        if self.sample_type == 'int16':
+            traces = quantize(traces, self.scale, self.offset)
+        self.records['samples'][start:start + len(traces)] = traces
+
+    def flush(self) -> None:
+        self.records.flush()
+
+def convert_csv(csv_filename: str, filename: str, sample_type: str = 'float32', scale: Optional[float] = None,
+                key: int = 0, textin: Optional[bytes] = None, chunk_rows: int = 4096) -> int:
+    """Convert a save_to_csv trace dump (one trace per line) chunk by chunk; returns the trace count"""
+    count = 0
+    writer = None
+    with open(csv_filename, 'r') as f:
+        while True:
+            lines = [line for line in islice(f, chunk_rows) if line.strip()]
+            if not lines:
+                break
+            block = np.loadtxt(lines, delimiter=',', ndmin=2)
+            if writer is None:
+                writer = TraceStoreWriter(filename, block.shape[1], sample_type, scale)
+            writer.append(block, key=key, textin=textin)
+            count += len(block)
+    if writer is None:
+        raise ValueError(f"{csv_filename} holds no traces")
+    writer.close()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CSV trace dumps to a trace store, or describe a store")
+    parser.add_argument('input', help="traces.csv to convert, or a trace store to describe")
+    parser.add_argument('output', nargs='?', help="trace store to write")
+    parser.add_argument('--int16', action='store_true', help="quantize the samples to int16")
+    parser.add_argument('--scale', type=float, help="int16 step (default: from the first chunk)")
+    parser.add_argument('--key', type=int, default=0, help="key index recorded for every trace")
+    parser.add_argument('--textin', help="textin recorded for every trace, as hex")
+    args = parser.parse_args()
+
+    if args.output is None:
+        store = TraceStore(args.input)
+        print(f"{args.input}: {len(store)} traces x {store.samples} {store.sample_type} samples "
+              f"(scale {store.scale:g}, offset {store.offset:g})")
+        return
+    textin = bytes.fromhex(args.textin) if args.textin else None
+    count = convert_csv(args.input, args.output, 'int16' if args.int16 else 'float32', args.scale,
+                        args.key, textin)
+    print(f"Converted {count} traces to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""One-pass fixed-vs-random TVLA (Welch's t-test) over trace files of any size.
+
+Traces are read through a memmap from a .npy file or a trace store
+(trace_store.py), chunk_size rows at a time. OnlineMoments keeps a count,
+mean and sum of squared deviations per sample and merges chunks with the
+pairwise (Chan et al.) update, so a pass never holds more than one chunk in
+memory. WelchTTest keeps one accumulator per class (labels: 0 = fixed,
+1 = random, as written by leakage_simulator.py). Worker processes each
+accumulate their own range of rows; the parent merges the partial results.
+Without labels only the overall mean and variance are computed, which is
+the one-pass replacement for the notebook's mean trace and deviation plots.
+
+|t| > 4.5 at a sample is the usual first-order TVLA leakage criterion.
+"""
+import argparse
+import os
+from functools import partial
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from trace_store import TraceStore, is_trace_store
+
+TVLA_THRESHOLD = 4.5
+
+class OnlineMoments:
+    """Running count, mean and sum of squared deviations of every sample (float64)"""
+    def __init__(self, samples: int):
+        self.count = 0
+        self.mean = np.zeros(samples)
+        self.m2 = np.zeros(samples)
+
+    def _combine(self, count: int, mean: np.ndarray, m2: np.ndarray) -> None:
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * (count / total)
+        self.m2 += m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def update(self, traces: np.ndarray) -> None:
+        """Add a (rows, samples) block of traces"""
+        if len(traces) == 0:
+            return
+        traces = np.asarray(traces, dtype=np.float64)
+        mean = traces.mean(axis=0)
+        self._combine(len(traces), mean, ((traces - mean) ** 2).sum(axis=0))
+
+    def merge(self, other: 'OnlineMoments') -> 'OnlineMoments':
+        self._combine(other.count, other.mean, other.m2)
+        return self
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance (ddof = 1)"""
+        if self.count < 2:
+            return np.full_like(self.mean, np.nan)
+        return self.m2 / (self.count - 1)
+
+class WelchTTest:
+    """Per-class moments of a fixed-vs-random trace set and their Welch t-statistic"""
+    def __init__(self, samples: int):
+        self.fixed = OnlineMoments(samples)
+        self.random = OnlineMoments(samples)
+
+    def update(self, traces: np.ndarray, labels: np.ndarray) -> None:
+        labels = np.asarray(labels)
+        self.fixed.update(traces[labels == 0])
+        self.random.update(traces[labels == 1])
+
+    def merge(self, other: 'WelchTTest') -> 'WelchTTest':
+        self.fixed.merge(other.fixed)
+        self.random.merge(other.random)
+        return self
+
+    def overall(self) -> OnlineMoments:
+        """Moments of both classes together"""
+        moments = OnlineMoments(len(self.fixed.mean))
+        return moments.merge(self.fixed).merge(self.random)
+
+    def t_statistic(self) -> np.ndarray:
+        standard_error = np.sqrt(self.fixed.variance / self.fixed.count + self.random.variance / self.random.count)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.fixed.mean - self.random.mean) / standard_error
+
+def open_traces(filename: str):
+    """(traces, samples) view of a .npy trace file or trace store without reading it"""
+    if is_trace_store(filename):
+        return TraceStore(filename)
+    traces = np.load(filename, mmap_mode='r')
+    if traces.ndim != 2:
+        raise ValueError(f"{filename}: expected a (traces, samples) array, got shape {traces.shape}")
+    return traces
+
+def accumulate(trace_file: str, label_file: Optional[str], chunk_size: int,
+               row_range: Tuple[int, int]):
+    """Worker entry point: WelchTTest (or OnlineMoments without labels) of rows start .. stop - 1"""
+    traces = open_traces(trace_file)
+    labels = None if label_file is None else np.load(label_file, mmap_mode='r')
+    result = OnlineMoments(traces.shape[1]) if labels is None else WelchTTest(traces.shape[1])
+    start, stop = row_range
+    for chunk_start in range(start, stop, chunk_size):
+        chunk = traces[chunk_start:min(chunk_start + chunk_size, stop)]
+        if labels is None:
+            result.update(chunk)
+        else:
+            result.update(chunk, labels[chunk_start:chunk_start + len(chunk)])
+    return result
+
+def row_ranges(rows: int, parts: int) -> List[Tuple[int, int]]:
+    bounds = np.linspace(0, rows, parts + 1).astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+def run(trace_file: str, label_file: Optional[str] = None, chunk_size: int = 4096,
+        workers: Optional[int] = None, limit: Optional[int] = None):
+    """One pass over the file, split over the worker pool; returns the merged accumulator"""
+    rows = len(open_traces(trace_file))
+    if label_file is not None and len(np.load(label_file, mmap_mode='r')) < rows:
+        raise ValueError(f"{label_file} has fewer labels than {trace_file} has traces")
+    if limit is not None:
+        rows = min(rows, limit)
+    if rows == 0:
+        raise ValueError(f"No traces to test in {trace_file}")
+    workers = workers or os.cpu_count() or 1
+    worker = partial(accumulate, trace_file, label_file, chunk_size)
+    ranges = row_ranges(rows, workers)
+    if workers == 1:
+        partials = list(map(worker, ranges))
+    else:
+        with Pool(workers) as pool:
+            partials = pool.map(worker, ranges)
+    result = partials[0]
+    for other in partials[1:]:
+        result.merge(other)
+    if isinstance(result, WelchTTest) and min(result.fixed.count, result.random.count) < 2:
+        raise ValueError(f"The t-test needs at least 2 traces per class, got {result.fixed.count} fixed and "
+                         f"{result.random.count} random")
+    return result
+
+def print_report(result, threshold: float = TVLA_THRESHOLD) -> None:
+    print("\n=== TVLA Report ===")
+    if isinstance(result, OnlineMoments):
+        deviation = np.sqrt(result.variance)
+        print(f"Traces: {result.count}")
+        print(f"Largest standard deviation {deviation.max():.4f} at sample {int(np.argmax(deviation))}")
+        return
+    t = result.t_statistic()
+    leaking = np.flatnonzero(np.abs(t) > threshold)
+    print(f"Traces: {result.fixed.count} fixed, {result.random.count} random")
+    print(f"Max |t| = {np.nanmax(np.abs(t)):.2f} at sample {int(np.nanargmax(np.abs(t)))}")
+    print(f"Samples over |t| > {threshold}: {len(leaking)} of {len(t)}")
+    if len(leaking):
+        print(f"First leaking samples: {leaking[:16].tolist()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming fixed-vs-random t-test over a trace file")
+    parser.add_argument('traces', help=".npy trace file (traces, samples) or trace store")
+    parser.add_argument('--labels', help=".npy class per trace (0 fixed, 1 random); without it only moments")
+    parser.add_argument('--chunk-size', type=int, default=4096)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--limit', type=int, help="use only the first traces")
+    parser.add_argument('--threshold', type=float, default=TVLA_THRESHOLD)
+    parser.add_argument('--output', help="save t, means and variances to this .npz")
+    args = parser.parse_args()
+
+    result = run(args.traces, args.labels, args.chunk_size, args.workers, args.limit)
+    print_report(result, args.threshold)
+    if args.output:
+        if isinstance(result, OnlineMoments):
+            np.savez(args.output, mean=result.mean, variance=result.variance, count=result.count)
+        else:
+            np.savez(args.output, t=result.t_statistic(), fixed_mean=result.fixed.mean,
+                     fixed_variance=result.fixed.variance, random_mean=result.random.mean,
+                     random_variance=result.random.variance, fixed_count=result.fixed.count,
+                     random_count=result.random.count)
+        print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
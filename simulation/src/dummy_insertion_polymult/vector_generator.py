@@ -0,0 +1,193 @@
+"""Seeded test vectors (y, h, s = h * y mod x^n - 1) for the simulator and the .mem files.
+
+Vector i is drawn from its own generator, SeedSequence(seed, spawn_key=(i,)),
+so a (seed, i) pair always gives the same vector no matter how many workers
+or which chunk size produced it. Each vector is:
+- y: `weight` distinct sorted positions (default: the parameter set's w),
+- h: a uniformly random dense polynomial,
+- s: the exact product from RotationMultiplier.multiply_packed.
+
+Workers generate chunks of consecutive vectors. The parent writes them in
+order as binary corpus files (y_bits.spix, h_for_y_bits.dnpk, s_bits.dnpk;
+read by DataLoader and batch_runner.py) and/or as position CSVs laid out like
+simulation/data/66 (read by main.py --data-dir and the .mem scripts).
+"""
+import argparse
+import os
+from functools import partial
+from multiprocessing import Pool
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from corpus import dense_header, dense_row_words, patch_rows, sparse_header, sparse_record_dtype
+from hqc_params import HQC_128, HQCParams, PARAMETER_SETS, get_params
+
+# (y (count, weight) uint16, h (count, row_words) uint64, s (count, row_words) uint64)
+VectorChunk = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+Y_NAME = 'y_bits'
+H_NAME = 'h_for_y_bits'
+S_NAME = 's_bits'
+FORMATS = ('corpus', 'csv')
+
+def vector_rng(seed: int, index: int) -> np.random.Generator:
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+def random_dense_words(rng: np.random.Generator, total_bits: int) -> np.ndarray:
+    """Uniform polynomial as packed little-endian uint64 words (the DenseCorpus row layout)"""
+    words = rng.integers(0, np.iinfo(np.uint64).max, size=dense_row_words(total_bits), dtype=np.uint64,
+                         endpoint=True)
+    if total_bits % 64:
+        words[-1] &= np.uint64((1 << (total_bits % 64)) - 1)
+    return words
+
+def packed_to_int(words: np.ndarray) -> int:
+    return int.from_bytes(np.ascontiguousarray(words, dtype='<u8').tobytes(), 'little')
+
+def int_to_packed(value: int, total_bits: int) -> np.ndarray:
+    num_words = dense_row_words(total_bits)
+    return np.frombuffer(value.to_bytes(num_words * 8, 'little'), dtype='<u8')
+
+def packed_positions(words: np.ndarray, total_bits: int) -> np.ndarray:
+    bits = np.unpackbits(np.ascontiguousarray(words, dtype='<u8').view(np.uint8), bitorder='little')
+    return np.flatnonzero(bits[:total_bits])
+
+def generate_vector(params: HQCParams, seed: int, index: int,
+                    weight: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vector `index` of the stream for `seed`: (y positions, packed h, packed s)"""
+    rng = vector_rng(seed, index)
+    weight = params.weight if weight is None else weight
+    y = np.sort(rng.choice(params.n, size=weight, replace=False))
+    h = random_dense_words(rng, params.n)
+    s = params.reference().multiply_packed(y.tolist(), packed_to_int(h))
+    return y, h, int_to_packed(s, params.n)
+
+def generate_chunk(params: HQCParams, seed: int, weight: int, start: int, count: int) -> VectorChunk:
+    """Vectors start .. start + count - 1 as arrays"""
+    row_words = dense_row_words(params.n)
+    y_rows = np.empty((count, weight), dtype=np.uint16)
+    h_rows = np.empty((count, row_words), dtype=np.uint64)
+    s_rows = np.empty((count, row_words), dtype=np.uint64)
+    for i in range(count):
+        y_rows[i], h_rows[i], s_rows[i] = generate_vector(params, seed, start + i, weight)
+    return y_rows, h_rows, s_rows
+
+class VectorWriter:
+    """Appends chunks to the output files of one vector set (corpus row counts filled in by close)"""
+    def __init__(self, out_dir: str, weight: int, total_bits: int,
+                 formats: Tuple[str, ...] = ('corpus',)):
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown output format(s): {sorted(unknown)} (expected {FORMATS})")
+        os.makedirs(out_dir, exist_ok=True)
+        self.total_bits = total_bits
+        self.weight = weight
+        self.paths: List[str] = []
+        self.rows = 0
+        self.corpus_files = None
+        self.csv_files = None
+        if 'corpus' in formats:
+            self.corpus_files = self._open(out_dir, 'spix', 'dnpk', 'dnpk', 'wb')
+            y_file, h_file, s_file = self.corpus_files
+            y_file.write(sparse_header(weight, 0, total_bits))
+            h_file.write(dense_header(0, total_bits))
+            s_file.write(dense_header(0, total_bits))
+        if 'csv' in formats:
+            self.csv_files = self._open(out_dir, 'csv', 'csv', 'csv', 'w')
+
+    def _open(self, out_dir: str, y_ext: str, h_ext: str, s_ext: str, mode: str) -> tuple:
+        paths = [os.path.join(out_dir, f"{name}.{ext}")
+                 for name, ext in ((Y_NAME, y_ext), (H_NAME, h_ext), (S_NAME, s_ext))]
+        self.paths.extend(paths)
+        return tuple(open(path, mode) for path in paths)
+
+    def write(self, chunk: VectorChunk) -> None:
+        y_rows, h_rows, s_rows = chunk
+        self.rows += len(y_rows)
+        if self.corpus_files is not None:
+            records = np.zeros(len(y_rows), dtype=sparse_record_dtype(self.weight))
+            records['count'] = self.weight
+            records['indices'] = y_rows
+            y_file, h_file, s_file = self.corpus_files
+            records.tofile(y_file)
+            h_rows.astype('<u8', copy=False).tofile(h_file)
+            s_rows.astype('<u8', copy=False).tofile(s_file)
+        if self.csv_files is not None:
+            y_file, h_file, s_file = self.csv_files
+            y_file.writelines(','.join(map(str, row.tolist())) + '\n' for row in y_rows)
+            for f, rows in ((h_file, h_rows), (s_file, s_rows)):
+                f.writelines(','.join(map(str, packed_positions(row, self.total_bits).tolist())) + '\n'
+                             for row in rows)
+
+    def close(self) -> None:
+        # The headers count only the rows written, so an interrupted run leaves a valid corpus
+        for f in self.corpus_files or ():
+            patch_rows(f, self.rows)
+        for files in (self.corpus_files, self.csv_files):
+            for f in files or ():
+                f.close()
+
+class VectorGenerator:
+    def __init__(self, params: HQCParams = HQC_128, seed: int = 0, weight: Optional[int] = None,
+                 chunk_size: int = 256, workers: Optional[int] = None):
+        self.params = params
+        self.seed = seed
+        self.weight = params.weight if weight is None else weight
+        if not 0 < self.weight <= params.n:
+            raise ValueError(f"weight {self.weight} out of range for n={params.n}")
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+
+    def chunks(self, count: int, start: int = 0) -> Iterator[VectorChunk]:
+        """Vectors start .. start + count - 1 in chunk_size pieces, in order, computed by the worker pool"""
+        spans = [(chunk_start, min(self.chunk_size, start + count - chunk_start))
+                 for chunk_start in range(start, start + count, self.chunk_size)]
+        worker = partial(_generate_span, self.params, self.seed, self.weight)
+        if self.workers == 1:
+            yield from map(worker, spans)
+            return
+        with Pool(self.workers) as pool:
+            yield from pool.imap(worker, spans)
+
+    def generate(self, out_dir: str, count: int, formats: Tuple[str, ...] = ('corpus',),
+                 start: int = 0, verbose: bool = False) -> List[str]:
+        """Write vectors start .. start + count - 1 to out_dir; returns the written paths"""
+        writer = VectorWriter(out_dir, self.weight, self.params.n, formats)
+        done = 0
+        try:
+            for chunk in self.chunks(count, start):
+                writer.write(chunk)
+                done += len(chunk[0])
+                if verbose:
+                    print(f"\r{done}/{count} vectors", end='', flush=True)
+        finally:
+            writer.close()
+        if verbose:
+            print()
+        return writer.paths
+
+def _generate_span(params: HQCParams, seed: int, weight: int, span: Tuple[int, int]) -> VectorChunk:
+    return generate_chunk(params, seed, weight, *span)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reproducible (y, h, s) test vectors")
+    parser.add_argument('out_dir')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=int, default=0, help="index of the first vector of the seed's stream")
+    parser.add_argument('--params', choices=sorted(PARAMETER_SETS), default=HQC_128.name)
+    parser.add_argument('--weight', type=int, help="weight of y (default: the parameter set's w)")
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=['corpus'])
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    generator = VectorGenerator(get_params(args.params), seed=args.seed, weight=args.weight,
+                                chunk_size=args.chunk_size, workers=args.workers)
+    paths = generator.generate(args.out_dir, args.count, tuple(args.format), start=args.start, verbose=True)
+    for path in paths:
+        print(f"Wrote {path}")
+
+if __name__ == "__main__":
+    main()
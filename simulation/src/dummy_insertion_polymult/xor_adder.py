@@ -1,6 +1,7 @@
 class XORAdder:
-    def __init__(self, debug_mode: bool = False):
-        self.word_size = 32
+    def __init__(self, debug_mode: bool = False, word_size: int = 32):
+        self.word_size = word_size
+        self.word_mask = (1 << word_size) - 1
         self.debug_mode = debug_mode
         
     def debug_print(self, message: str) -> None:
@@ -19,12 +20,13 @@ class XORAdder:
         return ''.join(result)
         
     def concatenate_words(self, word_left: int, word_right: int) -> int:
-        result = ((word_left & 0xFFFFFFFF) << 32) | (word_right & 0xFFFFFFFF)
+        result = ((word_left & self.word_mask) << self.word_size) | (word_right & self.word_mask)
         if self.debug_mode:
+            width = self.word_size
             self.debug_print(f"\nConcatenation:")
-            self.debug_print(f"Word_left :    {word_left:032b} ({word_left})")
-            self.debug_print(f"Word_right:    {word_right:032b} ({word_right})")
-            self.debug_print(f"Combined  : {result:064b} ({result})")
+            self.debug_print(f"Word_left :    {word_left:0{width}b} ({word_left})")
+            self.debug_print(f"Word_right:    {word_right:0{width}b} ({word_right})")
+            self.debug_print(f"Combined  : {result:0{2 * width}b} ({result})")
         return result
         
     def extract_bits(self, value: int, start: int, length: int) -> int:
@@ -32,12 +34,21 @@ class XORAdder:
         result = (value >> start) & mask
         if self.debug_mode:
             self.debug_print(f"\nBit Extraction:")
-            self.debug_print(f"Value:    {self.format_bits_with_highlight(value, start, length, 64)}")
+            self.debug_print(f"Value:    {self.format_bits_with_highlight(value, start, length, 2 * self.word_size)}")
             self.debug_print(f"Start:    {start}")
             self.debug_print(f"Length:   {length}")
-            self.debug_print(f"Extracted:{result:032b} ({result})")
+            self.debug_print(f"Extracted:{result:0{self.word_size}b} ({result})")
         return result
         
+    def xor_words(self, high_left: int, high_right: int, low_left: int, low_right: int,
+                  acc_poly: int, high_start: int, low_start: int) -> int:
+        """process_xor without debug output, for the Controller's hot loop"""
+        word_size = self.word_size
+        mask = self.word_mask
+        high_bits = ((((high_left & mask) << word_size) | (high_right & mask)) >> high_start) & mask
+        low_bits = ((((low_left & mask) << word_size) | (low_right & mask)) >> low_start) & mask
+        return acc_poly ^ high_bits ^ low_bits
+        
     def process_xor(self, 
                    normal_high_word_left: int, 
                    normal_high_word_right: int,
@@ -49,11 +60,11 @@ class XORAdder:
         if self.debug_mode:
             self.debug_print("\n=== XOR Operation Start ===")
             self.debug_print("Input values:")
-            self.debug_print(f"Normal High Left :  {normal_high_word_left:032b}")
-            self.debug_print(f"Normal High Right: {normal_high_word_right:032b}")
-            self.debug_print(f"Normal Low Left  :   {normal_low_word_left:032b}")
-            self.debug_print(f"Normal Low Right :  {normal_low_word_right:032b}")
-            self.debug_print(f"Acc Poly:         {acc_poly:032b}")
+            self.debug_print(f"Normal High Left :  {normal_high_word_left:0{self.word_size}b}")
+            self.debug_print(f"Normal High Right: {normal_high_word_right:0{self.word_size}b}")
+            self.debug_print(f"Normal Low Left  :   {normal_low_word_left:0{self.word_size}b}")
+            self.debug_print(f"Normal Low Right :  {normal_low_word_right:0{self.word_size}b}")
+            self.debug_print(f"Acc Poly:         {acc_poly:0{self.word_size}b}")
             
         # Concatenate word pairs
         normal_high_concat = self.concatenate_words(normal_high_word_left, normal_high_word_right)
@@ -75,10 +86,10 @@ class XORAdder:
         
         if self.debug_mode:
             self.debug_print("\nFinal XOR Operation:")
-            self.debug_print(f"Acc Poly:         {acc_poly:032b}")
-            self.debug_print(f"Normal High Bits: {normal_high_bits:032b}")
-            self.debug_print(f"Normal Low Bits:  {normal_low_bits:032b}")
-            self.debug_print(f"XOR Result:       {xor_result:032b}")
+            self.debug_print(f"Acc Poly:         {acc_poly:0{self.word_size}b}")
+            self.debug_print(f"Normal High Bits: {normal_high_bits:0{self.word_size}b}")
+            self.debug_print(f"Normal Low Bits:  {normal_low_bits:0{self.word_size}b}")
+            self.debug_print(f"XOR Result:       {xor_result:0{self.word_size}b}")
             self.debug_print("\n=== XOR Operation End ===\n")
             
         return xor_result
@@ -1,7 +1,13 @@
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from data_loader import DataLoader
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dummy_insertion_polymult'))
+from reference_multiplier import RotationMultiplier
+from hqc_params import HQC_128, get_params
+
 class PolynomialOperations:
     @staticmethod
     def create_polynomial_from_positions(positions, size=17669):
@@ -38,6 +44,13 @@ class PolynomialOperations:
                 
         return result
 
+    @staticmethod
+    def polynomial_multiply_rotation(sparse_positions, dense_positions, size=17669):
+        """희소 다항식의 각 위치마다 비트 패킹된 밀집 다항식을 회전시켜 XOR합니다 (mod x^n - 1)."""
+        multiplier = RotationMultiplier(total_bits=size)
+        result_positions = multiplier.multiply(sparse_positions, dense_positions)
+        return PolynomialOperations.create_polynomial_from_positions(result_positions, size)
+
 class Visualizer:
     @staticmethod
     def plot_polynomial_bits(poly, title, max_bits=100):
@@ -83,12 +96,22 @@ class ResultAnalyzer:
         print(f"일치하는 비트 위치 개수: {analysis_results['matching_count']}")
         print(f"정확도: {analysis_results['accuracy']:.2f}%")
 
-def main():
+DEFAULT_DATA_DIR = './data/66'
+
+def main(engine="rotation", params=HQC_128, data_dir=None):
+    # 기본 데이터(./data/66)는 HQC-128 벡터이므로 다른 파라미터 세트에는 데이터 디렉터리를 지정해야 합니다
+    if data_dir is None:
+        if params.n != HQC_128.n:
+            raise ValueError(f"{DEFAULT_DATA_DIR} holds HQC-128 vectors; give a data directory for {params.name}")
+        data_dir = DEFAULT_DATA_DIR
+
     # 데이터 로드
     loader = DataLoader()
-    r2_positions = loader.read_positions_from_csv('./data/66/y_bits.csv')
-    h_positions = loader.read_positions_from_csv('./data/66/h_for_y_bits.csv')
-    result_positions = loader.read_positions_from_csv('./data/66/s_bits.csv')
+    r2_positions = loader.read_positions_from_csv(os.path.join(data_dir, 'y_bits.csv'))
+    h_positions = loader.read_positions_from_csv(os.path.join(data_dir, 'h_for_y_bits.csv'))
+    result_positions = loader.read_positions_from_csv(os.path.join(data_dir, 's_bits.csv'))
+    if max(r2_positions + h_positions + result_positions, default=0) >= params.n:
+        raise ValueError(f"{data_dir} has bit positions past n={params.n} of {params.name}")
 
     # 초기 데이터 정보 출력
     print(f"r2의 1인 비트 개수: {len(r2_positions)}")
@@ -97,16 +120,21 @@ def main():
 
     # 다항식 연산
     poly_ops = PolynomialOperations()
-    r2_poly = poly_ops.create_polynomial_from_positions(r2_positions)
-    h_poly = poly_ops.create_polynomial_from_positions(h_positions)
-    result_poly = poly_ops.create_polynomial_from_positions(result_positions)
+    r2_poly = poly_ops.create_polynomial_from_positions(r2_positions, params.n)
+    h_poly = poly_ops.create_polynomial_from_positions(h_positions, params.n)
+    result_poly = poly_ops.create_polynomial_from_positions(result_positions, params.n)
 
     # 시뮬레이션된 곱셈 수행
-    raw_result = poly_ops.polynomial_multiply_gf2(r2_poly, h_poly)
-    
-    # 다항식 크기 축소 적용
     n = len(r2_poly)  # 원래 다항식의 크기
-    simulated_result = poly_ops.reduce_polynomial(raw_result, n)
+    if engine == "schoolbook":
+        raw_result = poly_ops.polynomial_multiply_gf2(r2_poly, h_poly)
+
+        # 다항식 크기 축소 적용
+        simulated_result = poly_ops.reduce_polynomial(raw_result, n)
+    elif engine == "rotation":
+        simulated_result = poly_ops.polynomial_multiply_rotation(r2_positions, h_positions, n)
+    else:
+        raise ValueError(f"Unknown engine: {engine}")
 
     # 결과 분석
     simulated_positions = np.where(simulated_result[:len(result_poly)] == 1)[0]
@@ -119,4 +147,6 @@ def main():
     visualizer.plot_all_polynomials(r2_poly, h_poly, result_poly, simulated_result)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1] if len(sys.argv) > 1 else "rotation",
+         get_params(sys.argv[2]) if len(sys.argv) > 2 else HQC_128,
+         sys.argv[3] if len(sys.argv) > 3 else None)
\ No newline at end of file